@@ -1,11 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException
-from typing import List
+from pydantic import BaseModel
+from typing import List, Optional
+import uuid
 from ...core.auth import current_active_user
+from ...models.document import Document
+from ...models.job import IngestionJob
 from ...models.user import User
 from ...schemas.user import UserRead
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from sqlalchemy.orm import undefer
 from ...core.database import get_db
+from ...services.document_processor import document_processor
+from ...services.embedding_cache import embedding_cache, query_embedding_cache
+from ...services.embedding_scheduler import embedding_scheduler
+from ...services.ingestion_worker import ingestion_workers
+from ...services.job_queue import ACTIVE_JOB_STATUSES, job_queue
+from ...services.query_embedder import query_embedder
 
 router = APIRouter()
 
@@ -21,3 +32,104 @@ async def list_all_users(
     result = await db.execute(select(User))
     users = result.scalars().all()
     return list(users)
+
+
+@router.get("/ingestion-queue")
+async def ingestion_queue_metrics(
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(current_active_user)
+):
+    """Per-user ingestion queue depth, wait and run times. Admin only."""
+    if not user.is_superuser:
+        raise HTTPException(status_code=403, detail="Not authorized. Admin access only.")
+
+    return {"users": await job_queue.metrics(db)}
+
+
+@router.get("/embedding-queue")
+async def embedding_queue_stats(
+    user: User = Depends(current_active_user)
+):
+    """Embedding queue wait and model time per priority class, and query batching. Admin only."""
+    if not user.is_superuser:
+        raise HTTPException(status_code=403, detail="Not authorized. Admin access only.")
+
+    return {"classes": embedding_scheduler.stats(), "query_batching": query_embedder.stats()}
+
+
+@router.get("/embedding-cache")
+async def embedding_cache_stats(
+    user: User = Depends(current_active_user)
+):
+    """Hit/miss counters and size of the chunk-embedding and query-embedding caches. Admin only."""
+    if not user.is_superuser:
+        raise HTTPException(status_code=403, detail="Not authorized. Admin access only.")
+
+    return {**embedding_cache.stats(), "queries": query_embedding_cache.stats()}
+
+
+class RechunkRequest(BaseModel):
+    document_ids: Optional[List[str]] = None  # default: all completed documents
+    force: bool = False  # also re-chunk documents already cut with the current settings
+
+
+@router.post("/rechunk")
+async def rechunk_documents(
+    request: RechunkRequest,
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(current_active_user)
+):
+    """
+    Queue re-chunking of documents from their stored extraction artifacts
+    using the current chunking settings. Admin only. Requested documents
+    that do not exist are a 404, ones without an artifact a 409.
+    """
+    if not user.is_superuser:
+        raise HTTPException(status_code=403, detail="Not authorized. Admin access only.")
+
+    if request.document_ids:
+        try:
+            requested = {uuid.UUID(document_id) for document_id in request.document_ids}
+        except ValueError:
+            raise HTTPException(status_code=404, detail="Document not found")
+        result = await db.execute(select(Document.id, Document.artifact_key).filter(Document.id.in_(requested)))
+        artifacts = dict(result.all())
+        missing = requested - artifacts.keys()
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Documents not found: {sorted(map(str, missing))}")
+        without_artifact = [str(document_id) for document_id, key in artifacts.items() if not key]
+        if without_artifact:
+            raise HTTPException(
+                status_code=409,
+                detail=f"No extraction artifact to re-chunk from: {sorted(without_artifact)}"
+            )
+
+    active_jobs = select(IngestionJob.document_id).filter(IngestionJob.status.in_(ACTIVE_JOB_STATUSES))
+    query = select(Document).options(undefer(Document.metadata_)).filter(
+        Document.processing_status == "completed",
+        Document.artifact_key.is_not(None),
+        Document.id.not_in(active_jobs)
+    )
+    if request.document_ids:
+        query = query.filter(Document.id.in_([uuid.UUID(document_id) for document_id in request.document_ids]))
+    result = await db.execute(query)
+    docs = result.scalars().all()
+
+    current = document_processor.chunking_settings()
+    stale = [doc for doc in docs if request.force or (doc.metadata_ or {}).get("chunking") != current]
+    if stale:
+        # Queued per owner so re-chunking shares the workers fairly with their uploads
+        by_user = {}
+        for doc in stale:
+            by_user.setdefault(doc.user_id, []).append(doc)
+        for user_id, user_docs in by_user.items():
+            await job_queue.enqueue_many(
+                db,
+                [(doc.id, "") for doc in user_docs],
+                kind="rechunk",
+                user_id=user_id,
+                costs=[job_queue.estimate_cost(doc.file_size, doc.total_pages) for doc in user_docs]
+            )
+        ingestion_workers.notify()
+
+    return {"queued": len(stale), "up_to_date": len(docs) - len(stale), "chunking": current}
@@ -1,164 +1,68 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
-from typing import List
-import shutil
+from sqlalchemy import select, delete, or_
+from sqlalchemy.orm import undefer
+from typing import List, Optional
+import asyncio
+import json
 import os
 import uuid
-import asyncio
-from ...core.database import get_db, AsyncSessionLocal
-from ...models.document import Document
-from ...services.document_processor import document_processor
-from ...services.embeddings import embedding_service
+from ...core.database import AsyncSessionLocal, get_db
+from ...models.document import INDEXING_STATUSES, Document
+from ...models.job import IngestionJob
+from ...services.job_queue import job_queue
+from ...services.artifact_store import artifact_store
+from ...services.ingestion import release_artifact
+from ...services.ingestion_worker import ingestion_workers
+from ...services.progress import progress_broker, publish_status
 from ...services.vector_store import vector_store
 from ...core.config import settings
 from ...core.auth import current_active_user
 from ...models.user import User
 from ...core.rate_limit import rate_limiter, Limit
+from ...core.uploads import (
+    BULK_UPLOAD_OPENAPI_EXTRA, UPLOAD_OPENAPI_EXTRA, UploadBudget, extract_archive, remove_uploads, stream_upload,
+    stream_uploads
+)
 
 router = APIRouter()
 
-async def process_document_background(file_path: str, document_id: str):
-    """Background task to process document with its own DB session"""
-    print(f"DEBUG: Starting background processing for document {document_id}")
-    async with AsyncSessionLocal() as db:
-        try:
-            # Convert string ID to UUID object if necessary
-            doc_uuid = uuid.UUID(document_id) if isinstance(document_id, str) else document_id
-            result = await db.execute(select(Document).filter(Document.id == doc_uuid))
-            doc = result.scalar_one_or_none()
-            
-            if not doc:
-                print(f"ERROR: Document {document_id} not found in database during background task")
-                return
-
-            print(f"DEBUG: Document found: {doc.filename}. Updating status to 'processing'...")
-            doc.processing_status = "processing"
-            await db.commit()
-
-            # 1. Extract text
-            print(f"DEBUG: Extracting text from {file_path}...")
-            if file_path.endswith(".pdf"):
-                text, metadata = document_processor.extract_text_from_pdf(file_path)
-            else:
-                text, metadata = document_processor.extract_text_from_txt(file_path)
-            print(f"DEBUG: Text extracted. Length: {len(text)}")
-
-            # Update metadata
-            doc.metadata_ = metadata
-            doc.total_pages = metadata.get("total_pages", 1)
-
-            # 2. Chunk text
-            print(f"DEBUG: Chunking text...")
-            chunks = document_processor.smart_chunk(
-                text=text,
-                document_id=str(document_id),
-                filename=doc.filename,
-                metadata=metadata
-            )
-            
-            doc.chunk_count = len(chunks)
-            print(f"DEBUG: Created {len(chunks)} chunks.")
-
-            # 3. Generate embeddings
-            print(f"DEBUG: Generating embeddings for {len(chunks)} chunks...")
-            chunk_texts = [chunk.text for chunk in chunks]
-            embeddings = await asyncio.wait_for(
-                asyncio.to_thread(embedding_service.embed_batch, chunk_texts),
-                timeout=settings.EMBEDDING_TIMEOUT_SECONDS
-            )
-            print(f"DEBUG: Embeddings generated.")
-
-            # 4. Upsert to Vector Store
-            print(f"DEBUG: Upserting to Vector Store...")
-            # Add user_id to each chunk's metadata for filtering
-            for chunk in chunks:
-                chunk.metadata["user_id"] = str(doc.user_id)
-                
-            vector_store.upsert_chunks(chunks, embeddings)
-            print(f"DEBUG: Upsert complete.")
-
-            # Update status
-            doc.processing_status = "completed"
-            doc.qdrant_collection_id = settings.QDRANT_COLLECTION_NAME
-            await db.commit()
-            print(f"DEBUG: Processing completed for {doc.filename}")
-
-            # Cleanup
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                print(f"DEBUG: Temporary file {file_path} removed.")
-
-        except Exception as e:
-            print(f"FATAL ERROR processing document {document_id}: {e}")
-            import traceback
-            traceback.print_exc()
-            await db.rollback()
-            doc_uuid = uuid.UUID(document_id) if isinstance(document_id, str) else document_id
-            result = await db.execute(select(Document).filter(Document.id == doc_uuid))
-            doc = result.scalar_one_or_none()
-            if doc:
-                doc.processing_status = "failed"
-                existing_meta = doc.metadata_ or {}
-                existing_meta["processing_error"] = str(e)
-                doc.metadata_ = existing_meta
-                await db.commit()
-            if os.path.exists(file_path):
-                os.remove(file_path)
-
-@router.post("/upload")
+
+@router.post("/upload", openapi_extra=UPLOAD_OPENAPI_EXTRA)
 async def upload_document(
-    background_tasks: BackgroundTasks,
-    file: UploadFile = File(...),
+    request: Request,
     db: AsyncSession = Depends(get_db),
     user: User = Depends(current_active_user)
 ):
     rate_limiter.hit(f"upload:{user.id}", Limit(max_requests=20, window_seconds=300))
 
-    # Validate file type
-    file_ext = os.path.splitext(file.filename)[1].lower()
-    if file_ext not in settings.ALLOWED_EXTENSIONS:
-        raise HTTPException(status_code=400, detail=f"Unsupported file type. Allowed: {settings.ALLOWED_EXTENSIONS}")
-
-    # Validate file size early to avoid processing oversized uploads
-    file.file.seek(0, os.SEEK_END)
-    file_size = file.file.tell()
-    file.file.seek(0)
-    if file_size > settings.MAX_FILE_SIZE:
-        raise HTTPException(
-            status_code=400,
-            detail=f"File too large. Max size is {settings.MAX_FILE_SIZE} bytes."
-        )
-
-    # Create DB entry
+    # Stream the file to disk first, hashing it so duplicate uploads can reuse existing vectors
     document_id = uuid.uuid4()
+    upload = await stream_upload(
+        request, lambda ext: os.path.join(settings.UPLOAD_DIR, f"{document_id}{ext}")
+    )
+
+    # Create DB entry and queue processing (committed together)
     new_doc = Document(
         id=document_id,
         user_id=user.id,
-        filename=file.filename,
-        original_filename=file.filename,
-        file_size=0, # Will update after save
-        file_type=file_ext,
+        filename=upload.filename,
+        original_filename=upload.filename,
+        file_size=upload.size,
+        file_type=upload.extension,
+        content_hash=upload.content_hash,
         processing_status="pending"
     )
     db.add(new_doc)
-    await db.commit()
-    await db.refresh(new_doc)
-
-    # Save file temporarily
-    upload_dir = "uploads"
-    os.makedirs(upload_dir, exist_ok=True)
-    file_path = os.path.join(upload_dir, f"{document_id}{file_ext}")
-    
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
-    # Update file size
-    new_doc.file_size = os.path.getsize(file_path)
-    await db.commit()
-
-    # Trigger background processing
-    background_tasks.add_task(process_document_background, file_path, str(document_id))
+    try:
+        await job_queue.enqueue(
+            db, document_id, upload.path, user_id=user.id, cost=job_queue.estimate_cost(upload.size)
+        )
+    except Exception:
+        os.remove(upload.path)
+        raise
+    ingestion_workers.notify()
 
     return {
         "id": str(document_id),
@@ -167,6 +71,215 @@ async def upload_document(
     }
 
 
+@router.post("/bulk", openapi_extra=BULK_UPLOAD_OPENAPI_EXTRA)
+async def upload_documents_bulk(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(current_active_user)
+):
+    """
+    Upload many files, or zip archives of them, in one request. All documents
+    are created in one transaction and ingested together through shared
+    embedding batches; each keeps its own processing status.
+    """
+    rate_limiter.hit(f"bulk-upload:{user.id}", Limit(max_requests=5, window_seconds=300))
+
+    def destination(ext: str) -> str:
+        return os.path.join(settings.UPLOAD_DIR, f"{uuid.uuid4()}{ext}")
+
+    budget = UploadBudget(settings.BULK_MAX_TOTAL_SIZE)
+    received = await stream_uploads(
+        request,
+        destination,
+        field="files",
+        max_files=settings.BULK_MAX_FILES,
+        extensions=settings.ALLOWED_EXTENSIONS | {".zip"},
+        size_limits={".zip": settings.BULK_MAX_ARCHIVE_SIZE},
+        budget=budget
+    )
+
+    uploads, skipped = [], []
+    try:
+        for upload in received:
+            if upload.extension != ".zip":
+                uploads.append(upload)
+                continue
+            extracted, archive_skipped = await asyncio.to_thread(
+                extract_archive, upload.path, destination, settings.BULK_MAX_FILES - len(uploads), budget
+            )
+            uploads.extend(extracted)
+            skipped.extend(archive_skipped)
+            os.remove(upload.path)
+        if not uploads:
+            raise HTTPException(status_code=400, detail="No supported documents in the upload")
+
+        batch_id = uuid.uuid4()
+        documents = []
+        for upload in uploads:
+            document = Document(
+                id=uuid.uuid4(),
+                user_id=user.id,
+                filename=upload.filename,
+                original_filename=upload.filename,
+                file_size=upload.size,
+                file_type=upload.extension,
+                content_hash=upload.content_hash,
+                processing_status="pending"
+            )
+            db.add(document)
+            documents.append(document)
+        # Documents and their jobs are committed together
+        await job_queue.enqueue_many(
+            db,
+            [(document.id, upload.path) for document, upload in zip(documents, uploads)],
+            batch_id=batch_id,
+            user_id=user.id,
+            costs=[job_queue.estimate_cost(upload.size) for upload in uploads]
+        )
+    except BaseException:
+        remove_uploads(received + uploads)
+        raise
+    ingestion_workers.notify()
+
+    return {
+        "batch_id": str(batch_id),
+        "documents": [
+            {"id": str(document.id), "filename": document.filename, "status": document.processing_status}
+            for document in documents
+        ],
+        "skipped": skipped
+    }
+
+
+@router.post("/{document_id}/versions", openapi_extra=UPLOAD_OPENAPI_EXTRA)
+async def upload_document_version(
+    document_id: str,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(current_active_user)
+):
+    """Replace a document with a new version, re-embedding only changed chunks"""
+    rate_limiter.hit(f"upload:{user.id}", Limit(max_requests=20, window_seconds=300))
+
+    doc_uuid = uuid.UUID(document_id) if isinstance(document_id, str) else document_id
+    result = await db.execute(
+        select(Document).filter(Document.id == doc_uuid, Document.user_id == user.id)
+    )
+    doc = result.scalar_one_or_none()
+    if not doc:
+        raise HTTPException(status_code=404, detail="Document not found")
+    active_job = await db.execute(
+        select(IngestionJob.id).filter(
+            IngestionJob.document_id == doc.id,
+            IngestionJob.status.in_(("queued", "running"))
+        )
+    )
+    if doc.processing_status != "completed" or active_job.first() is not None:
+        raise HTTPException(status_code=409, detail="Document is still being processed")
+
+    upload = await stream_upload(
+        request, lambda ext: os.path.join(settings.UPLOAD_DIR, f"{doc.id}-{uuid.uuid4().hex[:8]}{ext}")
+    )
+
+    if upload.content_hash == doc.content_hash:
+        os.remove(upload.path)
+        return {"id": str(doc.id), "filename": doc.filename, "status": "unchanged"}
+
+    await job_queue.enqueue(
+        db, doc.id, upload.path, kind="update", user_id=user.id, cost=job_queue.estimate_cost(upload.size)
+    )
+    ingestion_workers.notify()
+
+    return {
+        "id": str(doc.id),
+        "filename": doc.filename,
+        "status": "update_queued"
+    }
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def _poll_statuses(user_id, watched: dict) -> list:
+    """Status changes of in-flight (and previously watched) documents since the last poll"""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Document.id, Document.processing_status, Document.chunk_count).filter(
+                Document.user_id == user_id,
+                or_(
+                    Document.processing_status.in_(("pending", *INDEXING_STATUSES)),
+                    Document.id.in_([uuid.UUID(document_id) for document_id in watched])
+                )
+            )
+        )
+        rows = result.all()
+
+    changes = []
+    seen = set()
+    for row in rows:
+        document_id = str(row.id)
+        seen.add(document_id)
+        if watched.get(document_id) != row.processing_status:
+            changes.append({"document_id": document_id, "status": row.processing_status, "chunk_count": row.chunk_count})
+        watched[document_id] = row.processing_status
+    for document_id in list(watched):
+        if document_id not in seen:
+            # Deleted while being watched
+            changes.append({"document_id": document_id, "status": "deleted"})
+        if document_id not in seen or watched.get(document_id) not in ("pending", *INDEXING_STATUSES):
+            del watched[document_id]
+    return changes
+
+
+@router.get("/events")
+async def document_events(
+    request: Request,
+    document_id: Optional[str] = None,
+    user: User = Depends(current_active_user)
+):
+    """
+    Server-sent events for the caller's ingestions, replacing status polling.
+
+    `progress` events carry per-stage counters and timings from workers in
+    this process. `status` events come from the database every
+    PROGRESS_POLL_SECONDS, so status changes also arrive when the workers
+    run in a separate process. Filter to one document with `document_id`.
+    """
+    user_id = str(user.id)
+
+    async def stream():
+        queue = progress_broker.subscribe(user_id)
+        watched: dict = {}
+        try:
+            for event in progress_broker.snapshot(user_id):
+                if document_id in (None, event["document_id"]):
+                    yield _sse("progress", event)
+            next_poll = 0.0
+            loop = asyncio.get_running_loop()
+            while not await request.is_disconnected():
+                if loop.time() >= next_poll:
+                    for change in await _poll_statuses(user.id, watched):
+                        if document_id in (None, change["document_id"]):
+                            yield _sse("status", change)
+                    next_poll = loop.time() + settings.PROGRESS_POLL_SECONDS
+                    yield ": keep-alive\n\n"
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=max(next_poll - loop.time(), 0))
+                except asyncio.TimeoutError:
+                    continue
+                if document_id in (None, event["document_id"]):
+                    yield _sse("progress", event)
+        finally:
+            progress_broker.unsubscribe(user_id, queue)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/{document_id}", response_model=dict)
 async def get_document(
     document_id: str,
@@ -175,12 +288,15 @@ async def get_document(
 ):
     doc_uuid = uuid.UUID(document_id) if isinstance(document_id, str) else document_id
     result = await db.execute(
-        select(Document).filter(Document.id == doc_uuid, Document.user_id == user.id)
+        select(Document)
+        .options(undefer(Document.metadata_))
+        .filter(Document.id == doc_uuid, Document.user_id == user.id)
     )
     doc = result.scalar_one_or_none()
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
 
+    metadata = {key: value for key, value in (doc.metadata_ or {}).items() if key != "page_texts"}
     return {
         "id": str(doc.id),
         "filename": doc.filename,
@@ -192,7 +308,40 @@ async def get_document(
         "file_type": doc.file_type,
         "total_pages": doc.total_pages,
         "qdrant_collection_id": doc.qdrant_collection_id,
-        "metadata": doc.metadata_ or {}
+        "metadata": metadata
+    }
+
+
+@router.get("/{document_id}/pages")
+async def get_document_pages(
+    document_id: str,
+    page: Optional[int] = None,
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(current_active_user)
+):
+    """Extracted text of a document, per page; pass `page` to get a single one"""
+    doc_uuid = uuid.UUID(document_id) if isinstance(document_id, str) else document_id
+    result = await db.execute(
+        select(Document.artifact_key).filter(Document.id == doc_uuid, Document.user_id == user.id)
+    )
+    row = result.first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    if not row.artifact_key:
+        raise HTTPException(status_code=404, detail="No extracted text for this document")
+
+    try:
+        pages = await asyncio.to_thread(artifact_store.get_pages, row.artifact_key)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="No extracted text for this document")
+    if page is not None:
+        if page not in pages:
+            raise HTTPException(status_code=404, detail="Page not found")
+        pages = {page: pages[page]}
+
+    return {
+        "id": str(doc_uuid),
+        "pages": [{"page": number, "text": text} for number, text in sorted(pages.items())]
     }
 
 @router.get("/", response_model=List[dict])
@@ -233,11 +382,24 @@ async def delete_document(
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
 
+    # Stop running ingestions first, so they upsert nothing after the delete below;
+    # workers in other processes stop once their heartbeat finds the job gone
+    jobs = await job_queue.cancel_document(db, doc.id)
+    ingestion_workers.cancel_document(str(doc.id))
+
     # Delete from Qdrant
     vector_store.delete_by_document(document_id)
 
     # Delete from DB
     await db.delete(doc)
     await db.commit()
+    await release_artifact(db, doc.artifact_key)
+    # Drops its in-flight progress and tells open streams it is gone
+    publish_status(str(doc.id), str(doc.user_id), "deleted")
+
+    # Uploads still waiting for a worker (or a retry)
+    for path in {job.file_path for job in jobs} | {os.path.join(settings.UPLOAD_DIR, f"{doc.id}{doc.file_type}")}:
+        if path and os.path.exists(path):
+            os.remove(path)
 
     return {"message": "Document deleted successfully"}
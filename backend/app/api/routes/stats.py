@@ -6,6 +6,7 @@ from ...core.auth import current_active_user
 from ...core.database import get_db
 from ...models.document import Conversation, Document, Message
 from ...models.user import User
+from ...services.job_queue import job_queue
 from ...services.usage_service import usage_service
 from ...schemas.usage import UsageStats
 
@@ -49,3 +50,12 @@ async def get_usage_stats(
     stats = await usage_service.get_usage_stats(db, str(user.id))
     return stats
 
+
+@router.get("/ingestion")
+async def get_ingestion_stats(
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(current_active_user)
+):
+    """Current user's ingestion queue depth and recent wait / run times"""
+    metrics = await job_queue.metrics(db, user_id=user.id)
+    return metrics[str(user.id)]
@@ -1,3 +1,4 @@
+from pydantic import Field
 from pydantic_settings import BaseSettings
 from typing import Optional, List, Set, Union
 import os
@@ -27,12 +28,70 @@ class Settings(BaseSettings):
     EMBEDDING_DIMENSION: int = 384
     EMBEDDING_LOCAL_FILES_ONLY: bool = True
     EMBEDDING_TIMEOUT_SECONDS: int = 90
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_PATH: str = "embedding_cache.sqlite3"
+    EMBEDDING_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+    QUERY_EMBED_BATCH_WINDOW_MS: float = 5.0  # concurrent questions gathered into one model call
+    QUERY_EMBED_MAX_BATCH: int = 32
+    QUERY_EMBED_CACHE_ENTRIES: int = 10_000  # repeated questions skip the model
+    QUERY_EMBED_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+    EMBED_BULK_SLICE_SIZE: int = 16  # ingestion texts per model call and worker; bounds how long a query waits
+    EMBEDDING_WORKERS: int = 0  # processes sharding ingestion batches; <= 1 embeds in-process
+    EMBEDDING_WORKER_THREADS: int = 1  # ONNX intra-op threads per worker process
+    EMBEDDING_WORKER_MIN_SHARD: int = 8  # texts; smaller batches stay in-process
 
     # Document Processing
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
     ALLOWED_EXTENSIONS: Set[str] = {".pdf", ".txt", ".md"}
     CHUNK_SIZE: int = 1000
     CHUNK_OVERLAP: int = 200
+    CHUNK_SIZE_UNIT: str = "chars"  # chars (CHUNK_SIZE/CHUNK_OVERLAP), tokens (CHUNK_MAX_TOKENS/CHUNK_OVERLAP_TOKENS)
+    CHUNK_MAX_TOKENS: int = 500  # bge-small truncates at 512 tokens including [CLS]/[SEP]
+    CHUNK_OVERLAP_TOKENS: int = 64
+    TOKEN_COUNT_CACHE_SIZE: int = 100_000  # sentences
+    PDF_EXTRACTION_WORKERS: int = 4  # <= 1 disables page-parallel extraction
+    PDF_PARALLEL_MIN_PAGES: int = 40
+    PDF_PAGES_PER_TASK: int = 20
+    PDF_EXTRACTION_STRATEGY: str = "tiered"  # tiered (PyPDF2, pdfplumber per page when needed), pdfplumber
+    PDF_FAST_MIN_CHARS: int = Field(32, ge=1)  # fewer characters on a page escalates it to pdfplumber
+    PDF_EXTRACTION_ISOLATION: bool = True  # extract in killable worker processes with the timeouts below
+    PDF_PAGE_TIMEOUT_SECONDS: float = 30.0  # a slower page is skipped
+    PDF_DOCUMENT_TIMEOUT_SECONDS: float = 600.0  # pages not extracted by then are skipped
+    BOILERPLATE_FILTER: bool = True  # strip lines repeated on most pages before chunking
+    BOILERPLATE_MIN_PAGES: int = 3  # pages a line must repeat on (and document length to try at all)
+    BOILERPLATE_MIN_PAGE_RATIO: float = 0.5
+    BOILERPLATE_SAMPLE_PAGES: int = 8  # pages read before the first ones are chunked
+    NEAR_DUPLICATE_DETECTION: bool = True  # MinHash/LSH per user: reuse vectors, collapse search hits
+    NEAR_DUPLICATE_THRESHOLD: float = 0.9  # shingle Jaccard similarity
+    NEAR_DUPLICATE_MAX_CANDIDATES: int = 512  # stored points fetched per micro-batch
+    NEAR_DUPLICATE_SEARCH_OVERFETCH: int = 3  # search fetches TOP_K_RESULTS times this before collapsing
+    MINHASH_PERMUTATIONS: int = 128
+    MINHASH_BANDS: int = 16  # 8 rows per band: candidates from roughly 0.7 similarity
+    MINHASH_SHINGLE_SIZE: int = 5  # words
+    INGEST_BATCH_SIZE: int = 64  # chunks per embed/upsert micro-batch
+    INGEST_QUEUE_SIZE: int = 2  # micro-batches buffered between stages
+    INGEST_PARTIAL_MIN_CHUNKS: int = 16  # chunks indexed before a long document is queryable; 0 disables
+    UPLOAD_DIR: str = "uploads"
+    ARTIFACT_DIR: str = "artifacts"  # compressed extracted page text, used for re-chunking
+    BULK_MAX_FILES: int = 500  # per bulk request, after unpacking archives
+    BULK_MAX_ARCHIVE_SIZE: int = 200 * 1024 * 1024  # 200MB
+    BULK_MAX_TOTAL_SIZE: int = 1024 * 1024 * 1024  # 1GB written per bulk request, archives and their contents
+    INGEST_BULK_BATCH_SIZE: int = 256  # chunks per shared embed/upsert batch
+    INGEST_BULK_MAX_DOCUMENTS: int = 50  # documents claimed together from one bulk upload
+
+    # Ingestion Job Queue
+    INGEST_WORKER_MODE: str = "in_process"  # in_process, external (python -m app.worker)
+    INGEST_WORKER_CONCURRENCY: int = 2
+    INGEST_POLL_INTERVAL_SECONDS: float = 2.0
+    INGEST_JOB_LEASE_SECONDS: int = 300
+    INGEST_JOB_HEARTBEAT_SECONDS: int = 30
+    INGEST_JOB_MAX_ATTEMPTS: int = 3
+    INGEST_JOB_RETRY_BACKOFF_SECONDS: int = 30
+    INGEST_COST_BASE: float = 1.0  # fixed cost of a job, in "one small document" units
+    INGEST_COST_PER_PAGE: float = 0.1  # used when the page count is known
+    INGEST_COST_PER_MB: float = 1.0  # otherwise estimated from the file size
+    INGEST_METRICS_WINDOW_SECONDS: int = 3600  # wait/run times over jobs created this recently
+    PROGRESS_POLL_SECONDS: float = 5.0  # SSE status check interval, covers external workers
 
     # RAG Configuration
     TOP_K_RESULTS: int = 5
@@ -1,3 +1,4 @@
+from sqlalchemy import inspect, text
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
 from .config import settings
@@ -22,6 +23,35 @@ AsyncSessionLocal = async_sessionmaker(
 class Base(DeclarativeBase):
     pass
 
+# Columns added to existing tables after their first release. create_all
+# only creates missing tables, so add_missing_columns adds these to older databases.
+ADDED_COLUMNS = {
+    "documents": ("content_hash", "artifact_key"),
+}
+
+def add_missing_columns(conn) -> list:
+    """
+    Add ADDED_COLUMNS (and their indexes) that an older database lacks.
+    Idempotent; run with `conn.run_sync` after create_all. Returns the columns added.
+    """
+    added = []
+    for table_name, column_names in ADDED_COLUMNS.items():
+        table = Base.metadata.tables[table_name]
+        existing = {column["name"] for column in inspect(conn).get_columns(table_name)}
+        for name in column_names:
+            if name in existing:
+                continue
+            column = table.c[name]
+            conn.execute(text(
+                f"ALTER TABLE {table_name} ADD COLUMN {name} {column.type.compile(dialect=conn.dialect)}"
+            ))
+            added.append(f"{table_name}.{name}")
+        for index in table.indexes:
+            if any(column.name in column_names for column in index.columns):
+                # CREATE INDEX IF NOT EXISTS
+                index.create(conn, checkfirst=True)
+    return added
+
 # Dependency to get DB session
 async def get_db():
     async with AsyncSessionLocal() as session:
@@ -0,0 +1,15 @@
+from typing import Dict, Sequence
+
+
+def percentiles(values: Sequence[float], digits: int = 2) -> Dict[str, float]:
+    """Count, p50/p95/p99 (nearest rank) and max of `values`, rounded to `digits`"""
+    if not values:
+        return {"count": 0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    values = sorted(values)
+
+    def pick(q: float) -> float:
+        return round(values[min(len(values) - 1, int(q * len(values)))], digits)
+
+    return {
+        "count": len(values), "p50": pick(0.5), "p95": pick(0.95), "p99": pick(0.99), "max": round(values[-1], digits)
+    }
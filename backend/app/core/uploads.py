@@ -0,0 +1,271 @@
+import hashlib
+import os
+import zipfile
+from dataclasses import dataclass
+from typing import Callable, Collection, Dict, List, Optional, Tuple
+
+import aiofiles
+from fastapi import HTTPException, Request
+
+try:
+    import python_multipart as multipart
+    from python_multipart.multipart import parse_options_header
+except ModuleNotFoundError:  # python-multipart < 0.0.13
+    import multipart
+    from multipart.multipart import parse_options_header
+
+from .config import settings
+
+# Room for boundaries and part headers around the file itself
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+def _multipart_request_body(field: str, multiple: bool) -> dict:
+    """Request body schema for routes that read the upload themselves"""
+    schema = {"type": "string", "format": "binary"}
+    if multiple:
+        schema = {"type": "array", "items": schema}
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {"type": "object", "required": [field], "properties": {field: schema}}
+                }
+            }
+        }
+    }
+
+
+UPLOAD_OPENAPI_EXTRA = _multipart_request_body("file", multiple=False)
+BULK_UPLOAD_OPENAPI_EXTRA = _multipart_request_body("files", multiple=True)
+
+
+@dataclass
+class StoredUpload:
+    filename: str
+    extension: str
+    path: str
+    size: int
+    content_hash: str
+
+
+class UploadBudget:
+    """
+    Bytes one request may write to disk, across all of its files and
+    everything unpacked from its archives. Exceeding it is a 413.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+
+    def charge(self, size: int):
+        self.used += size
+        if self.used > self.limit:
+            raise self.exceeded()
+
+    def exceeded(self) -> HTTPException:
+        return HTTPException(
+            status_code=413,
+            detail=f"Upload too large. At most {self.limit} bytes per request, including unpacked archives."
+        )
+
+
+def _too_large(max_size: int) -> HTTPException:
+    return HTTPException(
+        status_code=400,
+        detail=f"File too large. Max size is {max_size} bytes."
+    )
+
+
+def _check_extension(filename: str, extensions: Collection[str]) -> str:
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in extensions:
+        raise HTTPException(status_code=400, detail=f"Unsupported file type. Allowed: {set(extensions)}")
+    return extension
+
+
+async def stream_upload(
+    request: Request,
+    destination: Callable[[str], str],
+    field: str = "file"
+) -> StoredUpload:
+    """
+    Write the `field` part of a multipart request to destination(extension)
+    while the body is still arriving, instead of letting Starlette spool it
+    to a temporary file first.
+
+    The extension is checked before anything is written, the upload is
+    aborted as soon as it exceeds MAX_FILE_SIZE, and the SHA-256 is computed
+    in the same pass. A partially written file is removed on any error.
+    """
+    uploads = await stream_uploads(request, destination, field=field, max_files=1)
+    return uploads[0]
+
+
+async def stream_uploads(
+    request: Request,
+    destination: Callable[[str], str],
+    field: str = "files",
+    max_files: int = 1,
+    extensions: Optional[Collection[str]] = None,
+    size_limits: Optional[Dict[str, int]] = None,
+    budget: Optional[UploadBudget] = None
+) -> List[StoredUpload]:
+    """
+    Multi-file form of stream_upload: every `field` part (up to max_files)
+    is streamed to its own destination. Files are limited to MAX_FILE_SIZE
+    unless `size_limits` maps their extension to another limit, and all of
+    them together to `budget`. On any error all files written so far are
+    removed.
+    """
+    extensions = extensions or settings.ALLOWED_EXTENSIONS
+    size_limits = size_limits or {}
+    max_size = max([settings.MAX_FILE_SIZE, *size_limits.values()])
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data upload")
+
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and \
+            int(content_length) > max_size * max_files + MULTIPART_OVERHEAD_BYTES:
+        raise _too_large(max_size)
+    if budget is not None and content_length and content_length.isdigit() and \
+            int(content_length) > budget.limit + MULTIPART_OVERHEAD_BYTES * max_files:
+        raise budget.exceeded()
+
+    # Parser callbacks are synchronous; queue their events and handle them after each write
+    events: List[Tuple[str, bytes]] = []
+
+    def on_data(kind):
+        return lambda data, start, end: events.append((kind, data[start:end]))
+
+    def on_event(kind):
+        return lambda: events.append((kind, b""))
+
+    parser = multipart.MultipartParser(boundary, {
+        "on_part_begin": on_event("part_begin"),
+        "on_header_field": on_data("header_field"),
+        "on_header_value": on_data("header_value"),
+        "on_header_end": on_event("header_end"),
+        "on_headers_finished": on_event("headers_finished"),
+        "on_part_data": on_data("part_data"),
+        "on_part_end": on_event("part_end"),
+    })
+
+    uploads: List[StoredUpload] = []
+    upload = None
+    upload_limit = settings.MAX_FILE_SIZE
+    out = None
+    sha256 = None
+    headers, header_field, header_value = {}, b"", b""
+    try:
+        async for block in request.stream():
+            parser.write(block)
+            for kind, data in events:
+                if kind == "part_begin":
+                    headers, header_field, header_value = {}, b"", b""
+                elif kind == "header_field":
+                    header_field += data
+                elif kind == "header_value":
+                    header_value += data
+                elif kind == "header_end":
+                    headers[header_field.lower()] = header_value
+                    header_field, header_value = b"", b""
+                elif kind == "headers_finished":
+                    _, options = parse_options_header(headers.get(b"content-disposition", b""))
+                    if options.get(b"name") == field.encode() and b"filename" in options:
+                        if len(uploads) == max_files:
+                            raise HTTPException(status_code=400, detail=f"At most {max_files} files per upload")
+                        filename = options[b"filename"].decode("utf-8", "replace")
+                        extension = _check_extension(filename, extensions)
+                        path = destination(extension)
+                        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                        upload = StoredUpload(filename, extension, path, 0, "")
+                        uploads.append(upload)
+                        upload_limit = size_limits.get(extension, settings.MAX_FILE_SIZE)
+                        sha256 = hashlib.sha256()
+                        out = await aiofiles.open(path, "wb")
+                elif kind == "part_data" and out is not None:
+                    upload.size += len(data)
+                    if upload.size > upload_limit:
+                        raise _too_large(upload_limit)
+                    if budget is not None:
+                        budget.charge(len(data))
+                    sha256.update(data)
+                    await out.write(data)
+                elif kind == "part_end" and out is not None:
+                    await out.close()
+                    out = None
+                    upload.content_hash = sha256.hexdigest()
+            events.clear()
+        parser.finalize()
+
+        if not uploads:
+            raise HTTPException(status_code=400, detail=f"No '{field}' file in the upload")
+        if out is not None:
+            # Body ended without a closing boundary
+            raise HTTPException(status_code=400, detail="Upload was truncated")
+    except BaseException:
+        if out is not None:
+            await out.close()
+        remove_uploads(uploads)
+        raise
+
+    return uploads
+
+
+def remove_uploads(uploads: List[StoredUpload]):
+    for upload in uploads:
+        if os.path.exists(upload.path):
+            os.remove(upload.path)
+
+
+def extract_archive(
+    archive_path: str,
+    destination: Callable[[str], str],
+    max_files: int,
+    budget: Optional[UploadBudget] = None
+) -> Tuple[List[StoredUpload], List[str]]:
+    """
+    Unpack the supported documents of a zip archive, hashing them on the way.
+    Returns (stored, skipped names). Members are size-checked while being
+    read, so a lying header cannot inflate past MAX_FILE_SIZE or `budget`.
+    """
+    stored: List[StoredUpload] = []
+    skipped: List[str] = []
+    try:
+        with zipfile.ZipFile(archive_path) as archive:
+            for info in archive.infolist():
+                name = os.path.basename(info.filename)
+                if info.is_dir() or not name or name.startswith(".") or "__MACOSX" in info.filename:
+                    continue
+                extension = os.path.splitext(name)[1].lower()
+                if extension not in settings.ALLOWED_EXTENSIONS or info.file_size > settings.MAX_FILE_SIZE:
+                    skipped.append(info.filename)
+                    continue
+                if len(stored) == max_files:
+                    raise HTTPException(status_code=400, detail=f"At most {max_files} files per upload")
+
+                upload = StoredUpload(name, extension, destination(extension), 0, "")
+                stored.append(upload)
+                sha256 = hashlib.sha256()
+                with archive.open(info) as source, open(upload.path, "wb") as target:
+                    while block := source.read(1024 * 1024):
+                        upload.size += len(block)
+                        if upload.size > settings.MAX_FILE_SIZE:
+                            raise _too_large(settings.MAX_FILE_SIZE)
+                        if budget is not None:
+                            budget.charge(len(block))
+                        sha256.update(block)
+                        target.write(block)
+                upload.content_hash = sha256.hexdigest()
+    except zipfile.BadZipFile:
+        remove_uploads(stored)
+        raise HTTPException(status_code=400, detail="Invalid zip archive")
+    except BaseException:
+        remove_uploads(stored)
+        raise
+    return stored, skipped
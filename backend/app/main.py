@@ -1,10 +1,13 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .core.config import settings
-from .core.database import engine, Base
+from .core.database import engine, Base, add_missing_columns
 from .api.routes import documents, query, conversations, admin, stats, auth
 from .core.auth import seed_admin
 from .core.rate_limiter import limiter, rate_limit_exceeded_handler
+from .services.ingestion import migrate_legacy_page_texts
+from .services.embeddings import embedding_service
+from .services.ingestion_worker import ingestion_workers
 from slowapi.errors import RateLimitExceeded
 from contextlib import asynccontextmanager
 import logging
@@ -19,11 +22,25 @@ async def lifespan(app: FastAPI):
     logger.info("Initializing database...")
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        added = await conn.run_sync(add_missing_columns)
+    if added:
+        logger.info(f"Added columns to existing tables: {', '.join(added)}")
     logger.info("Database initialized.")
+
+    migrated = await migrate_legacy_page_texts()
+    if migrated:
+        logger.info(f"Moved page text of {migrated} documents to the artifact store.")
     
     # Seed admin user (currently a no-op)
     await seed_admin()
-    yield
+
+    if settings.INGEST_WORKER_MODE == "in_process":
+        await ingestion_workers.start()
+    try:
+        yield
+    finally:
+        await ingestion_workers.stop()
+        embedding_service.shutdown()
 
 app = FastAPI(
     title=settings.APP_NAME,
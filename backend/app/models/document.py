@@ -1,8 +1,12 @@
 from sqlalchemy import Column, String, Integer, DateTime, Text, Float, JSON, ForeignKey, UUID
+from sqlalchemy.orm import deferred
 from datetime import datetime
 import uuid
 from ..core.database import Base
 
+# Ingestion under way; partially_indexed documents are already queryable
+INDEXING_STATUSES = ("processing", "partially_indexed")
+
 class Document(Base):
     __tablename__ = "documents"
 
@@ -12,18 +16,21 @@ class Document(Base):
     original_filename = Column(String(255), nullable=False)
     file_size = Column(Integer, nullable=False)
     file_type = Column(String(50), nullable=False)
+    content_hash = Column(String(64), nullable=True, index=True)  # SHA-256 of the uploaded bytes
+    artifact_key = Column(String(64), nullable=True, index=True)  # extracted page text in the artifact store
     upload_date = Column(DateTime, default=datetime.utcnow)
 
     # Processing metadata
     total_pages = Column(Integer, nullable=True)
     chunk_count = Column(Integer, default=0)
-    processing_status = Column(String(50), default="pending")  # pending, processing, completed, failed
+    processing_status = Column(String(50), default="pending")  # pending, processing, partially_indexed, completed, failed
 
     # Qdrant reference
     qdrant_collection_id = Column(String(255), nullable=True)
 
-    # Metadata
-    metadata_ = Column("metadata", JSON, nullable=True) 
+    # Metadata; deferred so listings don't load it, use undefer(Document.metadata_) where needed.
+    # Page text is not kept here but in the artifact store (artifact_key).
+    metadata_ = deferred(Column("metadata", JSON, nullable=True))
 
     def __repr__(self):
         return f"<Document {self.filename}>"
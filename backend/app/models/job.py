@@ -0,0 +1,37 @@
+from sqlalchemy import Column, String, Integer, Float, DateTime, Text, ForeignKey, UUID
+from datetime import datetime
+import uuid
+from ..core.database import Base
+
+class IngestionJob(Base):
+    """Durable ingestion work item, leased by a worker while it runs"""
+    __tablename__ = "ingestion_jobs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    document_id = Column(UUID(as_uuid=True), ForeignKey("documents.id"), nullable=False, index=True)
+    file_path = Column(String(1024), nullable=False)
+    kind = Column(String(20), default="ingest")  # ingest, update, rechunk
+    batch_id = Column(UUID(as_uuid=True), nullable=True, index=True)  # bulk upload, ingested together
+
+    # Fair-share scheduling: estimated work and virtual finish time in the owner's queue
+    user_id = Column(UUID(as_uuid=True), nullable=True, index=True)
+    cost = Column(Float, default=1.0)
+    finish_tag = Column(Float, default=0.0, index=True)
+
+    status = Column(String(20), default="queued", index=True)  # queued, running, succeeded, failed
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=3)
+    available_at = Column(DateTime, default=datetime.utcnow, index=True)  # retry backoff
+    last_error = Column(Text, nullable=True)
+
+    # Lease held by the worker currently running the job
+    lease_owner = Column(String(255), nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<IngestionJob {self.id} {self.status}>"
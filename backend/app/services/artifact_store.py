@@ -0,0 +1,163 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from typing import Dict, Optional
+
+from ..core.config import settings
+
+
+class ArtifactWriter:
+    """
+    Streams page texts into a new artifact as they are extracted, so a
+    document's pages are never all held in memory. Pages are added in page
+    order with `writer[page] = text`; commit() stores the artifact under the
+    key put_pages would give the same pages.
+
+    The temp file is only opened with the first page, and a failed write
+    does not raise until commit(): the artifact is only needed for
+    re-chunking, so extraction carries on without it.
+    """
+
+    def __init__(self, store: "ArtifactStore"):
+        self._store = store
+        self._count = 0
+        self._hash = hashlib.sha256()
+        self._error: Optional[Exception] = None
+        self._tmp_path: Optional[str] = None
+        self._file = None
+        self._gzip = None
+        self._done = False
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __setitem__(self, page: int, text: str):
+        entry = json.dumps([page, text], ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self._write(b"," + entry if self._count else b'{"pages":[' + entry)
+        self._count += 1
+
+    def commit(self) -> str:
+        """Finish the artifact and return its key"""
+        if self._done and self._error is None:
+            raise RuntimeError("Artifact was already committed or discarded")
+        self._write(b"]}" if self._count else b'{"pages":[]}')
+        if self._error is not None:
+            raise self._error
+        self._close()
+        self._done = True
+        key = self._hash.hexdigest()
+        path = self._store._path(key)
+        if os.path.exists(path):
+            os.remove(self._tmp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(self._tmp_path, path)
+        self._tmp_path = None
+        return key
+
+    def discard(self):
+        """Drop an unfinished artifact; a no-op once committed"""
+        self._done = True
+        self._close()
+        if self._tmp_path is not None and os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+        self._tmp_path = None
+
+    def __del__(self):
+        # A run dropped before commit() must not leave its temp file behind
+        try:
+            self.discard()
+        except Exception:
+            pass
+
+    def _write(self, data: bytes):
+        if self._error is not None or self._done:
+            return
+        try:
+            if self._gzip is None:
+                os.makedirs(self._store.root, exist_ok=True)
+                fd, self._tmp_path = tempfile.mkstemp(dir=self._store.root, suffix=".tmp")
+                self._file = os.fdopen(fd, "wb")
+                self._gzip = gzip.GzipFile(fileobj=self._file, mode="wb", compresslevel=6)
+            self._hash.update(data)
+            self._gzip.write(data)
+        except OSError as e:
+            self._error = e
+            try:
+                self.discard()
+            except OSError:
+                pass
+
+    def _close(self):
+        gzip_file, self._gzip = self._gzip, None
+        raw_file, self._file = self._file, None
+        try:
+            if gzip_file is not None:
+                gzip_file.close()
+        finally:
+            if raw_file is not None:
+                raw_file.close()
+
+
+class ArtifactStore:
+    """
+    Content-addressed store for extracted page text.
+
+    Each document's cleaned pages are kept as one gzip-compressed JSON file
+    named by the SHA-256 of its contents, so identical extractions share a
+    file and re-chunking never has to parse the original upload again.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.json.gz")
+
+    def put_pages(self, pages: Dict[int, str]) -> str:
+        """Store page texts and return their key; existing artifacts are not rewritten"""
+        payload = json.dumps(
+            {"pages": [[page, text] for page, text in sorted(pages.items())]},
+            ensure_ascii=False,
+            separators=(",", ":")
+        ).encode("utf-8")
+        key = hashlib.sha256(payload).hexdigest()
+        path = self._path(key)
+        if os.path.exists(path):
+            return key
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temp file first so readers never see a partial artifact
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                tmp.write(gzip.compress(payload, compresslevel=6))
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return key
+
+    def open_pages(self) -> ArtifactWriter:
+        """Start an artifact that is written page by page, see ArtifactWriter"""
+        return ArtifactWriter(self)
+
+    def get_pages(self, key: str) -> Dict[int, str]:
+        with gzip.open(self._path(key), "rb") as artifact:
+            payload = json.loads(artifact.read())
+        return {page: text for page, text in payload["pages"]}
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def delete(self, key: str):
+        path = self._path(key)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+# Singleton instance
+artifact_store = ArtifactStore(root=settings.ARTIFACT_DIR)
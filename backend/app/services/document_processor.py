@@ -1,49 +1,585 @@
 import PyPDF2
 import pdfplumber
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple, Iterator, Optional, Callable, Sequence
 from pathlib import Path
+from array import array
+from bisect import bisect_right
+from collections import Counter, deque
+from itertools import islice
+import multiprocessing
+import os
 import re
+import time
 from ..core.config import settings
 
 class Chunk:
-    def __init__(self, text: str, metadata: Dict[str, Any]):
-        self.text = text
+    """
+    A [start, end) span of a page buffer. The chunks of a page share one
+    page string and keep only offsets, so overlapping chunks waiting in the
+    ingestion pipeline hold no text of their own; `text` is sliced out when
+    it is hashed, embedded or upserted. `Chunk(text, metadata)` still wraps
+    a standalone string.
+    """
+
+    __slots__ = ("page_text", "start", "end", "metadata")
+
+    def __init__(self, text: str, metadata: Dict[str, Any], start: int = 0, end: Optional[int] = None):
+        self.page_text = text
+        self.start = start
+        self.end = len(text) if end is None else end
         self.metadata = metadata
 
+    @property
+    def text(self) -> str:
+        if self.start == 0 and self.end == len(self.page_text):
+            return self.page_text
+        return self.page_text[self.start:self.end]
+
+
+# Extractor names recorded per page
+FAST_EXTRACTOR = "pypdf2"
+LAYOUT_EXTRACTOR = "pdfplumber"
+
+# Fast-path text looks broken when words run together or fall apart into letters
+_MAX_MEAN_WORD_LENGTH = 12
+_MAX_SINGLE_CHAR_WORD_RATIO = 0.4
+_MAX_GARBAGE_RATIO = 0.05
+_GARBAGE = re.compile(r'\ufffd|\(cid:\d+\)|[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _fast_text_ok(text: str) -> bool:
+    """Cheap quality check of a page extracted without layout analysis"""
+    if len(text.strip()) < settings.PDF_FAST_MIN_CHARS:
+        return False
+    words = text.split()
+    if not words:
+        return False
+    letters = sum(len(word) for word in words)
+    if letters / len(words) > _MAX_MEAN_WORD_LENGTH:
+        return False
+    if len(words) >= 20 and sum(len(word) == 1 for word in words) / len(words) > _MAX_SINGLE_CHAR_WORD_RATIO:
+        return False
+    return len(_GARBAGE.findall(text)) / len(text) <= _MAX_GARBAGE_RATIO
+
+
+class _TieredPdfReader:
+    """
+    Per-page cheap-first extraction: PyPDF2 reads the text stream directly,
+    and a page only goes through pdfplumber's layout analysis when the fast
+    text fails _fast_text_ok. pdfplumber is opened on the first escalation.
+    With PDF_EXTRACTION_STRATEGY=pdfplumber every page takes the layout path.
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self._file = None
+        self._reader = None
+        self._plumber = None
+        if settings.PDF_EXTRACTION_STRATEGY != LAYOUT_EXTRACTOR:
+            try:
+                self._file = open(file_path, 'rb')
+                self._reader = PyPDF2.PdfReader(self._file)
+            except Exception as e:
+                print(f"PyPDF2 could not open {file_path}, using pdfplumber: {e}")
+                self.close()
+
+    def page_count(self) -> int:
+        if self._reader is not None:
+            return len(self._reader.pages)
+        return len(self._layout().pages)
+
+    def _layout(self):
+        if self._plumber is None:
+            self._plumber = pdfplumber.open(self.file_path)
+        return self._plumber
+
+    def _layout_text(self, idx: int) -> str:
+        page = self._layout().pages[idx]
+        try:
+            return page.extract_text() or ""
+        finally:
+            page.close()  # drop the cached layout objects
+
+    def extract(self, idx: int) -> Tuple[str, str, float]:
+        """(text, extractor, milliseconds) for the zero-based page `idx`"""
+        started = time.perf_counter()
+        text = None
+        if self._reader is not None:
+            try:
+                text = self._reader.pages[idx].extract_text() or ""
+            except Exception as e:
+                print(f"PyPDF2 failed on page {idx + 1}, using pdfplumber: {e}")
+            if text is not None and _fast_text_ok(text):
+                return text, FAST_EXTRACTOR, (time.perf_counter() - started) * 1000
+
+        try:
+            layout_text = self._layout_text(idx)
+        except Exception as e:
+            if text is None:
+                raise
+            # Keep the fast text rather than lose the page
+            print(f"pdfplumber failed on page {idx + 1}, keeping PyPDF2 text: {e}")
+            return text, FAST_EXTRACTOR, (time.perf_counter() - started) * 1000
+        if text and not layout_text.strip():
+            # Layout path found nothing the fast path did not; its time is still counted
+            return text, FAST_EXTRACTOR, (time.perf_counter() - started) * 1000
+        return layout_text, LAYOUT_EXTRACTOR, (time.perf_counter() - started) * 1000
+
+    def close(self):
+        if self._plumber is not None:
+            self._plumber.close()
+            self._plumber = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._reader = None
+
+
+def _extract_pages_worker(file_path: str, start: int, end: Optional[int], conn):
+    """
+    Child process body: sends ("ready", total_pages) once the file is open,
+    then ("page", idx, text, extractor, ms) or ("error", idx, message) for
+    every page in [start, end); `end` is clamped to the page count, None
+    means the last page. Sends ("failed", message) instead if the file cannot
+    be read at all. The parent kills it when a page takes too long.
+    """
+    reader = None
+    try:
+        try:
+            reader = _TieredPdfReader(file_path)
+            total_pages = reader.page_count()
+        except Exception as e:
+            conn.send(("failed", str(e)))
+            return
+        conn.send(("ready", total_pages))
+        for idx in range(start, total_pages if end is None else min(end, total_pages)):
+            try:
+                conn.send(("page", idx, *reader.extract(idx)))
+            except Exception as e:
+                conn.send(("error", idx, str(e)))
+    finally:
+        if reader is not None:
+            reader.close()
+        conn.close()
+
+
+class _PageRangeWorker:
+    """One killable extraction process for pages [next_page, end); end is None until the page count is known"""
+
+    def __init__(self, file_path: str, start: int, end: Optional[int], target: Callable = _extract_pages_worker):
+        # spawn: never fork a web/worker process that holds ONNX and DB threads
+        context = multiprocessing.get_context("spawn")
+        self.next_page = start
+        self.end = end
+        self.ready = False
+        self._conn, child_conn = context.Pipe(duplex=False)
+        self._process = context.Process(target=target, args=(file_path, start, end, child_conn), daemon=True)
+        self._process.start()
+        child_conn.close()
+
+    def receive(self, timeout: float) -> Optional[tuple]:
+        """Next message, None on timeout, ("crashed",) if the process died"""
+        if not self._conn.poll(timeout):
+            return None
+        try:
+            return self._conn.recv()
+        except EOFError:
+            return ("crashed",)
+
+    def kill(self):
+        if self._process.is_alive():
+            self._process.kill()
+        self._process.join()
+        self._conn.close()
+
+
+def _page_ranges(total_pages: int, pages_per_task: int, first: int = 0) -> List[Tuple[int, int]]:
+    """Split [first, total_pages) into contiguous, ordered ranges"""
+    step = max(1, pages_per_task)
+    return [(start, min(start + step, total_pages)) for start in range(first, total_pages, step)]
+
+
+def _join_page_texts(page_texts: List[str]) -> str:
+    """Build the combined document text with page markers"""
+    return "".join(
+        f"\n\n--- Page {page_num} ---\n\n{page_text}"
+        for page_num, page_text in enumerate(page_texts, start=1)
+    ).strip()
+
+
+# Sentence terminator plus the whitespace after it; cheaper to scan than a lookbehind
+_SENTENCE_BREAK = re.compile(r'[.!?]\s+')
+_WHITESPACE = re.compile(r'\s+')
+_EXCESS_NEWLINES = re.compile(r'\n{3,}')
+
+
+def _clean_text(text: str) -> str:
+    """Collapse runs of blank lines; chunk offsets refer to the cleaned text"""
+    return _EXCESS_NEWLINES.sub('\n\n', text)
+
+
+_DIGITS = re.compile(r'\d+')
+_LETTER = re.compile(r'[^\W\d_]')
+# Longer lines are content, not running headers or footers
+_MAX_BOILERPLATE_LINE = 200
+
+
+def _boilerplate_key(line: str, page_edge: bool) -> str:
+    """
+    Normalize a line for counting. Digits only vary in the first and last
+    line of a page ("Page 3 of 40" == "Page 4 of 40"); elsewhere numbers are
+    content and must match exactly.
+    """
+    key = _WHITESPACE.sub(' ', line.strip().lower())
+    return _DIGITS.sub('#', key) if page_edge else key
+
+
+def _boilerplate_candidates(lines: List[str]) -> Dict[int, str]:
+    """Line index -> normalized key for the lines of a page that may be boilerplate"""
+    non_empty = [idx for idx, line in enumerate(lines) if line.strip()]
+    edges = {non_empty[0], non_empty[-1]} if non_empty else set()
+    return {
+        idx: _boilerplate_key(lines[idx], idx in edges)
+        for idx in non_empty
+        # Lines without letters are page numbers at the edges, but table cells elsewhere
+        if len(lines[idx]) <= _MAX_BOILERPLATE_LINE and (idx in edges or _LETTER.search(lines[idx]))
+    }
+
+
+class _BoilerplateFilter:
+    """
+    Finds lines repeated on most pages of a document (running headers,
+    footers, page numbers, legal notices) and strips them before chunking.
+
+    A line is boilerplate once it has been seen on at least
+    BOILERPLATE_MIN_PAGE_RATIO of the pages observed so far (and on
+    BOILERPLATE_MIN_PAGES pages). Counting is per page, so a line repeated
+    within one page does not qualify on its own.
+    """
+
+    def __init__(self):
+        self.pages_seen = 0
+        self.counts: Counter = Counter()
+        self.removed: Counter = Counter()
+        self.examples: Dict[str, str] = {}
+        self.removed_chars = 0
+
+    def observe(self, text: str):
+        self.pages_seen += 1
+        self.counts.update(set(_boilerplate_candidates(text.splitlines()).values()))
+
+    def _is_boilerplate(self, key: str) -> bool:
+        count = self.counts[key]
+        return (
+            count >= settings.BOILERPLATE_MIN_PAGES
+            and count >= settings.BOILERPLATE_MIN_PAGE_RATIO * self.pages_seen
+        )
+
+    def strip(self, text: str) -> str:
+        lines = text.splitlines()
+        drop = {idx: key for idx, key in _boilerplate_candidates(lines).items() if self._is_boilerplate(key)}
+        if not drop:
+            return text
+        for idx, key in drop.items():
+            self.removed[key] += 1
+            self.examples.setdefault(key, lines[idx].strip())
+            self.removed_chars += len(lines[idx]) + 1
+        return _clean_text('\n'.join(line for idx, line in enumerate(lines) if idx not in drop)).strip()
+
+    def summary(self) -> Dict[str, Any]:
+        """What was removed, for the document metadata"""
+        return {
+            "removed_lines": sum(self.removed.values()),
+            "removed_chars": self.removed_chars,
+            "lines": [
+                {"text": self.examples[key], "pages": count}
+                for key, count in self.removed.most_common(20)
+            ]
+        }
+
+
+def strip_boilerplate(pages: Dict[int, str]) -> Tuple[Dict[int, str], Dict[str, Any]]:
+    """Strip lines repeated across most of `pages`; returns (pages, removal summary)"""
+    boilerplate = _BoilerplateFilter()
+    for text in pages.values():
+        boilerplate.observe(text)
+    stripped = {page: boilerplate.strip(text) for page, text in pages.items()}
+    return stripped, boilerplate.summary()
+
+
+def _overlap_start(text: str, start: int, end: int, overlap: int) -> int:
+    """First word boundary inside the last `overlap` characters of [start, end)"""
+    pos = max(start, end - overlap)
+    if pos == start or text[pos - 1].isspace():
+        return pos
+    match = _WHITESPACE.search(text, pos, end)
+    return match.end() if match else end
+
+
+def _trim_span(text: str, start: int, end: int) -> Tuple[int, int]:
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def _sentence_bounds(text: str) -> Tuple[Sequence[int], Sequence[int]]:
+    """
+    Sentence i covers [starts[i], ends[i]) including its terminator. Kept in
+    int64 arrays: a list would hold a separate int object per offset.
+    """
+    starts, ends = array('q', [0]), array('q')
+    for match in _SENTENCE_BREAK.finditer(text):
+        ends.append(match.start() + 1)
+        starts.append(match.end())
+    ends.append(len(text))
+    return starts, ends
+
+
+def _chunk_spans(text: str, chunk_size: int, overlap: int) -> Iterator[Tuple[int, int]]:
+    """Pack sentence spans into overlapping chunk spans of at most chunk_size characters"""
+    starts, ends = _sentence_bounds(text)
+
+    sentence = 0
+    chunk_start = 0
+    while sentence < len(ends):
+        # Furthest sentence that still fits, but always take at least one
+        last = max(sentence, bisect_right(ends, chunk_start + chunk_size, lo=sentence) - 1)
+        span = _trim_span(text, chunk_start, ends[last])
+        if span[0] < span[1]:
+            yield span
+
+        sentence = last + 1
+        if sentence < len(ends):
+            chunk_start = min(_overlap_start(text, chunk_start, ends[last], overlap), starts[sentence])
+
+
+def _split_to_budget(
+    text: str, start: int, end: int, tokens: int, max_tokens: int,
+    count_tokens: Callable[[List[str]], List[int]]
+) -> List[Tuple[int, int, int]]:
+    """Halve an over-long sentence at whitespace until every piece fits max_tokens"""
+    if tokens <= max_tokens or end - start <= 1:
+        return [(start, end, tokens)]
+
+    middle = (start + end) // 2
+    gap = _WHITESPACE.search(text, middle, end) or _WHITESPACE.search(text, start + 1, middle)
+    left, right = ((start, gap.start()), (gap.end(), end)) if gap else ((start, middle), (middle, end))
+    left_tokens, right_tokens = count_tokens([text[left[0]:left[1]], text[right[0]:right[1]]])
+    return (
+        _split_to_budget(text, *left, left_tokens, max_tokens, count_tokens)
+        + _split_to_budget(text, *right, right_tokens, max_tokens, count_tokens)
+    )
+
+
+def _token_chunk_spans(
+    text: str, max_tokens: int, overlap_tokens: int,
+    count_tokens: Callable[[List[str]], List[int]]
+) -> Iterator[Tuple[int, int]]:
+    """
+    Pack sentences into chunk spans of at most max_tokens model tokens.
+    The overlap is the trailing whole sentences of the previous chunk that
+    fit in overlap_tokens.
+    """
+    starts, ends = _sentence_bounds(text)
+    counts = count_tokens([text[start:end] for start, end in zip(starts, ends)])
+    pieces: List[Tuple[int, int, int]] = []
+    for start, end, tokens in zip(starts, ends, counts):
+        pieces.extend(_split_to_budget(text, start, end, tokens, max_tokens, count_tokens))
+
+    first = 0
+    while first < len(pieces):
+        last, used = first, pieces[first][2]
+        while last + 1 < len(pieces) and used + pieces[last + 1][2] <= max_tokens:
+            last += 1
+            used += pieces[last][2]
+
+        span = _trim_span(text, pieces[first][0], pieces[last][1])
+        if span[0] < span[1]:
+            yield span
+        if last + 1 == len(pieces):
+            break
+
+        # Carry trailing sentences over, but always make progress
+        previous_first, first, carried = first, last + 1, 0
+        while first - 1 > previous_first and carried + pieces[first - 1][2] <= overlap_tokens:
+            first -= 1
+            carried += pieces[first][2]
+
+
 class DocumentProcessor:
 
     @staticmethod
-    def extract_text_from_pdf(file_path: str) -> tuple[str, Dict[str, Any]]:
+    def extract_text_from_pdf(file_path: str, parallel: bool = True) -> tuple[str, Dict[str, Any]]:
         """Extract text and metadata from PDF"""
-        text = ""
+        page_stats: List[Dict[str, Any]] = []
+        skipped_pages: List[Dict[str, Any]] = []
+        page_texts = dict(DocumentProcessor.iter_pdf_pages(
+            file_path, parallel=parallel, page_stats=page_stats, skipped_pages=skipped_pages
+        ))
+        total_pages = len(page_texts) + len(skipped_pages)
+
         metadata = {
-            "total_pages": 0,
-            "page_texts": {}
+            "total_pages": total_pages,
+            "page_texts": page_texts,
+            "page_extraction": page_stats,
+            "skipped_pages": skipped_pages
         }
+        # Skipped pages keep their marker so page numbers stay aligned
+        return _join_page_texts([page_texts.get(page_num, "") for page_num in range(1, total_pages + 1)]), metadata
 
+    @staticmethod
+    def iter_pdf_pages(
+        file_path: str,
+        parallel: bool = True,
+        page_stats: Optional[List[Dict[str, Any]]] = None,
+        skipped_pages: Optional[List[Dict[str, Any]]] = None,
+        on_total_pages: Optional[Callable[[int], None]] = None
+    ) -> Iterator[Tuple[int, str]]:
+        """
+        Yield (page_num, page_text) in page order, one page at a time.
+        `page_stats` (if given) receives {"page", "extractor", "ms"} for
+        every page as it is yielded, and `skipped_pages` receives
+        {"page", "reason"} for pages that timed out or failed in isolation.
+        `on_total_pages` is called with the page count before the first page.
+        """
+        if settings.PDF_EXTRACTION_ISOLATION:
+            pages = DocumentProcessor._iter_pdf_isolated(
+                file_path, parallel, skipped_pages if skipped_pages is not None else [],
+                on_total_pages=on_total_pages
+            )
+            for page_num, page_text, extractor, ms in pages:
+                if page_stats is not None:
+                    page_stats.append({"page": page_num, "extractor": extractor, "ms": round(ms, 1)})
+                yield page_num, page_text
+            return
+
+        reader = _TieredPdfReader(file_path)
         try:
-            # Try pdfplumber first (better for complex PDFs)
-            with pdfplumber.open(file_path) as pdf:
-                metadata["total_pages"] = len(pdf.pages)
+            total_pages = reader.page_count()
+            if on_total_pages is not None:
+                on_total_pages(total_pages)
+            for idx in range(total_pages):
+                page_text, extractor, ms = reader.extract(idx)
+                if page_stats is not None:
+                    page_stats.append({"page": idx + 1, "extractor": extractor, "ms": round(ms, 1)})
+                yield idx + 1, page_text
+        finally:
+            reader.close()
 
-                for page_num, page in enumerate(pdf.pages, start=1):
-                    page_text = page.extract_text() or ""
-                    text += f"\n\n--- Page {page_num} ---\n\n{page_text}"
-                    metadata["page_texts"][page_num] = page_text
+    @staticmethod
+    def _iter_pdf_isolated(
+        file_path: str,
+        parallel: bool,
+        skipped_pages: List[Dict[str, Any]],
+        target: Callable = _extract_pages_worker,
+        on_total_pages: Optional[Callable[[int], None]] = None
+    ) -> Iterator[Tuple[int, str, str, float]]:
+        """
+        Extract pages in killable worker processes, yielding
+        (page_num, text, extractor, ms) in page order.
 
-        except Exception as e:
-            # Fallback to PyPDF2
-            print(f"pdfplumber failed, using PyPDF2: {e}")
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                metadata["total_pages"] = len(pdf_reader.pages)
+        The file is only ever parsed in the workers: the first one reports
+        the page count, and its wait counts against the document budget. If
+        it cannot (timeout, crash, unreadable file) a ValueError is raised.
+        A page that takes longer than PDF_PAGE_TIMEOUT_SECONDS (or crashes its
+        worker) is skipped and its worker restarted on the next page. Once the
+        time spent waiting on extraction exceeds PDF_DOCUMENT_TIMEOUT_SECONDS
+        every remaining page is skipped. Large documents are split into page
+        ranges extracted by up to PDF_EXTRACTION_WORKERS processes at once.
+        """
+        max_workers = max(1, min(settings.PDF_EXTRACTION_WORKERS, os.cpu_count() or 1)) if parallel else 1
+        total_pages = None
+        ranges: Iterator[Tuple[int, int]] = iter(())
+
+        def skip(start: int, end: int, reason: str):
+            skipped_pages.extend({"page": idx + 1, "reason": reason} for idx in range(start, end))
 
-                for page_num, page in enumerate(pdf_reader.pages, start=1):
-                    page_text = page.extract_text() or ""
-                    text += f"\n\n--- Page {page_num} ---\n\n{page_text}"
-                    metadata["page_texts"][page_num] = page_text
+        def unreadable(reason: str) -> ValueError:
+            return ValueError(f"Could not read the page count of {file_path}: {reason}")
+
+        budget = float(settings.PDF_DOCUMENT_TIMEOUT_SECONDS)
+        # Until the page count is in, one worker takes the first range (all pages when not parallel)
+        first_end = settings.PDF_PAGES_PER_TASK if max_workers > 1 else None
+        active = deque([_PageRangeWorker(file_path, 0, first_end, target)])
+        try:
+            while active:
+                worker = active[0]
+                if worker.end is not None and worker.next_page >= worker.end:
+                    active.popleft().kill()
+                    next_range = next(ranges, None)
+                    if next_range is not None:
+                        active.append(_PageRangeWorker(file_path, *next_range, target))
+                    continue
+                if budget <= 0:
+                    if total_pages is None:
+                        raise unreadable("document_timeout")
+                    break
 
-        return text.strip(), metadata
+                started = time.monotonic()
+                message = worker.receive(min(budget, settings.PDF_PAGE_TIMEOUT_SECONDS))
+                # Only time spent waiting on extraction counts, not time the consumer took
+                budget -= time.monotonic() - started
+
+                if message is None or message[0] == "crashed":
+                    reason = "timeout" if message is None else "crashed"
+                    worker.kill()
+                    if total_pages is None:
+                        raise unreadable("document_timeout" if budget <= 0 else reason)
+                    if budget <= 0:
+                        break
+                    if not worker.ready:
+                        # Could not even open the file; retrying page by page would not help
+                        skip(worker.next_page, worker.end, reason)
+                        worker.next_page = worker.end
+                        continue
+                    print(f"Skipping page {worker.next_page + 1} of {file_path}: {reason}")
+                    skip(worker.next_page, worker.next_page + 1, reason)
+                    if worker.next_page + 1 < worker.end:
+                        active[0] = _PageRangeWorker(file_path, worker.next_page + 1, worker.end, target)
+                    else:
+                        worker.next_page = worker.end
+                elif message[0] == "failed":
+                    worker.kill()
+                    if total_pages is None:
+                        raise unreadable(message[1])
+                    skip(worker.next_page, worker.end, "error")
+                    worker.next_page = worker.end
+                elif message[0] == "ready":
+                    worker.ready = True
+                    if total_pages is None:
+                        total_pages = message[1]
+                        if on_total_pages is not None:
+                            on_total_pages(total_pages)
+                        worker.end = total_pages if worker.end is None else min(worker.end, total_pages)
+                        if max_workers > 1 and total_pages >= settings.PDF_PARALLEL_MIN_PAGES:
+                            ranges = iter(_page_ranges(total_pages, settings.PDF_PAGES_PER_TASK, worker.end))
+                            # Later ranges run ahead while the first one is read; pipes bound how far
+                            active.extend(
+                                _PageRangeWorker(file_path, *page_range, target)
+                                for page_range in islice(ranges, max_workers - 1)
+                            )
+                        elif worker.end < total_pages:
+                            ranges = iter([(worker.end, total_pages)])
+                elif message[0] == "error":
+                    _, idx, error = message
+                    print(f"Skipping page {idx + 1} of {file_path}: {error}")
+                    skip(idx, idx + 1, "error")
+                    worker.next_page = idx + 1
+                else:
+                    _, idx, page_text, extractor, ms = message
+                    worker.next_page = idx + 1
+                    yield idx + 1, page_text, extractor, ms
+
+            # Document budget exhausted: nothing that was not delivered yet gets in
+            for worker in active:
+                skip(worker.next_page, worker.end, "document_timeout")
+            for start, end in ranges:
+                skip(start, end, "document_timeout")
+        finally:
+            for worker in active:
+                worker.kill()
 
     @staticmethod
     def extract_text_from_txt(file_path: str) -> tuple[str, Dict[str, Any]]:
@@ -53,11 +589,117 @@ class DocumentProcessor:
 
         metadata = {
             "total_pages": 1,
-            "line_count": len(text.split('\n'))
+            "line_count": text.count('\n') + 1
         }
 
         return text, metadata
 
+    @staticmethod
+    def iter_document_chunks(
+        file_path: str,
+        document_id: str,
+        filename: str,
+        metadata: Dict[str, Any],
+        extra_metadata: Optional[Dict[str, Any]] = None,
+        pages: Optional[Dict[int, str]] = None
+    ) -> Iterator[Chunk]:
+        """
+        Stream chunks page by page without materializing the whole document.
+        `metadata` is filled in as pages are read, and `pages` (if given)
+        is handed the cleaned text of every page, in page order, as
+        `pages[page] = text` (a dict, or an ArtifactWriter streaming them to
+        disk); page text is never put in `metadata`, which ends up in the
+        documents table. Raises ValueError
+        at the end if every page of a PDF was skipped.
+        """
+        base_metadata = {"document_id": document_id, "filename": filename, **(extra_metadata or {})}
+
+        if not file_path.endswith(".pdf"):
+            text, txt_metadata = DocumentProcessor.extract_text_from_txt(file_path)
+            metadata.update(txt_metadata)
+            text = _clean_text(text)
+            if pages is not None:
+                pages[1] = text
+            yield from DocumentProcessor._iter_chunk_text(text, {**base_metadata, "page": 1})
+            return
+
+        page_stats = metadata.setdefault("page_extraction", [])
+        skipped_pages = metadata.setdefault("skipped_pages", [])
+
+        boilerplate = None
+        # Pages held back until the filter has seen enough of the document
+        held: List[Tuple[int, str]] = []
+
+        def on_total_pages(total_pages: int):
+            nonlocal boilerplate
+            metadata["total_pages"] = total_pages
+            if settings.BOILERPLATE_FILTER and total_pages >= settings.BOILERPLATE_MIN_PAGES:
+                boilerplate = _BoilerplateFilter()
+
+        def release(page_num: int, page_text: str) -> Iterator[Chunk]:
+            if boilerplate is not None:
+                page_text = boilerplate.strip(page_text)
+            if pages is not None:
+                pages[page_num] = page_text
+            return DocumentProcessor._iter_chunk_text(
+                page_text,
+                {**base_metadata, "page": page_num, "total_pages": metadata["total_pages"]}
+            )
+
+        # The page count comes from the extraction itself, before its first page
+        for page_num, page_text in DocumentProcessor.iter_pdf_pages(
+            file_path, page_stats=page_stats, skipped_pages=skipped_pages, on_total_pages=on_total_pages
+        ):
+            page_text = _clean_text(page_text)
+            if boilerplate is None:
+                yield from release(page_num, page_text)
+                continue
+            boilerplate.observe(page_text)
+            held.append((page_num, page_text))
+            if boilerplate.pages_seen >= settings.BOILERPLATE_SAMPLE_PAGES:
+                for held_page in held:
+                    yield from release(*held_page)
+                held.clear()
+
+        for held_page in held:
+            yield from release(*held_page)
+        if boilerplate is not None:
+            metadata["boilerplate"] = boilerplate.summary()
+        if skipped_pages and not page_stats:
+            # Nothing was indexed; completing the document would hide that
+            reasons = Counter(page["reason"] for page in skipped_pages)
+            raise ValueError(
+                "No page could be extracted ("
+                + ", ".join(f"{count} {reason}" for reason, count in reasons.most_common()) + ")"
+            )
+
+    @staticmethod
+    def iter_page_chunks(
+        pages: Dict[int, str],
+        document_id: str,
+        filename: str,
+        total_pages: Optional[int] = None,
+        extra_metadata: Optional[Dict[str, Any]] = None
+    ) -> Iterator[Chunk]:
+        """
+        Chunk already extracted and cleaned page texts (e.g. from the artifact
+        store) with the current chunking settings. `total_pages` is only set
+        on PDF chunks, matching iter_document_chunks.
+        """
+        base_metadata = {"document_id": document_id, "filename": filename, **(extra_metadata or {})}
+        for page_num, page_text in sorted(pages.items()):
+            page_metadata = {**base_metadata, "page": page_num}
+            if total_pages is not None:
+                page_metadata["total_pages"] = total_pages
+            yield from DocumentProcessor._iter_chunk_text(page_text, page_metadata)
+
+    @staticmethod
+    def chunking_settings() -> Dict[str, Any]:
+        """The settings chunks are currently cut with; a change means re-chunking"""
+        if settings.CHUNK_SIZE_UNIT == "tokens":
+            return {"unit": "tokens", "size": settings.CHUNK_MAX_TOKENS, "overlap": settings.CHUNK_OVERLAP_TOKENS}
+        return {"unit": "chars", "size": settings.CHUNK_SIZE, "overlap": settings.CHUNK_OVERLAP}
+
     @staticmethod
     def smart_chunk(text: str, document_id: str, filename: str, metadata: Dict[str, Any]) -> List[Chunk]:
         """
@@ -66,11 +708,14 @@ class DocumentProcessor:
         chunks = []
 
         # Clean text
-        text = re.sub(r'\n{3,}', '\n\n', text)  # Remove excessive newlines
+        text = _clean_text(text)  # Remove excessive newlines
 
         # Split by pages if available
         if "page_texts" in metadata:
-            for page_num, page_text in metadata["page_texts"].items():
+            page_texts = {page_num: _clean_text(page_text) for page_num, page_text in metadata["page_texts"].items()}
+            if settings.BOILERPLATE_FILTER and len(page_texts) >= settings.BOILERPLATE_MIN_PAGES:
+                page_texts, metadata["boilerplate"] = strip_boilerplate(page_texts)
+            for page_num, page_text in page_texts.items():
                 page_chunks = DocumentProcessor._chunk_text(
                     page_text,
                     {
@@ -97,50 +742,48 @@ class DocumentProcessor:
     @staticmethod
     def _chunk_text(text: str, base_metadata: Dict[str, Any]) -> List[Chunk]:
         """Helper function to chunk text with overlap"""
-        chunks = []
+        return list(DocumentProcessor._iter_chunk_text(text, base_metadata))
+
+    @staticmethod
+    def _iter_chunk_text(text: str, base_metadata: Dict[str, Any]) -> Iterator[Chunk]:
+        """
+        Yield overlapping chunks of a single page.
+
+        Works on character offsets into `text`: sentences are packed into
+        [start, end) spans of at most CHUNK_SIZE characters (a single longer
+        sentence becomes its own chunk); chunks keep the span, not a copy.
+        The overlap is the tail of the previous span, snapped forward to a
+        word boundary. Runs in linear time.
 
-        # Split by sentences (rough)
-        sentences = re.split(r'(?<=[.!?])\s+', text)
-
-        current_chunk = ""
-        current_length = 0
-
-        for sentence in sentences:
-            sentence_length = len(sentence)
-
-            if current_length + sentence_length < settings.CHUNK_SIZE:
-                current_chunk += sentence + " "
-                current_length += sentence_length
-            else:
-                # Save current chunk
-                if current_chunk.strip():
-                    chunks.append(Chunk(
-                        text=current_chunk.strip(),
-                        metadata={
-                            **base_metadata,
-                            "chunk_index": len(chunks),
-                            "chunk_length": len(current_chunk)
-                        }
-                    ))
-
-                # Start new chunk with overlap
-                overlap_size = settings.CHUNK_OVERLAP
-                overlap_text = current_chunk[-overlap_size:] if len(current_chunk) > overlap_size else current_chunk
-                current_chunk = overlap_text + sentence + " "
-                current_length = len(current_chunk)
-
-        # Add last chunk
-        if current_chunk.strip():
-            chunks.append(Chunk(
-                text=current_chunk.strip(),
+        With CHUNK_SIZE_UNIT="tokens" the budget is CHUNK_MAX_TOKENS of the
+        embedding model's tokenizer instead, so chunks fill the model window
+        without being truncated; the overlap is then whole sentences.
+        """
+        if settings.CHUNK_SIZE_UNIT == "tokens":
+            # Imported lazily so PDF extraction subprocesses don't load the model
+            from .embeddings import embedding_service
+            spans = _token_chunk_spans(
+                text, settings.CHUNK_MAX_TOKENS, settings.CHUNK_OVERLAP_TOKENS, embedding_service.count_tokens
+            )
+        else:
+            spans = _chunk_spans(text, settings.CHUNK_SIZE, settings.CHUNK_OVERLAP)
+
+        chunk_index = 0
+        for start, end in spans:
+            yield Chunk(
+                text,
+                start=start,
+                end=end,
                 metadata={
                     **base_metadata,
-                    "chunk_index": len(chunks),
-                    "chunk_length": len(current_chunk)
+                    "chunk_index": chunk_index,
+                    "chunk_length": end - start,
+                    "start": start,
+                    "end": end
                 }
-            ))
+            )
+            chunk_index += 1
 
-        return chunks
 
 # Singleton instance
 document_processor = DocumentProcessor()
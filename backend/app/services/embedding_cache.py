@@ -0,0 +1,236 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..core.config import settings
+
+# Stay well below SQLite's bound-parameter limit
+_LOOKUP_BATCH = 500
+
+
+class EmbeddingCache:
+    """
+    Disk-backed embedding cache keyed by (model_name, sha1(text)).
+
+    Vectors are stored as float32 blobs in SQLite. When the stored vectors
+    exceed `max_bytes`, the least recently used entries are evicted.
+    Safe to share between threads (embed_batch runs in worker threads).
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._total_bytes = 0
+        self._clock = 0  # logical LRU clock, bumped on every access
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    nbytes INTEGER NOT NULL,
+                    last_used INTEGER NOT NULL,
+                    PRIMARY KEY (model, text_hash)
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_embeddings_last_used ON embeddings (last_used)")
+            conn.commit()
+            self._total_bytes, self._clock = conn.execute(
+                "SELECT COALESCE(SUM(nbytes), 0), COALESCE(MAX(last_used), 0) FROM embeddings"
+            ).fetchone()
+            self._conn = conn
+        return self._conn
+
+    def get_many(self, model_name: str, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Return the cached vector for each text, or None on a miss"""
+        hashes = [self.text_hash(text) for text in texts]
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            conn = self._connection()
+            unique = list(dict.fromkeys(hashes))
+            for start in range(0, len(unique), _LOOKUP_BATCH):
+                batch = unique[start:start + _LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model_name, *batch]
+                ).fetchall()
+                for text_hash, blob in rows:
+                    found[text_hash] = np.frombuffer(blob, dtype=np.float32)
+
+            if found:
+                self._clock += 1
+                now = self._clock
+                conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model_name, text_hash) for text_hash in found]
+                )
+                conn.commit()
+
+            results = [found.get(text_hash) for text_hash in hashes]
+            hit_count = sum(vector is not None for vector in results)
+            self.hits += hit_count
+            self.misses += len(results) - hit_count
+        return results
+
+    def put_many(self, model_name: str, texts: Sequence[str], vectors: Sequence[np.ndarray]):
+        blobs = {}
+        for text, vector in zip(texts, vectors):
+            blobs[self.text_hash(text)] = np.asarray(vector, dtype=np.float32).tobytes()
+
+        with self._lock:
+            conn = self._connection()
+            self._clock += 1
+            rows = {
+                text_hash: (model_name, text_hash, blob, len(blob), self._clock)
+                for text_hash, blob in blobs.items()
+            }
+            # Replaced rows must not be double counted
+            existing = 0
+            hashes = list(rows)
+            for start in range(0, len(hashes), _LOOKUP_BATCH):
+                batch = hashes[start:start + _LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                existing += conn.execute(
+                    f"SELECT COALESCE(SUM(nbytes), 0) FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model_name, *batch]
+                ).fetchone()[0]
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, nbytes, last_used) VALUES (?, ?, ?, ?, ?)",
+                list(rows.values())
+            )
+            self._total_bytes += sum(row[3] for row in rows.values()) - existing
+            self._evict(conn)
+            conn.commit()
+
+    def _evict(self, conn: sqlite3.Connection):
+        while self._total_bytes > self.max_bytes:
+            victims = conn.execute(
+                "SELECT model, text_hash, nbytes FROM embeddings ORDER BY last_used LIMIT 256"
+            ).fetchall()
+            if not victims:
+                self._total_bytes = 0
+                break
+            freed = 0
+            evicted = []
+            for model_name, text_hash, nbytes in victims:
+                evicted.append((model_name, text_hash))
+                freed += nbytes
+                if self._total_bytes - freed <= self.max_bytes:
+                    break
+            conn.executemany("DELETE FROM embeddings WHERE model = ? AND text_hash = ?", evicted)
+            self._total_bytes -= freed
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._connection().execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": entries,
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+def normalize_query(text: str) -> str:
+    """Unicode-normalized, case-folded, whitespace-collapsed question without trailing punctuation"""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return re.sub(r"\s+", " ", text).strip().rstrip("?!. ").strip()
+
+
+class QueryEmbeddingCache:
+    """
+    In-memory LRU of question embeddings keyed by (model_name, normalized
+    question), bounded by entry count and by vector bytes. Vectors are
+    kept as float32 arrays. Safe to share between threads and event loops.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, model_name: str, query: str) -> Optional[np.ndarray]:
+        """`query` is expected to be normalized already (normalize_query)"""
+        with self._lock:
+            vector = self._entries.get((model_name, query))
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((model_name, query))
+            self.hits += 1
+            return vector
+
+    def put(self, model_name: str, query: str, vector: Sequence[float]):
+        # A copy: a row view would keep the caller's whole batch matrix alive
+        vector = np.array(vector, dtype=np.float32)
+        with self._lock:
+            previous = self._entries.pop((model_name, query), None)
+            if previous is not None:
+                self._total_bytes -= previous.nbytes
+            self._entries[(model_name, query)] = vector
+            self._total_bytes += vector.nbytes
+            while self._entries and (len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._total_bytes -= evicted.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+# Singleton instances
+embedding_cache = EmbeddingCache(
+    path=settings.EMBEDDING_CACHE_PATH,
+    max_bytes=settings.EMBEDDING_CACHE_MAX_BYTES
+)
+query_embedding_cache = QueryEmbeddingCache(
+    max_entries=settings.QUERY_EMBED_CACHE_ENTRIES,
+    max_bytes=settings.QUERY_EMBED_CACHE_MAX_BYTES
+)
@@ -0,0 +1,100 @@
+import asyncio
+import itertools
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Sequence
+
+import numpy as np
+
+from .embeddings import embedding_service
+from ..core.config import settings
+from ..core.metrics import percentiles
+
+logger = logging.getLogger(__name__)
+
+# Priority classes, lower runs first
+INTERACTIVE = 0
+BULK = 1
+PRIORITY_CLASSES = {INTERACTIVE: "interactive", BULK: "bulk"}
+
+
+class EmbeddingScheduler:
+    """
+    The one thread that runs the embedding model. Work is taken in priority
+    order, so a query embedding waits for at most the model call already
+    running. Bulk ingestion batches are cut into EMBED_BULK_SLICE_SIZE
+    slices, which bounds that wait while an upload saturates the CPU.
+    """
+
+    def __init__(self):
+        self._queue: queue.PriorityQueue = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._waits = {priority: deque(maxlen=1000) for priority in PRIORITY_CLASSES}
+        self._runs = {priority: deque(maxlen=1000) for priority in PRIORITY_CLASSES}
+        self._completed = dict.fromkeys(PRIORITY_CLASSES, 0)
+        self._waiting = dict.fromkeys(PRIORITY_CLASSES, 0)
+
+    def submit(self, priority: int, fn: Callable, *args) -> Future:
+        future = Future()
+        with self._lock:
+            self._waiting[priority] += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._work, name="embedding-scheduler", daemon=True)
+                self._thread.start()
+        self._queue.put((priority, next(self._sequence), time.perf_counter(), fn, args, future))
+        return future
+
+    async def run(self, priority: int, fn: Callable, *args) -> Any:
+        # Cancelling the caller cancels the job if it has not started yet
+        return await asyncio.wrap_future(self.submit(priority, fn, *args))
+
+    async def embed_bulk(self, texts: Sequence[str]) -> np.ndarray:
+        """embedding_service.embed_batch for ingestion, run as low-priority slices"""
+        # Worker processes embed a slice in parallel, so it may be that many times larger
+        size = max(1, settings.EMBED_BULK_SLICE_SIZE) * max(1, settings.EMBEDDING_WORKERS)
+        parts = await asyncio.gather(*(
+            self.run(BULK, embedding_service.embed_batch, list(texts[start:start + size]))
+            for start in range(0, len(texts), size)
+        ))
+        return np.concatenate([np.asarray(part, dtype=np.float32) for part in parts])
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Queue wait and model time in milliseconds per priority class, over the last 1000 jobs"""
+        with self._lock:
+            return {
+                name: {
+                    "completed": self._completed[priority],
+                    "waiting": self._waiting[priority],
+                    "wait_ms": percentiles(self._waits[priority]),
+                    "run_ms": percentiles(self._runs[priority])
+                }
+                for priority, name in PRIORITY_CLASSES.items()
+            }
+
+    def _work(self):
+        while True:
+            priority, _, queued_at, fn, args, future = self._queue.get()
+            started = time.perf_counter()
+            with self._lock:
+                self._waiting[priority] -= 1
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args))
+            except Exception as e:
+                future.set_exception(e)
+            finished = time.perf_counter()
+            with self._lock:
+                self._completed[priority] += 1
+                self._waits[priority].append((started - queued_at) * 1000)
+                self._runs[priority].append((finished - started) * 1000)
+
+
+# Singleton instance
+embedding_scheduler = EmbeddingScheduler()
@@ -1,22 +1,35 @@
 from fastembed import TextEmbedding
-from typing import List
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Iterable, List, Optional, Sequence
+import math
+import multiprocessing
 import numpy as np
 import re
 import hashlib
+import threading
+from .embedding_cache import embedding_cache
 from ..core.config import settings
 
 class EmbeddingService:
-    def __init__(self):
+    def __init__(self, threads: Optional[int] = None):
         # fastembed is much faster and doesn't require torch
         self.model_name = "BAAI/bge-small-en-v1.5" # Very fast and efficient
+        self.threads = threads  # ONNX intra-op threads, None lets onnxruntime decide
         self._model = None
+        self._tokenizer = None
+        self._token_counts: OrderedDict = OrderedDict()
+        self._token_lock = threading.Lock()
+        self._workers: Optional["EmbeddingWorkerPool"] = None
+        self._workers_lock = threading.Lock()
 
     @property
     def model(self):
         if self._model is None:
             try:
                 print(f"Loading fastembed model: {self.model_name}...")
-                self._model = TextEmbedding(model_name=self.model_name)
+                self._model = TextEmbedding(model_name=self.model_name, threads=self.threads)
                 print("Fastembed model loaded.")
             except Exception as e:
                 print(f"Fastembed model load failed: {e}")
@@ -24,12 +37,12 @@ class EmbeddingService:
                 return None
         return self._model
 
-    def _fallback_embed_text(self, text: str) -> List[float]:
+    def _fallback_embed_text(self, text: str) -> np.ndarray:
         dim = settings.EMBEDDING_DIMENSION
         vec = np.zeros(dim, dtype=np.float32)
         tokens = re.findall(r"\w+", (text or "").lower())
         if not tokens:
-            return vec.tolist()
+            return vec
 
         for tok in tokens:
             h = int(hashlib.md5(tok.encode("utf-8")).hexdigest(), 16)
@@ -40,29 +53,176 @@ class EmbeddingService:
         norm = np.linalg.norm(vec)
         if norm > 0:
             vec = vec / norm
-        return vec.tolist()
+        return vec
 
     def embed_text(self, text: str) -> List[float]:
         """Generate embedding for a single text"""
+        return self.embed_texts([text])[0].tolist()
+
+    def embed_texts(self, texts: List[str]) -> np.ndarray:
+        """Embed texts in one model call, bypassing the chunk cache (query embeddings)"""
         if self.model is None:
-            return self._fallback_embed_text(text)
-        
+            return _as_matrix(self._fallback_embed_text(t) for t in texts)
+
         # fastembed.embed returns a generator
-        embeddings = list(self.model.embed([text]))
-        return embeddings[0].tolist()
+        return _as_matrix(self.model.embed(texts))
 
-    def embed_batch(self, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings for multiple texts"""
+    def embed_batch(self, texts: List[str]) -> np.ndarray:
+        """
+        Embeddings of `texts` as one contiguous float32 matrix, one row per
+        text, only running the model on cache misses
+        """
         if self.model is None:
-            return [self._fallback_embed_text(t) for t in texts]
-            
-        embeddings = list(self.model.embed(texts))
-        return [e.tolist() for e in embeddings]
+            return _as_matrix(self._fallback_embed_text(t) for t in texts)
+
+        if not settings.EMBEDDING_CACHE_ENABLED:
+            return self._embed_uncached(texts)
+
+        embeddings = embedding_cache.get_many(self.model_name, texts)
+        # Identical texts in one batch (repeated boilerplate) are embedded once
+        missing = list(dict.fromkeys(t for t, e in zip(texts, embeddings) if e is None))
+        if missing:
+            computed = dict(zip(missing, self._embed_uncached(missing)))
+            embedding_cache.put_many(self.model_name, missing, [computed[t] for t in missing])
+            embeddings = [computed[t] if e is None else e for t, e in zip(texts, embeddings)]
+
+        return _as_matrix(embeddings)
+
+    def _embed_uncached(self, texts: List[str]) -> np.ndarray:
+        """Model embeddings, sharded across the worker processes when EMBEDDING_WORKERS > 1"""
+        workers = self._worker_pool()
+        if workers is not None and len(texts) >= 2 * settings.EMBEDDING_WORKER_MIN_SHARD:
+            return workers.embed(texts)
+        return _as_matrix(self.model.embed(texts))
+
+    def _worker_pool(self) -> Optional["EmbeddingWorkerPool"]:
+        if settings.EMBEDDING_WORKERS <= 1:
+            return None
+        with self._workers_lock:
+            if self._workers is None:
+                self._workers = EmbeddingWorkerPool(settings.EMBEDDING_WORKERS, settings.EMBEDDING_WORKER_THREADS)
+            return self._workers
+
+    def shutdown(self):
+        """Stop the embedding worker processes, if any were started"""
+        with self._workers_lock:
+            if self._workers is not None:
+                self._workers.shutdown()
+                self._workers = None
+
+    @property
+    def tokenizer(self):
+        """The model's tokenizer without truncation or padding, for measuring text"""
+        if self._tokenizer is None and self.model is not None:
+            source = getattr(getattr(self.model, "model", None), "tokenizer", None)
+            if source is not None:
+                # Copy it: the embedding path still needs truncation at the model window
+                tokenizer = type(source).from_str(source.to_str())
+                tokenizer.no_truncation()
+                tokenizer.no_padding()
+                self._tokenizer = tokenizer
+        return self._tokenizer
+
+    def count_tokens(self, texts: Sequence[str]) -> List[int]:
+        """
+        Number of model tokens in each text, excluding special tokens.
+        Counts are kept in an LRU keyed by text, so repeated sentences are
+        tokenized once.
+        """
+        counts = {}
+        with self._token_lock:
+            for text in texts:
+                if text in self._token_counts:
+                    self._token_counts.move_to_end(text)
+                    counts[text] = self._token_counts[text]
+
+        missing = list(dict.fromkeys(t for t in texts if t not in counts))
+        if missing:
+            tokenizer = self.tokenizer
+            if tokenizer is not None:
+                encodings = tokenizer.encode_batch(missing, add_special_tokens=False)
+                computed = [len(encoding.ids) for encoding in encodings]
+            else:
+                # Rough wordpiece estimate when the model is unavailable
+                computed = [len(re.findall(r"\w+|[^\w\s]", t)) for t in missing]
+            counts.update(zip(missing, computed))
+
+            with self._token_lock:
+                self._token_counts.update(zip(missing, computed))
+                while len(self._token_counts) > settings.TOKEN_COUNT_CACHE_SIZE:
+                    self._token_counts.popitem(last=False)
+
+        return [counts[text] for text in texts]
 
     def get_dimension(self) -> int:
         """Get embedding dimension"""
         # BAAI/bge-small-en-v1.5 is 384
         return 384
 
+class EmbeddingWorkerPool:
+    """
+    Data-parallel embedding for large ingestion batches. Each worker process
+    holds its own ONNX session limited to `threads` intra-op threads; a
+    batch is cut into contiguous shards, one per worker (at least
+    EMBEDDING_WORKER_MIN_SHARD texts each), and the rows are reassembled in
+    input order.
+    """
+
+    def __init__(self, workers: int, threads: int, target: Optional[Callable] = None):
+        self.workers = workers
+        self.threads = threads
+        self._target = target or _embed_in_worker
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        shards = max(1, min(self.workers, len(texts) // max(1, settings.EMBEDDING_WORKER_MIN_SHARD)))
+        size = math.ceil(len(texts) / shards)
+        executor = self._get_executor()
+        try:
+            futures = [
+                executor.submit(self._target, list(texts[start:start + size]), self.threads)
+                for start in range(0, len(texts), size)
+            ]
+            return np.concatenate([np.asarray(future.result(), dtype=np.float32) for future in futures])
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM); start a fresh pool for the next batch
+            self.shutdown()
+            raise
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: never fork a web/worker process that holds ONNX and DB threads
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+
+# The worker process's own service, created on its first shard
+_worker_service: Optional[EmbeddingService] = None
+
+
+def _embed_in_worker(texts: List[str], threads: int) -> np.ndarray:
+    global _worker_service
+    if _worker_service is None:
+        _worker_service = EmbeddingService(threads=threads)
+    return _worker_service.embed_texts(texts)
+
+
+def _as_matrix(vectors: Iterable[np.ndarray]) -> np.ndarray:
+    rows = list(vectors)
+    if not rows:
+        return np.empty((0, settings.EMBEDDING_DIMENSION), dtype=np.float32)
+    return np.array(rows, dtype=np.float32)
+
+
 # Singleton instance
 embedding_service = EmbeddingService()
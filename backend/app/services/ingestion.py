@@ -0,0 +1,859 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+from sqlalchemy import Text, cast, select
+from sqlalchemy.orm import undefer
+
+from .artifact_store import ArtifactWriter, artifact_store
+from .document_processor import Chunk, document_processor
+from .embedding_scheduler import embedding_scheduler
+from .near_duplicates import NEAR_DUPLICATE_KEYS, near_duplicate_index
+from .progress import IngestionProgress, publish_status
+from .vector_store import vector_store
+from ..core.config import settings
+from ..core.database import AsyncSessionLocal
+from ..models.document import INDEXING_STATUSES, Document
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of a stage's output
+_END = object()
+
+# document_id -> result of the bulk ingestions running in this process, for cancel_ingestion
+_bulk_results: Dict[str, "IngestionResult"] = {}
+
+
+# (page, chunk_hash) -> [(point_id, metadata)] of a document's stored points
+ChunkIndex = Dict[Tuple[int, Optional[str]], List[Tuple[str, Dict[str, Any]]]]
+
+# Called with (document_id, result) once a document's first chunks are queryable
+OnAvailable = Callable[[str, "IngestionResult"], Awaitable[None]]
+
+
+@dataclass
+class IngestionResult:
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    embedded_chunks: int = 0
+    reused_chunks: int = 0
+    removed_chunks: int = 0
+    # Stored with the vector of a near-duplicate chunk instead of being embedded
+    near_duplicate_chunks: int = 0
+    # Only tracked for incremental runs, so a failed update can be rolled back
+    point_ids: Optional[List[str]] = None
+    metadata_updates: List[Tuple[str, Dict[str, Any]]] = field(default_factory=list)
+    # Cleaned text per page: streamed into the document's artifact as pages
+    # are chunked, or the already extracted pages a re-chunk starts from
+    pages: Union[ArtifactWriter, Dict[int, str]] = field(default_factory=artifact_store.open_pages)
+    progress: Optional[IngestionProgress] = None
+    # Set once the indexed prefix was announced as queryable
+    available: bool = False
+    # Set once the document was deleted mid-run: its remaining chunks are dropped
+    cancelled: bool = False
+
+    @property
+    def chunk_count(self) -> int:
+        return self.embedded_chunks + self.reused_chunks
+
+
+@dataclass
+class BulkItem:
+    """One document of a bulk ingestion run"""
+    document_id: str
+    file_path: str
+    filename: str
+    user_id: str
+    result: IngestionResult = field(default_factory=IngestionResult)
+    error: Optional[Exception] = None
+
+
+class IngestionPipeline:
+    """
+    Streaming ingestion: extract page -> chunk -> embed micro-batch -> upsert micro-batch.
+
+    Stages are joined by bounded queues, so at most `queue_size` batches of
+    `batch_size` chunks (plus the ones being embedded/upserted) are alive at
+    any time, independent of document size.
+    """
+
+    def __init__(self, batch_size: Optional[int] = None, queue_size: Optional[int] = None):
+        self.batch_size = max(1, batch_size or settings.INGEST_BATCH_SIZE)
+        self.queue_size = max(1, queue_size or settings.INGEST_QUEUE_SIZE)
+
+    async def run(
+        self,
+        file_path: str,
+        document_id: str,
+        filename: str,
+        user_id: str,
+        existing: Optional[ChunkIndex] = None,
+        on_available: Optional[OnAvailable] = None
+    ) -> IngestionResult:
+        """
+        Ingest a file. With `existing` (the document's current chunk index) only
+        added or changed chunks are embedded and upserted, unchanged ones keep
+        their points and removed ones are deleted once the new version is in.
+
+        `on_available` is awaited once the first INGEST_PARTIAL_MIN_CHUNKS
+        chunks are upserted while pages are still being extracted, so long
+        documents can be queried before the backfill finishes.
+        """
+        result = IngestionResult(point_ids=[] if existing is not None else None)
+        result.progress = IngestionProgress(document_id, user_id, filename, result.pages, result.metadata)
+        chunks = document_processor.iter_document_chunks(
+            file_path=file_path,
+            document_id=document_id,
+            filename=filename,
+            metadata=result.metadata,
+            extra_metadata={"user_id": user_id},
+            pages=result.pages
+        )
+        return await self._run(chunks, document_id, result, existing, on_available)
+
+    async def run_pages(
+        self,
+        pages: Dict[int, str],
+        document_id: str,
+        filename: str,
+        user_id: str,
+        total_pages: Optional[int] = None,
+        existing: Optional[ChunkIndex] = None
+    ) -> IngestionResult:
+        """Like run, but chunks already extracted page texts instead of parsing a file"""
+        result = IngestionResult(point_ids=[] if existing is not None else None, pages=pages)
+        result.progress = IngestionProgress(document_id, user_id, filename, result.pages, result.metadata)
+        chunks = document_processor.iter_page_chunks(
+            pages, document_id, filename, total_pages=total_pages, extra_metadata={"user_id": user_id}
+        )
+        return await self._run(chunks, document_id, result, existing)
+
+    async def _run(
+        self,
+        chunks: Iterator[Chunk],
+        document_id: str,
+        result: IngestionResult,
+        existing: Optional[ChunkIndex],
+        on_available: Optional[OnAvailable] = None
+    ) -> IngestionResult:
+        chunks = _hash_chunks(chunks)
+        if existing is not None:
+            chunks = _skip_unchanged(chunks, existing, result)
+
+        chunk_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        upsert_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        result.progress.publish(force=True)
+
+        stages = [
+            asyncio.create_task(self._produce(chunks, chunk_queue, result.progress)),
+            asyncio.create_task(self._embed(chunk_queue, upsert_queue, lambda _: result)),
+            asyncio.create_task(self._upsert(upsert_queue, lambda _: result, on_available=on_available)),
+        ]
+        try:
+            await asyncio.gather(*stages)
+        except BaseException:
+            _discard_artifact(result)
+            if result.point_ids:
+                # Incremental run: drop the new points, the previous version stays intact
+                await asyncio.to_thread(vector_store.delete_points, result.point_ids)
+            raise
+        finally:
+            await cancel_and_wait(stages)
+
+        if existing is not None:
+            await asyncio.to_thread(vector_store.update_chunk_metadata, result.metadata_updates)
+            removed = [point_id for entries in existing.values() for point_id, _ in entries]
+            await asyncio.to_thread(vector_store.delete_points, removed)
+            result.removed_chunks = len(removed)
+
+        logger.info(
+            f"Ingested document {document_id}: {result.embedded_chunks} chunks embedded "
+            f"({result.near_duplicate_chunks} as near-duplicates), "
+            f"{result.reused_chunks} reused, {result.removed_chunks} removed"
+        )
+        return result
+
+    async def run_many(
+        self,
+        items: List[BulkItem],
+        on_done: Callable[[BulkItem], Awaitable[None]],
+        on_available: Optional[OnAvailable] = None
+    ):
+        """
+        Ingest several documents through shared embed/upsert batches, so small
+        files still fill whole batches. `on_done` is awaited for each document
+        once all of its chunks are upserted, or once its extraction failed
+        (`item.error` is set; its partial points are the callback's to remove).
+        Embedding or upsert errors abort the whole run.
+        """
+        results = {item.document_id: item.result for item in items}
+        for item in items:
+            item.result.progress = IngestionProgress(
+                item.document_id, item.user_id, item.filename, item.result.pages, item.result.metadata
+            )
+            item.result.progress.publish(force=True)
+        chunk_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        upsert_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+
+        stages = [
+            asyncio.create_task(self._produce_many(items, chunk_queue)),
+            asyncio.create_task(self._embed(chunk_queue, upsert_queue, results.__getitem__)),
+            asyncio.create_task(self._upsert(upsert_queue, results.__getitem__, on_done, on_available)),
+        ]
+        try:
+            await asyncio.gather(*stages)
+        finally:
+            await cancel_and_wait(stages)
+            # Completed documents committed theirs in on_done
+            for item in items:
+                _discard_artifact(item.result)
+
+    async def _produce(self, chunks: Iterator[Chunk], out: asyncio.Queue, progress: IngestionProgress):
+        # Extraction and chunking are blocking, keep them off the event loop
+        # A short first batch makes the start of a long document queryable sooner
+        size = min(self.batch_size, settings.INGEST_PARTIAL_MIN_CHUNKS or self.batch_size)
+        while True:
+            started = time.perf_counter()
+            batch = await asyncio.to_thread(_take, chunks, size)
+            size = self.batch_size
+            if not batch:
+                break
+            progress.record("extract", len(batch), time.perf_counter() - started)
+            await out.put((batch, []))
+        await out.put(_END)
+
+    async def _produce_many(self, items: List[BulkItem], out: asyncio.Queue):
+        batch: List[Chunk] = []
+        # Documents whose last chunk is in `batch` (or an earlier batch)
+        finished: List[BulkItem] = []
+        for item in items:
+            chunks = _hash_chunks(document_processor.iter_document_chunks(
+                file_path=item.file_path,
+                document_id=item.document_id,
+                filename=item.filename,
+                metadata=item.result.metadata,
+                extra_metadata={"user_id": item.user_id},
+                pages=item.result.pages
+            ))
+            while not item.result.cancelled:
+                started = time.perf_counter()
+                try:
+                    taken = await asyncio.to_thread(_take, chunks, self.batch_size - len(batch))
+                except Exception as e:
+                    logger.error(f"Extraction failed for {item.filename}: {e}")
+                    item.error = e
+                    break
+                if not taken:
+                    break
+                item.result.progress.record("extract", len(taken), time.perf_counter() - started)
+                batch.extend(taken)
+                if len(batch) == self.batch_size:
+                    await out.put((batch, finished))
+                    batch, finished = [], []
+            finished.append(item)
+        if batch or finished:
+            await out.put((batch, finished))
+        await out.put(_END)
+
+    async def _embed(self, inp: asyncio.Queue, out: asyncio.Queue, result_for: Callable[[str], IngestionResult]):
+        while True:
+            item = await inp.get()
+            if item is _END:
+                break
+            batch, finished = item
+            embeddings = None
+            if batch:
+                started = time.perf_counter()
+                reused = [None] * len(batch)
+                if settings.NEAR_DUPLICATE_DETECTION:
+                    reused = await asyncio.to_thread(near_duplicate_index.link_batch, batch)
+                texts = [chunk.text for chunk, vector in zip(batch, reused) if vector is None]
+                computed = await asyncio.wait_for(
+                    embedding_scheduler.embed_bulk(texts), timeout=settings.EMBEDDING_TIMEOUT_SECONDS
+                ) if texts else None
+                if len(texts) == len(batch):
+                    embeddings = computed
+                else:
+                    # One float32 matrix either way: reused vectors fill their rows
+                    rows = iter(computed if texts else ())
+                    embeddings = np.array(
+                        [next(rows) if vector is None else vector for vector in reused], dtype=np.float32
+                    )
+                for chunk, vector in zip(batch, reused):
+                    if vector is not None:
+                        result_for(chunk.metadata["document_id"]).near_duplicate_chunks += 1
+                _record_batch("embed", batch, time.perf_counter() - started, result_for)
+            await out.put((batch, embeddings, finished))
+        await out.put(_END)
+
+    async def _upsert(
+        self,
+        inp: asyncio.Queue,
+        result_for: Callable[[str], IngestionResult],
+        on_done: Optional[Callable[[BulkItem], Awaitable[None]]] = None,
+        on_available: Optional[OnAvailable] = None
+    ):
+        while True:
+            item = await inp.get()
+            if item is _END:
+                break
+            batch, embeddings, finished = item
+            if any(result_for(chunk.metadata["document_id"]).cancelled for chunk in batch):
+                keep = [i for i, chunk in enumerate(batch) if not result_for(chunk.metadata["document_id"]).cancelled]
+                batch, embeddings = [batch[i] for i in keep], embeddings[keep]
+            if batch:
+                ids = [str(uuid.uuid4()) for _ in batch]
+                batch_results = [result_for(chunk.metadata["document_id"]) for chunk in batch]
+                for result, point_id in zip(batch_results, ids):
+                    if result.point_ids is not None:
+                        result.point_ids.append(point_id)
+                started = time.perf_counter()
+                await asyncio.to_thread(vector_store.upsert_chunks, batch, embeddings, ids)
+                for result in batch_results:
+                    result.embedded_chunks += 1
+                _record_batch("upsert", batch, time.perf_counter() - started, result_for)
+                if on_available is not None:
+                    await _announce_available(batch, finished, result_for, on_available)
+            for bulk_item in finished:
+                await on_done(bulk_item)
+
+
+async def _announce_available(
+    batch: List[Chunk],
+    finished: List[BulkItem],
+    result_for: Callable[[str], IngestionResult],
+    on_available: OnAvailable
+):
+    done = {item.document_id for item in finished}
+    for document_id in dict.fromkeys(chunk.metadata["document_id"] for chunk in batch):
+        result = result_for(document_id)
+        if result.available or result.cancelled or document_id in done or result.embedded_chunks < settings.INGEST_PARTIAL_MIN_CHUNKS:
+            continue
+        # Only worth it while pages are still to come; short documents just complete
+        if len(result.pages) >= result.metadata.get("total_pages", 0):
+            continue
+        result.available = True
+        await on_available(document_id, result)
+
+
+async def _mark_partially_indexed(db, doc: Document, ingestion: IngestionResult):
+    """Make the indexed prefix of a document queryable while the rest is backfilled"""
+    if not await _still_exists(db, doc, ingestion):
+        return
+    doc.processing_status = "partially_indexed"
+    doc.total_pages = ingestion.metadata.get("total_pages")
+    doc.chunk_count = ingestion.embedded_chunks
+    doc.qdrant_collection_id = settings.QDRANT_COLLECTION_NAME
+    await db.commit()
+    ingestion.progress.status = "partially_indexed"
+    ingestion.progress.publish(force=True)
+    logger.info(f"{doc.filename} is queryable with {doc.chunk_count} chunks, backfilling the rest")
+
+
+async def ingest_document(document_id: str, file_path: str) -> bool:
+    """
+    Run the pipeline for one uploaded document with its own DB session.
+    Raises on failure after removing partially upserted vectors; the caller
+    decides whether the failure is retried. Returns False if the document no
+    longer exists.
+    """
+    doc_uuid = uuid.UUID(document_id) if isinstance(document_id, str) else document_id
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(Document).filter(Document.id == doc_uuid))
+        doc = result.scalar_one_or_none()
+        if not doc:
+            logger.warning(f"Document {document_id} not found, dropping ingestion")
+            return False
+
+        if doc.processing_status == "completed":
+            # A previous attempt finished but its job was not marked done
+            _remove_upload(file_path)
+            return True
+        if doc.processing_status in INDEXING_STATUSES:
+            # A previous attempt died mid-run, start from a clean slate
+            await asyncio.to_thread(vector_store.delete_by_document, str(document_id))
+
+        doc.processing_status = "processing"
+        await db.commit()
+
+        if await _reuse_duplicate(db, doc):
+            _remove_upload(file_path)
+            return True
+
+        try:
+            ingestion = await ingestion_pipeline.run(
+                file_path=file_path,
+                document_id=str(document_id),
+                filename=doc.filename,
+                user_id=str(doc.user_id),
+                on_available=lambda _, ingestion: _mark_partially_indexed(db, doc, ingestion)
+            )
+        except BaseException:
+            await db.rollback()
+            # Drop any micro-batches that were already upserted
+            try:
+                await asyncio.to_thread(vector_store.delete_by_document, str(document_id))
+            except Exception as cleanup_error:
+                logger.error(f"Failed to remove partial vectors for {document_id}: {cleanup_error}")
+            raise
+
+        if not await _still_exists(db, doc, ingestion):
+            _discard_artifact(ingestion)
+            await discard_document(str(document_id), file_path)
+            return False
+        await _complete_document(doc, ingestion)
+        await db.commit()
+        _publish_completed(doc, ingestion)
+        logger.info(f"Processing completed for {doc.filename}")
+
+    _remove_upload(file_path)
+    return True
+
+
+async def ingest_documents(jobs: List[Tuple[str, str]]) -> Dict[str, Optional[str]]:
+    """
+    Bulk counterpart of ingest_document for (document_id, file_path) pairs
+    of one bulk upload: their chunks share full-size embed/upsert batches,
+    but each document is completed or failed on its own. Returns
+    document_id -> error message, None for documents that are done.
+    """
+    outcomes: Dict[str, Optional[str]] = {}
+    async with AsyncSessionLocal() as db:
+        doc_ids = [uuid.UUID(document_id) for document_id, _ in jobs]
+        result = await db.execute(select(Document).filter(Document.id.in_(doc_ids)))
+        docs = {str(doc.id): doc for doc in result.scalars().all()}
+
+        pending = []
+        for document_id, file_path in jobs:
+            doc = docs.get(document_id)
+            if not doc:
+                logger.warning(f"Document {document_id} not found, dropping ingestion")
+                outcomes[document_id] = None
+            elif doc.processing_status == "completed":
+                _remove_upload(file_path)
+                outcomes[document_id] = None
+            else:
+                if doc.processing_status in INDEXING_STATUSES:
+                    await asyncio.to_thread(vector_store.delete_by_document, document_id)
+                doc.processing_status = "processing"
+                pending.append((doc, file_path))
+        await db.commit()
+
+        items = []
+        for doc, file_path in pending:
+            if await _reuse_duplicate(db, doc):
+                _remove_upload(file_path)
+                outcomes[str(doc.id)] = None
+            else:
+                items.append(BulkItem(str(doc.id), file_path, doc.filename, str(doc.user_id)))
+
+        async def on_done(item: BulkItem):
+            if item.result.cancelled or not await _still_exists(db, docs[item.document_id], item.result):
+                await discard_document(item.document_id, item.file_path)
+                outcomes[item.document_id] = None
+                return
+            if item.error is not None:
+                await asyncio.to_thread(vector_store.delete_by_document, item.document_id)
+                outcomes[item.document_id] = str(item.error)
+                return
+            await _complete_document(docs[item.document_id], item.result)
+            await db.commit()
+            _publish_completed(docs[item.document_id], item.result)
+            _remove_upload(item.file_path)
+            outcomes[item.document_id] = None
+
+        _bulk_results.update((item.document_id, item.result) for item in items)
+        try:
+            await bulk_ingestion_pipeline.run_many(
+                items, on_done, lambda document_id, ingestion: _mark_partially_indexed(db, docs[document_id], ingestion)
+            )
+        except BaseException as e:
+            await db.rollback()
+            unfinished = [item for item in items if item.document_id not in outcomes]
+            for item in unfinished:
+                try:
+                    await asyncio.to_thread(vector_store.delete_by_document, item.document_id)
+                except Exception as cleanup_error:
+                    logger.error(f"Failed to remove partial vectors for {item.document_id}: {cleanup_error}")
+            if not isinstance(e, Exception):
+                raise
+            logger.exception(f"Bulk ingestion of {len(unfinished)} documents failed: {e}")
+            outcomes.update((item.document_id, str(e)) for item in unfinished)
+        finally:
+            for item in items:
+                _bulk_results.pop(item.document_id, None)
+
+    return outcomes
+
+
+def cancel_ingestion(document_id: str) -> bool:
+    """
+    Drop a deleted document from the bulk ingestion running it in this
+    process: its remaining chunks are neither extracted nor upserted, and
+    what was already upserted is removed once its last batch is through.
+    The other documents of the batch carry on.
+    """
+    result = _bulk_results.get(document_id)
+    if result is None:
+        return False
+    result.cancelled = True
+    return True
+
+
+async def discard_document(document_id: str, file_path: str):
+    """Remove what a run of a since deleted document left behind"""
+    try:
+        await asyncio.to_thread(vector_store.delete_by_document, document_id)
+    except Exception as e:
+        logger.error(f"Failed to remove vectors of deleted document {document_id}: {e}")
+    _remove_upload(file_path)
+    logger.info(f"Dropped ingestion of deleted document {document_id}")
+
+
+async def _still_exists(db, doc: Document, ingestion: IngestionResult) -> bool:
+    # Another process may have deleted the document before this one's heartbeat noticed
+    if ingestion.cancelled:
+        return False
+    result = await db.execute(select(Document.id).filter(Document.id == doc.id))
+    if result.scalar_one_or_none() is None:
+        ingestion.cancelled = True
+    return not ingestion.cancelled
+
+
+async def _complete_document(doc: Document, ingestion: IngestionResult):
+    doc.artifact_key = await _store_artifact(ingestion)
+    doc.metadata_ = {
+        **ingestion.metadata,
+        "chunking": document_processor.chunking_settings(),
+        "ingestion_stats": ingestion.progress.summary() if ingestion.progress else None,
+        "near_duplicate_chunks": ingestion.near_duplicate_chunks
+    }
+    doc.total_pages = ingestion.metadata.get("total_pages", 1)
+    doc.chunk_count = ingestion.chunk_count
+    doc.processing_status = "completed"
+    doc.qdrant_collection_id = settings.QDRANT_COLLECTION_NAME
+
+
+def _publish_completed(doc: Document, ingestion: IngestionResult):
+    if ingestion.progress is not None:
+        ingestion.progress.publish("completed", force=True, chunk_count=doc.chunk_count)
+
+
+async def _store_artifact(ingestion: IngestionResult) -> Optional[str]:
+    # Only needed for re-chunking later, so a failed write must not fail ingestion
+    try:
+        return await asyncio.to_thread(ingestion.pages.commit)
+    except Exception as e:
+        logger.warning(f"Failed to store extraction artifact: {e}")
+        return None
+
+
+def _discard_artifact(result: IngestionResult):
+    if isinstance(result.pages, ArtifactWriter):
+        result.pages.discard()
+
+
+async def release_artifact(db, key: Optional[str]):
+    """Delete an artifact once no document refers to it any more"""
+    if not key:
+        return
+    result = await db.execute(select(Document.id).filter(Document.artifact_key == key).limit(1))
+    if result.first() is None:
+        await asyncio.to_thread(artifact_store.delete, key)
+
+
+async def migrate_legacy_page_texts(batch_size: int = 50) -> int:
+    """
+    Move page text that older versions stored in Document.metadata into the
+    artifact store. Runs at startup; finds nothing once all rows are migrated.
+    """
+    migrated = 0
+    last_id = None
+    async with AsyncSessionLocal() as db:
+        while True:
+            query = (
+                select(Document)
+                .options(undefer(Document.metadata_))
+                .filter(cast(Document.metadata_, Text).like('%"page_texts"%'))
+                .order_by(Document.id)
+                .limit(batch_size)
+            )
+            if last_id is not None:
+                query = query.filter(Document.id > last_id)
+            docs = (await db.execute(query)).scalars().all()
+            if not docs:
+                break
+
+            for doc in docs:
+                metadata = dict(doc.metadata_ or {})
+                page_texts = metadata.pop("page_texts", None)
+                if page_texts is None:
+                    continue
+                if not doc.artifact_key and page_texts:
+                    pages = {int(page): text for page, text in page_texts.items()}
+                    doc.artifact_key = await asyncio.to_thread(artifact_store.put_pages, pages)
+                doc.metadata_ = metadata
+                migrated += 1
+            await db.commit()
+            last_id = docs[-1].id
+            # Keep memory flat on large tables
+            db.expunge_all()
+    return migrated
+
+
+async def _reuse_duplicate(db, doc: Document) -> bool:
+    """
+    Content-addressed fast path: if an identical upload was already indexed,
+    clone its vectors under this document instead of re-extracting and
+    re-embedding. Returns False (and leaves no points behind) otherwise.
+    """
+    if not doc.content_hash:
+        return False
+
+    result = await db.execute(
+        select(Document)
+        .options(undefer(Document.metadata_))
+        .filter(
+            Document.content_hash == doc.content_hash,
+            Document.processing_status == "completed",
+            Document.id != doc.id
+        )
+        .order_by(Document.upload_date.desc())
+        .limit(1)
+    )
+    source = result.scalar_one_or_none()
+    if not source or not source.chunk_count:
+        return False
+
+    try:
+        copied = await asyncio.to_thread(
+            vector_store.clone_document_vectors,
+            str(source.id), str(doc.id), str(doc.user_id), doc.filename
+        )
+    except Exception as e:
+        logger.warning(f"Cloning vectors from {source.id} failed, ingesting from scratch: {e}")
+        copied = 0
+
+    if copied != source.chunk_count:
+        # Source vectors are gone or incomplete; never serve a partial copy
+        if copied:
+            await asyncio.to_thread(vector_store.delete_by_document, str(doc.id))
+        return False
+
+    doc.metadata_ = {**(source.metadata_ or {}), "deduplicated_from": str(source.id)}
+    doc.artifact_key = source.artifact_key
+    doc.total_pages = source.total_pages
+    doc.chunk_count = copied
+    doc.processing_status = "completed"
+    doc.qdrant_collection_id = settings.QDRANT_COLLECTION_NAME
+    await db.commit()
+    publish_status(str(doc.id), str(doc.user_id), "completed", chunk_count=copied, deduplicated_from=str(source.id))
+    logger.info(f"Reused {copied} vectors from {source.id} for duplicate upload {doc.id}")
+    return True
+
+
+async def update_document(document_id: str, file_path: str) -> bool:
+    """
+    Apply a new version of an already indexed document, embedding only the
+    chunks whose text changed. The document stays queryable throughout.
+    """
+    doc_uuid = uuid.UUID(document_id) if isinstance(document_id, str) else document_id
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Document).options(undefer(Document.metadata_)).filter(Document.id == doc_uuid)
+        )
+        doc = result.scalar_one_or_none()
+        if not doc:
+            logger.warning(f"Document {document_id} not found, dropping update")
+            _remove_upload(file_path)
+            return False
+
+        existing = await asyncio.to_thread(vector_store.get_chunk_index, str(doc.id))
+        ingestion = await ingestion_pipeline.run(
+            file_path=file_path,
+            document_id=str(doc.id),
+            filename=doc.filename,
+            user_id=str(doc.user_id),
+            existing=existing
+        )
+
+        previous = doc.metadata_ or {}
+        previous_artifact = doc.artifact_key
+        doc.artifact_key = await _store_artifact(ingestion)
+        doc.metadata_ = {
+            **ingestion.metadata,
+            "chunking": document_processor.chunking_settings(),
+            "version": previous.get("version", 1) + 1,
+            "last_update": {
+                "embedded_chunks": ingestion.embedded_chunks,
+                "reused_chunks": ingestion.reused_chunks,
+                "removed_chunks": ingestion.removed_chunks
+            },
+            "ingestion_stats": ingestion.progress.summary()
+        }
+        doc.total_pages = ingestion.metadata.get("total_pages", 1)
+        doc.chunk_count = ingestion.chunk_count
+        doc.file_size = os.path.getsize(file_path)
+        doc.file_type = os.path.splitext(file_path)[1].lower()
+        doc.content_hash = await asyncio.to_thread(file_sha256, file_path)
+        await db.commit()
+        _publish_completed(doc, ingestion)
+        if previous_artifact != doc.artifact_key:
+            await release_artifact(db, previous_artifact)
+        logger.info(f"Updated {doc.filename} to version {doc.metadata_['version']}")
+
+    _remove_upload(file_path)
+    return True
+
+
+async def rechunk_document(document_id: str, file_path: str = "") -> bool:
+    """
+    Re-chunk and re-embed a completed document from its extraction artifact
+    with the current chunking settings, without the original upload or any
+    PDF parsing. Chunks that come out unchanged keep their vectors, and the
+    document stays queryable throughout. `file_path` is unused.
+    """
+    doc_uuid = uuid.UUID(document_id) if isinstance(document_id, str) else document_id
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Document).options(undefer(Document.metadata_)).filter(Document.id == doc_uuid)
+        )
+        doc = result.scalar_one_or_none()
+        if not doc or not doc.artifact_key:
+            logger.warning(f"Document {document_id} has no extraction artifact, skipping re-chunk")
+            return False
+
+        pages = await asyncio.to_thread(artifact_store.get_pages, doc.artifact_key)
+        existing = await asyncio.to_thread(vector_store.get_chunk_index, str(doc.id))
+        ingestion = await ingestion_pipeline.run_pages(
+            pages,
+            str(doc.id),
+            doc.filename,
+            str(doc.user_id),
+            total_pages=doc.total_pages if doc.file_type == ".pdf" else None,
+            existing=existing
+        )
+
+        doc.chunk_count = ingestion.chunk_count
+        doc.metadata_ = {
+            **(doc.metadata_ or {}),
+            "chunking": document_processor.chunking_settings(),
+            "last_rechunk": {
+                "embedded_chunks": ingestion.embedded_chunks,
+                "reused_chunks": ingestion.reused_chunks,
+                "removed_chunks": ingestion.removed_chunks
+            },
+            "ingestion_stats": ingestion.progress.summary()
+        }
+        doc.metadata_.pop("rechunk_error", None)
+        await db.commit()
+        _publish_completed(doc, ingestion)
+        logger.info(f"Re-chunked {doc.filename}: {ingestion.chunk_count} chunks")
+    return True
+
+
+# Job kind -> handler run by the ingestion workers
+JOB_HANDLERS = {
+    "ingest": ingest_document,
+    "update": update_document,
+    "rechunk": rechunk_document,
+}
+
+
+async def record_ingestion_failure(document_id: str, file_path: str, error: str, final: bool, kind: str = "ingest"):
+    """Reflect a failed attempt on the document; uploads are kept for retries"""
+    doc_uuid = uuid.UUID(document_id) if isinstance(document_id, str) else document_id
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Document).options(undefer(Document.metadata_)).filter(Document.id == doc_uuid)
+        )
+        doc = result.scalar_one_or_none()
+        if doc:
+            if kind != "ingest":
+                # Updates and re-chunks leave the previous version fully indexed
+                doc.metadata_ = {**(doc.metadata_ or {}), f"{kind}_error": error}
+            else:
+                doc.processing_status = "failed" if final else "pending"
+                doc.metadata_ = {**(doc.metadata_ or {}), "processing_error": error}
+            await db.commit()
+            publish_status(str(doc.id), str(doc.user_id), doc.processing_status, error=error, kind=kind)
+    if final:
+        _remove_upload(file_path)
+
+
+def _remove_upload(file_path: str):
+    if os.path.exists(file_path):
+        os.remove(file_path)
+
+
+async def cancel_and_wait(tasks: List[asyncio.Task]):
+    # Re-cancel until done: before Python 3.12, wait_for() can swallow a
+    # cancellation that races with its inner future completing.
+    pending = [task for task in tasks if not task.done()]
+    while pending:
+        for task in pending:
+            task.cancel()
+        await asyncio.wait(pending, timeout=0.1)
+        pending = [task for task in pending if not task.done()]
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def _record_batch(stage: str, batch: List[Chunk], seconds: float, result_for: Callable[[str], IngestionResult]):
+    # Shared bulk batches: split the batch time by each document's share of chunks
+    counts = Counter(chunk.metadata["document_id"] for chunk in batch)
+    for document_id, count in counts.items():
+        progress = result_for(document_id).progress
+        if progress is not None:
+            progress.record(stage, count, seconds * count / len(batch))
+
+
+def _hash_chunks(chunks: Iterator[Chunk]) -> Iterator[Chunk]:
+    for chunk in chunks:
+        chunk.metadata["chunk_hash"] = hashlib.sha1(chunk.text.encode("utf-8")).hexdigest()
+        yield chunk
+
+
+def _skip_unchanged(chunks: Iterator[Chunk], existing: ChunkIndex, result: IngestionResult) -> Iterator[Chunk]:
+    """Yield only chunks without a stored twin on the same page; consumes matches from `existing`"""
+    for chunk in chunks:
+        key = (chunk.metadata["page"], chunk.metadata["chunk_hash"])
+        entries = existing.get(key)
+        if not entries:
+            yield chunk
+            continue
+
+        point_id, stored_metadata = entries.pop()
+        if not entries:
+            del existing[key]
+        result.reused_chunks += 1
+        # Same text, so the stored LSH bands and duplicate cluster still hold
+        for key_name in NEAR_DUPLICATE_KEYS:
+            if key_name in stored_metadata:
+                chunk.metadata[key_name] = stored_metadata[key_name]
+        if stored_metadata != chunk.metadata:
+            # Same text, shifted position (chunk_index/total_pages): payload-only update
+            result.metadata_updates.append((point_id, chunk.metadata))
+
+
+def file_sha256(file_path: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        while block := file.read(1024 * 1024):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def _take(chunks: Iterator[Chunk], count: int) -> List[Chunk]:
+    return list(islice(chunks, count))
+
+
+# Singleton instances
+ingestion_pipeline = IngestionPipeline()
+bulk_ingestion_pipeline = IngestionPipeline(batch_size=settings.INGEST_BULK_BATCH_SIZE)
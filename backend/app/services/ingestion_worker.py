@@ -0,0 +1,217 @@
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from functools import partial
+from typing import Callable, Dict, List, Optional
+
+from .ingestion import (
+    JOB_HANDLERS, cancel_and_wait, cancel_ingestion, discard_document, ingest_documents, record_ingestion_failure
+)
+from .job_queue import job_queue
+from ..core.config import settings
+from ..core.database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class IngestionWorkerPool:
+    """
+    Pulls jobs from the persistent queue and runs at most `concurrency`
+    ingestions at once. Runs inside the API process or standalone via
+    `python -m app.worker`.
+    """
+
+    def __init__(self, concurrency: Optional[int] = None, worker_id: Optional[str] = None):
+        self.concurrency = max(1, concurrency or settings.INGEST_WORKER_CONCURRENCY)
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+        # document_id -> stops this process's work on the document once it is deleted
+        self._cancels: Dict[str, Callable[[], None]] = {}
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        async with AsyncSessionLocal() as db:
+            recovered = await job_queue.recover(db)
+        if recovered:
+            logger.info(f"Recovered {recovered} orphaned ingestion jobs")
+
+        self._tasks = [
+            asyncio.create_task(self._worker_loop(slot)) for slot in range(self.concurrency)
+        ]
+        self._tasks.append(asyncio.create_task(self._reaper_loop()))
+        logger.info(f"Ingestion worker {self.worker_id} started with concurrency {self.concurrency}")
+
+    async def stop(self):
+        self._stopping = True
+        await cancel_and_wait(self._tasks)
+        self._tasks = []
+
+    async def run_forever(self):
+        await self.start()
+        try:
+            await asyncio.gather(*self._tasks)
+        finally:
+            await self.stop()
+
+    def notify(self):
+        """Wake idle workers after a job was enqueued in this process"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def cancel_document(self, document_id: str) -> bool:
+        """
+        Stop working on a deleted document right away if this process runs
+        its job; workers elsewhere notice the missing job on their next heartbeat
+        """
+        cancel = self._cancels.get(str(document_id))
+        if cancel is None:
+            return False
+        cancel()
+        return True
+
+    async def _worker_loop(self, slot: int):
+        while not self._stopping:
+            siblings = []
+            try:
+                async with AsyncSessionLocal() as db:
+                    job = await job_queue.claim(db, self.worker_id)
+                    if job is not None and job.batch_id is not None and job.kind == "ingest":
+                        siblings = await job_queue.claim_batch(
+                            db, self.worker_id, job.batch_id, settings.INGEST_BULK_MAX_DOCUMENTS - 1
+                        )
+            except Exception as e:
+                logger.error(f"Worker slot {slot} failed to claim a job: {e}")
+                job = None
+
+            if job is None:
+                await self._idle()
+            elif siblings:
+                await self._run_bulk([job, *siblings])
+            else:
+                await self._run_job(job.id, job.kind or "ingest", str(job.document_id), job.file_path, job.attempts)
+
+    async def _idle(self):
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=settings.INGEST_POLL_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _run_job(self, job_id, kind: str, document_id: str, file_path: str, attempt: int):
+        logger.info(f"Running {kind} job {job_id} for document {document_id} (attempt {attempt})")
+        work = asyncio.create_task(JOB_HANDLERS[kind](document_id, file_path))
+        deleted = False
+
+        def cancel():
+            nonlocal deleted
+            deleted = True
+            work.cancel()
+
+        self._cancels[document_id] = cancel
+        heartbeat = asyncio.create_task(self._heartbeat_loop({job_id: document_id}, work))
+        try:
+            await work
+        except asyncio.CancelledError:
+            if not work.cancelled() or self._stopping:
+                raise
+            if deleted:
+                # The job went with its document, nothing left to complete
+                await discard_document(document_id, file_path)
+                return
+            # Lease lost: another worker owns the job now, leave it alone
+            logger.warning(f"Abandoned ingestion job {job_id} after losing its lease")
+            return
+        except Exception as e:
+            logger.exception(f"Ingestion job {job_id} failed: {e}")
+            async with AsyncSessionLocal() as db:
+                final = await job_queue.fail(db, job_id, self.worker_id, str(e))
+            await record_ingestion_failure(document_id, file_path, str(e), final, kind=kind)
+            return
+        finally:
+            self._cancels.pop(document_id, None)
+            heartbeat.cancel()
+            await asyncio.gather(heartbeat, return_exceptions=True)
+
+        async with AsyncSessionLocal() as db:
+            await job_queue.complete(db, job_id, self.worker_id)
+
+    async def _run_bulk(self, jobs: list):
+        """Run jobs of one bulk upload together, completing or failing each one separately"""
+        logger.info(f"Running {len(jobs)} bulk ingestion jobs of batch {jobs[0].batch_id}")
+        by_document = {str(job.document_id): job for job in jobs}
+        work = asyncio.create_task(ingest_documents([(str(job.document_id), job.file_path) for job in jobs]))
+        # A deleted document drops out of the batch, the others carry on
+        self._cancels.update((document_id, partial(cancel_ingestion, document_id)) for document_id in by_document)
+        heartbeat = asyncio.create_task(
+            self._heartbeat_loop({job.id: str(job.document_id) for job in jobs}, work)
+        )
+        try:
+            outcomes = await work
+        except asyncio.CancelledError:
+            if not work.cancelled() or self._stopping:
+                raise
+            logger.warning(f"Abandoned bulk batch {jobs[0].batch_id} after losing a lease")
+            return
+        except Exception as e:
+            logger.exception(f"Bulk batch {jobs[0].batch_id} failed: {e}")
+            outcomes = {document_id: str(e) for document_id in by_document}
+        finally:
+            for document_id in by_document:
+                self._cancels.pop(document_id, None)
+            heartbeat.cancel()
+            await asyncio.gather(heartbeat, return_exceptions=True)
+
+        for document_id, job in by_document.items():
+            error = outcomes.get(document_id)
+            async with AsyncSessionLocal() as db:
+                if error is None:
+                    await job_queue.complete(db, job.id, self.worker_id)
+                    continue
+                final = await job_queue.fail(db, job.id, self.worker_id, error)
+            await record_ingestion_failure(document_id, job.file_path, error, final)
+
+    async def _heartbeat_loop(self, jobs: Dict, work: asyncio.Task):
+        """Renew the leases of job_id -> document_id until `work` is done"""
+        while not work.done():
+            await asyncio.sleep(settings.INGEST_JOB_HEARTBEAT_SECONDS)
+            try:
+                async with AsyncSessionLocal() as db:
+                    lost = [job_id for job_id in jobs if not await job_queue.heartbeat(db, job_id, self.worker_id)]
+                    deleted = await job_queue.missing(db, lost) if lost else set()
+            except Exception as e:
+                logger.error(f"Heartbeat for jobs {list(jobs)} failed: {e}")
+                continue
+            for job_id in deleted:
+                self.cancel_document(jobs.pop(job_id))
+            if len(deleted) < len(lost):
+                # Another worker took over a lease
+                work.cancel()
+                return
+            if not jobs:
+                return
+
+    async def _reaper_loop(self):
+        # Leases can only expire while nobody heartbeats, so checking once per lease is enough
+        while not self._stopping:
+            await asyncio.sleep(settings.INGEST_JOB_LEASE_SECONDS)
+            try:
+                async with AsyncSessionLocal() as db:
+                    if await job_queue.recover(db):
+                        self.notify()
+            except Exception as e:
+                logger.error(f"Failed to re-queue expired ingestion jobs: {e}")
+
+
+# Singleton instance
+ingestion_workers = IngestionWorkerPool()
@@ -0,0 +1,450 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select, update, or_
+from sqlalchemy.orm import undefer
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+import logging
+import os
+import uuid
+
+from .progress import publish_status
+from ..models.document import INDEXING_STATUSES, Document
+from ..models.job import IngestionJob
+from ..core.config import settings
+from ..core.metrics import percentiles
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_JOB_STATUSES = ("queued", "running")
+LEASE_EXPIRED_ERROR = "Worker lease expired"
+ADOPT_GRACE_SECONDS = 60
+
+
+class JobQueue:
+    """
+    Persistent ingestion queue backed by the `ingestion_jobs` table.
+
+    Claims use a conditional UPDATE (status must still be 'queued'), so several
+    worker processes can share one database without an external broker.
+
+    Jobs are claimed in fair-share order across users. Each job gets a
+    virtual finish tag, its start plus its estimated cost, where the start
+    is the later of the current virtual time and the finish tag of the
+    user's previous active job. claim/claim_batch take the smallest finish
+    tag first, so a user with hundreds of queued documents delays another
+    user's single upload by about one job.
+    """
+
+    @staticmethod
+    def estimate_cost(size_bytes: Optional[int], pages: Optional[int] = None) -> float:
+        """Relative cost of ingesting a document: by page count when known, otherwise by file size"""
+        if pages:
+            return settings.INGEST_COST_BASE + pages * settings.INGEST_COST_PER_PAGE
+        return settings.INGEST_COST_BASE + (size_bytes or 0) / (1024 * 1024) * settings.INGEST_COST_PER_MB
+
+    @staticmethod
+    async def enqueue(
+        db: AsyncSession, document_id, file_path: str, kind: str = "ingest",
+        user_id=None, cost: Optional[float] = None
+    ) -> IngestionJob:
+        cost = settings.INGEST_COST_BASE if cost is None else cost
+        finish_tag, = await JobQueue._finish_tags(db, user_id, [cost])
+        job = IngestionJob(
+            document_id=_as_uuid(document_id),
+            file_path=file_path,
+            kind=kind,
+            user_id=_as_uuid(user_id),
+            cost=cost,
+            finish_tag=finish_tag,
+            status="queued",
+            max_attempts=settings.INGEST_JOB_MAX_ATTEMPTS,
+            available_at=datetime.utcnow()
+        )
+        db.add(job)
+        await db.commit()
+        await db.refresh(job)
+        return job
+
+    @staticmethod
+    async def enqueue_many(
+        db: AsyncSession, items: Sequence[Tuple[object, str]], kind: str = "ingest", batch_id=None,
+        user_id=None, costs: Optional[Sequence[float]] = None
+    ) -> List[IngestionJob]:
+        """Queue one job per (document_id, file_path), committed together with pending changes"""
+        now = datetime.utcnow()
+        costs = list(costs) if costs is not None else [settings.INGEST_COST_BASE] * len(items)
+        finish_tags = await JobQueue._finish_tags(db, user_id, costs)
+        jobs = [
+            IngestionJob(
+                document_id=_as_uuid(document_id),
+                file_path=file_path,
+                kind=kind,
+                batch_id=_as_uuid(batch_id),
+                user_id=_as_uuid(user_id),
+                cost=cost,
+                finish_tag=finish_tag,
+                status="queued",
+                max_attempts=settings.INGEST_JOB_MAX_ATTEMPTS,
+                available_at=now
+            )
+            for (document_id, file_path), cost, finish_tag in zip(items, costs, finish_tags)
+        ]
+        db.add_all(jobs)
+        await db.commit()
+        return jobs
+
+    @staticmethod
+    async def _finish_tags(db: AsyncSession, user_id, costs: Sequence[float]) -> List[float]:
+        """
+        Virtual finish tags for new jobs of `user_id`, queued back to back.
+        They start at the later of the virtual time (the smallest start tag
+        still queued, else the latest one running) and the finish tag of the
+        user's last active job.
+        """
+        start_tag = IngestionJob.finish_tag - IngestionJob.cost
+        result = await db.execute(select(
+            select(func.min(start_tag)).filter(IngestionJob.status == "queued").scalar_subquery(),
+            select(func.max(start_tag)).filter(IngestionJob.status == "running").scalar_subquery(),
+            select(func.max(IngestionJob.finish_tag)).filter(
+                IngestionJob.user_id == _as_uuid(user_id),
+                IngestionJob.status.in_(ACTIVE_JOB_STATUSES)
+            ).scalar_subquery()
+        ))
+        queued_start, running_start, user_finish = result.one()
+        virtual_time = queued_start if queued_start is not None else (running_start or 0.0)
+        tag = max(virtual_time, user_finish or 0.0)
+        tags = []
+        for cost in costs:
+            tag += cost
+            tags.append(tag)
+        return tags
+
+    @staticmethod
+    async def claim(db: AsyncSession, worker_id: str) -> Optional[IngestionJob]:
+        """Lease the next runnable job, or return None if there is none"""
+        for _ in range(5):
+            now = datetime.utcnow()
+            result = await db.execute(
+                select(IngestionJob.id)
+                .filter(IngestionJob.status == "queued", IngestionJob.available_at <= now)
+                .order_by(IngestionJob.finish_tag, IngestionJob.available_at, IngestionJob.created_at)
+                .limit(1)
+            )
+            job_id = result.scalar_one_or_none()
+            if job_id is None:
+                return None
+
+            claimed = await db.execute(
+                update(IngestionJob)
+                .where(IngestionJob.id == job_id, IngestionJob.status == "queued")
+                .values(
+                    status="running",
+                    lease_owner=worker_id,
+                    lease_expires_at=now + timedelta(seconds=settings.INGEST_JOB_LEASE_SECONDS),
+                    heartbeat_at=now,
+                    started_at=now,
+                    attempts=IngestionJob.attempts + 1
+                )
+            )
+            await db.commit()
+            if claimed.rowcount == 1:
+                result = await db.execute(
+                    select(IngestionJob)
+                    .filter(IngestionJob.id == job_id)
+                    .execution_options(populate_existing=True)
+                )
+                return result.scalar_one()
+            # Another worker won the race, try the next candidate
+        return None
+
+    @staticmethod
+    async def claim_batch(db: AsyncSession, worker_id: str, batch_id, limit: int) -> List[IngestionJob]:
+        """
+        Lease up to `limit` more runnable jobs of the same bulk upload, but
+        only those due before any other runnable job, so a bulk upload does
+        not jump ahead of other users' work.
+        """
+        now = datetime.utcnow()
+        batch_uuid = _as_uuid(batch_id)
+        runnable = (IngestionJob.status == "queued", IngestionJob.available_at <= now)
+        result = await db.execute(
+            select(func.min(IngestionJob.finish_tag)).filter(
+                *runnable, or_(IngestionJob.batch_id.is_(None), IngestionJob.batch_id != batch_uuid)
+            )
+        )
+        next_other = result.scalar_one_or_none()
+        query = select(IngestionJob.id).filter(IngestionJob.batch_id == batch_uuid, *runnable)
+        if next_other is not None:
+            query = query.filter(IngestionJob.finish_tag <= next_other)
+        result = await db.execute(query.order_by(IngestionJob.finish_tag, IngestionJob.created_at).limit(limit))
+        job_ids = result.scalars().all()
+        if not job_ids:
+            return []
+
+        await db.execute(
+            update(IngestionJob)
+            .where(IngestionJob.id.in_(job_ids), IngestionJob.status == "queued")
+            .values(
+                status="running",
+                lease_owner=worker_id,
+                lease_expires_at=now + timedelta(seconds=settings.INGEST_JOB_LEASE_SECONDS),
+                heartbeat_at=now,
+                started_at=now,
+                attempts=IngestionJob.attempts + 1
+            )
+        )
+        await db.commit()
+        # Jobs another worker claimed in between are not ours
+        result = await db.execute(
+            select(IngestionJob)
+            .filter(
+                IngestionJob.id.in_(job_ids),
+                IngestionJob.status == "running",
+                IngestionJob.lease_owner == worker_id
+            )
+            .execution_options(populate_existing=True)
+        )
+        return result.scalars().all()
+
+    @staticmethod
+    async def heartbeat(db: AsyncSession, job_id, worker_id: str) -> bool:
+        """Extend the lease; False means the lease was lost to another worker or the job was cancelled"""
+        now = datetime.utcnow()
+        result = await db.execute(
+            update(IngestionJob)
+            .where(
+                IngestionJob.id == _as_uuid(job_id),
+                IngestionJob.status == "running",
+                IngestionJob.lease_owner == worker_id
+            )
+            .values(
+                heartbeat_at=now,
+                lease_expires_at=now + timedelta(seconds=settings.INGEST_JOB_LEASE_SECONDS)
+            )
+        )
+        await db.commit()
+        return result.rowcount == 1
+
+    @staticmethod
+    async def cancel_document(db: AsyncSession, document_id) -> List[IngestionJob]:
+        """
+        Delete every job of a document that is being deleted, in the caller's
+        transaction. A worker running one sees its job gone on the next
+        heartbeat (JobQueue.missing) and stops and cleans up instead of
+        treating it as a lost lease. Returns the deleted jobs.
+        """
+        result = await db.execute(select(IngestionJob).filter(IngestionJob.document_id == _as_uuid(document_id)))
+        jobs = result.scalars().all()
+        for job in jobs:
+            await db.delete(job)
+        return jobs
+
+    @staticmethod
+    async def missing(db: AsyncSession, job_ids: Sequence) -> Set[uuid.UUID]:
+        """The ids among `job_ids` whose job no longer exists, i.e. was cancelled"""
+        job_ids = [_as_uuid(job_id) for job_id in job_ids]
+        result = await db.execute(select(IngestionJob.id).filter(IngestionJob.id.in_(job_ids)))
+        return set(job_ids) - set(result.scalars().all())
+
+    @staticmethod
+    async def complete(db: AsyncSession, job_id, worker_id: str) -> bool:
+        result = await db.execute(
+            update(IngestionJob)
+            .where(IngestionJob.id == _as_uuid(job_id), IngestionJob.lease_owner == worker_id)
+            .values(
+                status="succeeded",
+                finished_at=datetime.utcnow(),
+                lease_owner=None,
+                lease_expires_at=None,
+                last_error=None
+            )
+        )
+        await db.commit()
+        return result.rowcount == 1
+
+    @staticmethod
+    async def fail(db: AsyncSession, job_id, worker_id: str, error: str) -> bool:
+        """
+        Record a failed attempt. The job is re-queued with exponential backoff
+        until max_attempts is reached. Returns True if the failure is final.
+        """
+        result = await db.execute(
+            select(IngestionJob).filter(IngestionJob.id == _as_uuid(job_id))
+        )
+        job = result.scalar_one_or_none()
+        if not job or job.lease_owner != worker_id:
+            return False
+
+        now = datetime.utcnow()
+        final = job.attempts >= job.max_attempts
+        job.last_error = error
+        job.lease_owner = None
+        job.lease_expires_at = None
+        if final:
+            job.status = "failed"
+            job.finished_at = now
+        else:
+            job.status = "queued"
+            job.available_at = now + timedelta(seconds=JobQueue.retry_delay(job.attempts))
+        await db.commit()
+        return final
+
+    @staticmethod
+    def retry_delay(attempts: int) -> float:
+        base = settings.INGEST_JOB_RETRY_BACKOFF_SECONDS
+        return min(base * 2 ** max(attempts - 1, 0), 3600)
+
+    @staticmethod
+    async def requeue_expired(db: AsyncSession) -> int:
+        """Return jobs whose worker stopped heartbeating to the queue"""
+        now = datetime.utcnow()
+        result = await db.execute(
+            select(IngestionJob).filter(
+                IngestionJob.status == "running",
+                or_(IngestionJob.lease_expires_at.is_(None), IngestionJob.lease_expires_at < now)
+            )
+        )
+        jobs = result.scalars().all()
+        failed = []
+        for job in jobs:
+            logger.warning(f"Re-queuing orphaned ingestion job {job.id} (lease owner {job.lease_owner})")
+            job.lease_owner = None
+            job.lease_expires_at = None
+            job.last_error = LEASE_EXPIRED_ERROR
+            if job.attempts >= job.max_attempts:
+                job.status = "failed"
+                job.finished_at = now
+                failed.append(job)
+            else:
+                job.status = "queued"
+                job.available_at = now
+        docs = await JobQueue._fail_documents(db, failed)
+        await db.commit()
+
+        for job in failed:
+            if os.path.exists(job.file_path):
+                os.remove(job.file_path)
+        for doc, kind in docs:
+            publish_status(str(doc.id), str(doc.user_id), doc.processing_status, error=LEASE_EXPIRED_ERROR, kind=kind)
+        return len(jobs)
+
+    @staticmethod
+    async def _fail_documents(db: AsyncSession, jobs: Sequence[IngestionJob]) -> List[Tuple[Document, str]]:
+        """
+        Reflect jobs that used up their attempts on their documents, as
+        record_ingestion_failure does. Without this a document whose worker
+        keeps dying stays 'processing' and recover() queues it again.
+        """
+        if not jobs:
+            return []
+        result = await db.execute(
+            select(Document).options(undefer(Document.metadata_)).filter(
+                Document.id.in_({job.document_id for job in jobs})
+            )
+        )
+        docs = {doc.id: doc for doc in result.scalars().all()}
+        failed = []
+        for job in jobs:
+            doc = docs.get(job.document_id)
+            if doc is None:
+                continue
+            kind = job.kind or "ingest"
+            if kind != "ingest":
+                # Updates and re-chunks leave the previous version fully indexed
+                doc.metadata_ = {**(doc.metadata_ or {}), f"{kind}_error": job.last_error}
+            else:
+                doc.processing_status = "failed"
+                doc.metadata_ = {**(doc.metadata_ or {}), "processing_error": job.last_error}
+            failed.append((doc, kind))
+        return failed
+
+    @staticmethod
+    async def recover(db: AsyncSession) -> int:
+        """
+        Re-queue expired leases and adopt documents left pending or mid-ingestion
+        without an active job (e.g. by a restart). Runs on startup and periodically.
+        """
+        recovered = await JobQueue.requeue_expired(db)
+
+        active_jobs = select(IngestionJob.document_id).filter(
+            IngestionJob.status.in_(ACTIVE_JOB_STATUSES)
+        )
+        result = await db.execute(
+            select(Document).options(undefer(Document.metadata_)).filter(
+                Document.processing_status.in_(("pending", *INDEXING_STATUSES)),
+                Document.id.not_in(active_jobs),
+                # Leave room for an upload that is still writing its file
+                Document.upload_date < datetime.utcnow() - timedelta(seconds=ADOPT_GRACE_SECONDS)
+            )
+        )
+        for doc in result.scalars().all():
+            file_path = os.path.join(settings.UPLOAD_DIR, f"{doc.id}{doc.file_type}")
+            if os.path.exists(file_path):
+                cost = JobQueue.estimate_cost(doc.file_size, doc.total_pages)
+                finish_tag, = await JobQueue._finish_tags(db, doc.user_id, [cost])
+                db.add(IngestionJob(
+                    document_id=doc.id,
+                    file_path=file_path,
+                    user_id=doc.user_id,
+                    cost=cost,
+                    finish_tag=finish_tag,
+                    status="queued",
+                    max_attempts=settings.INGEST_JOB_MAX_ATTEMPTS,
+                    available_at=datetime.utcnow()
+                ))
+                recovered += 1
+            else:
+                doc.processing_status = "failed"
+                doc.metadata_ = {**(doc.metadata_ or {}), "processing_error": "Upload lost before processing"}
+        await db.commit()
+        return recovered
+
+    @staticmethod
+    async def metrics(db: AsyncSession, user_id=None) -> Dict[str, Dict[str, Any]]:
+        """
+        Per-user queue depth (jobs and estimated cost queued and running now)
+        and wait / run time percentiles over jobs created within
+        INGEST_METRICS_WINDOW_SECONDS, keyed by user id.
+        """
+        now = datetime.utcnow()
+        since = now - timedelta(seconds=settings.INGEST_METRICS_WINDOW_SECONDS)
+        query = select(
+            IngestionJob.user_id, IngestionJob.status, IngestionJob.cost,
+            IngestionJob.created_at, IngestionJob.started_at, IngestionJob.finished_at
+        ).filter(or_(IngestionJob.status.in_(ACTIVE_JOB_STATUSES), IngestionJob.created_at >= since))
+        if user_id is not None:
+            query = query.filter(IngestionJob.user_id == _as_uuid(user_id))
+        result = await db.execute(query)
+
+        def empty() -> Dict[str, Any]:
+            return {
+                "queued": 0, "queued_cost": 0.0, "running": 0, "running_cost": 0.0,
+                "succeeded": 0, "failed": 0, "waits": [], "runs": []
+            }
+
+        # A requested user is always reported, even with nothing queued
+        by_user: Dict[str, Dict[str, Any]] = {str(user_id): empty()} if user_id is not None else {}
+        for job_user, status, cost, created_at, started_at, finished_at in result.all():
+            user = by_user.setdefault(str(job_user) if job_user else "unassigned", empty())
+            user[status] += 1
+            if status in ACTIVE_JOB_STATUSES:
+                user[f"{status}_cost"] += cost or 0.0
+            if status == "queued":
+                user["waits"].append((now - created_at).total_seconds())
+            elif started_at is not None:
+                user["waits"].append((started_at - created_at).total_seconds())
+                if finished_at is not None:
+                    user["runs"].append((finished_at - started_at).total_seconds())
+
+        for user in by_user.values():
+            user["wait_seconds"] = percentiles(user.pop("waits"), digits=3)
+            user["run_seconds"] = percentiles(user.pop("runs"), digits=3)
+        return by_user
+
+
+def _as_uuid(value):
+    return uuid.UUID(value) if isinstance(value, str) else value
+
+
+# Singleton instance
+job_queue = JobQueue()
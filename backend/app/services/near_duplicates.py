@@ -0,0 +1,183 @@
+import hashlib
+import logging
+import re
+import uuid
+import zlib
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .document_processor import Chunk
+from .vector_store import vector_store
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_TOKEN = re.compile(r'\w+')
+
+# Chunk metadata written by NearDuplicateIndex.link_batch
+NEAR_DUPLICATE_KEYS = ("lsh_bands", "dup_cluster", "duplicate_of")
+
+
+class MinHasher:
+    """
+    MinHash signatures over word shingles, cut into LSH bands.
+
+    Two texts share a band key with high probability once the Jaccard
+    similarity of their shingle sets is above roughly
+    (1 / bands) ** (1 / rows per band).
+    """
+
+    def __init__(self, num_perm: int = 128, bands: int = 16, shingle_size: int = 5, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        # a, b < 2**32 keep a * hash + b inside uint64
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+    def shingles(self, text: str) -> np.ndarray:
+        """Sorted unique 32-bit hashes of the text's word n-grams"""
+        tokens = _TOKEN.findall(text.lower())
+        size = self.shingle_size
+        grams = [" ".join(tokens[i:i + size]) for i in range(max(1, len(tokens) - size + 1))]
+        return np.unique(np.fromiter(
+            (zlib.crc32(gram.encode("utf-8")) for gram in grams), dtype=np.uint64, count=len(grams)
+        ))
+
+    def signature(self, shingles: np.ndarray) -> np.ndarray:
+        hashed = (np.outer(shingles, self._a) + self._b) % _MERSENNE_PRIME & _MAX_HASH
+        return hashed.min(axis=0)
+
+    def band_keys(self, signature: np.ndarray) -> List[str]:
+        return [
+            f"{band}:{hashlib.blake2b(signature[band * self.rows:(band + 1) * self.rows].tobytes(), digest_size=8).hexdigest()}"
+            for band in range(self.bands)
+        ]
+
+
+def jaccard(a: np.ndarray, b: np.ndarray) -> float:
+    """Exact Jaccard similarity of two shingle sets from MinHasher.shingles"""
+    shared = len(np.intersect1d(a, b, assume_unique=True))
+    return shared / (len(a) + len(b) - shared) if shared else 0.0
+
+
+class NearDuplicateIndex:
+    """
+    Per-user near-duplicate detection for chunks, with the LSH index kept
+    in Qdrant: every point stores its band keys (metadata.lsh_bands), so the
+    candidates for a batch are one filtered scroll away and the index
+    follows documents as they are added and deleted.
+
+    Every chunk gets a duplicate cluster id (metadata.dup_cluster) that
+    search collapses on. A chunk whose shingles match a stored chunk of
+    another document at NEAR_DUPLICATE_THRESHOLD or more joins that chunk's
+    cluster, records it in metadata.duplicate_of and reuses its vector
+    instead of being embedded again.
+    """
+
+    def __init__(self, hasher: Optional[MinHasher] = None):
+        self.hasher = hasher or MinHasher(
+            num_perm=settings.MINHASH_PERMUTATIONS,
+            bands=settings.MINHASH_BANDS,
+            shingle_size=settings.MINHASH_SHINGLE_SIZE
+        )
+
+    def link_batch(self, chunks: Sequence[Chunk]) -> List[Optional[List[float]]]:
+        """
+        Tag `chunks` with band keys and a cluster id. Returns, per chunk, the
+        vector to reuse for a near-duplicate of a stored chunk, or None if
+        the chunk has to be embedded.
+        """
+        shingles = [self.hasher.shingles(chunk.text) for chunk in chunks]
+        for chunk, chunk_shingles in zip(chunks, shingles):
+            chunk.metadata["lsh_bands"] = self.hasher.band_keys(self.hasher.signature(chunk_shingles))
+
+        by_band = self._stored_candidates(chunks)
+        candidate_shingles: Dict[str, np.ndarray] = {}
+        # Earlier chunks of this batch are not stored yet, but can still share a cluster
+        batch_bands: Dict[str, List[int]] = {}
+        vectors: List[Optional[List[float]]] = []
+
+        for idx, (chunk, chunk_shingles) in enumerate(zip(chunks, shingles)):
+            best, best_score = None, settings.NEAR_DUPLICATE_THRESHOLD
+            for band in chunk.metadata["lsh_bands"]:
+                for record in by_band.get(band, ()):
+                    record_id = str(record.id)
+                    if record_id not in candidate_shingles:
+                        candidate_shingles[record_id] = self.hasher.shingles(record.payload.get("text", ""))
+                    score = jaccard(chunk_shingles, candidate_shingles[record_id])
+                    if score >= best_score:
+                        best, best_score = record, score
+
+            if best is not None:
+                best_metadata = best.payload.get("metadata", {})
+                chunk.metadata["dup_cluster"] = best_metadata.get("dup_cluster") or str(best.id)
+                chunk.metadata["duplicate_of"] = str(best.id)
+                vectors.append(best.vector)
+                continue
+
+            earlier = {other for band in chunk.metadata["lsh_bands"] for other in batch_bands.get(band, ())}
+            twin = next(
+                (other for other in sorted(earlier)
+                 if jaccard(chunk_shingles, shingles[other]) >= settings.NEAR_DUPLICATE_THRESHOLD),
+                None
+            )
+            chunk.metadata["dup_cluster"] = chunks[twin].metadata["dup_cluster"] if twin is not None else uuid.uuid4().hex
+            for band in chunk.metadata["lsh_bands"]:
+                batch_bands.setdefault(band, []).append(idx)
+            vectors.append(None)
+
+        return vectors
+
+    def _stored_candidates(self, chunks: Sequence[Chunk]) -> Dict[str, List[Any]]:
+        """band key -> stored points of the same user (other documents) sharing it"""
+        by_user: Dict[str, Dict[str, set]] = {}
+        for chunk in chunks:
+            user = by_user.setdefault(str(chunk.metadata.get("user_id")), {"bands": set(), "documents": set()})
+            user["bands"].update(chunk.metadata["lsh_bands"])
+            user["documents"].add(str(chunk.metadata["document_id"]))
+
+        by_band: Dict[str, List[Any]] = {}
+        for user_id, user in by_user.items():
+            try:
+                records = vector_store.find_by_bands(
+                    user_id,
+                    sorted(user["bands"]),
+                    exclude_document_ids=sorted(user["documents"]),
+                    limit=settings.NEAR_DUPLICATE_MAX_CANDIDATES
+                )
+            except Exception as e:
+                # Detection only saves work; never fail ingestion over it
+                logger.warning(f"Near-duplicate lookup failed, embedding the batch as is: {e}")
+                continue
+            for record in records:
+                for band in record.payload.get("metadata", {}).get("lsh_bands", ()):
+                    if band in user["bands"]:
+                        by_band.setdefault(band, []).append(record)
+        return by_band
+
+
+def collapse_duplicates(results: List[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+    """Keep the best scoring hit of each duplicate cluster; `results` are sorted by score"""
+    seen = set()
+    collapsed = []
+    for result in results:
+        cluster = result["metadata"].get("dup_cluster")
+        if cluster is not None:
+            if cluster in seen:
+                continue
+            seen.add(cluster)
+        collapsed.append(result)
+        if len(collapsed) == limit:
+            break
+    return collapsed
+
+
+# Singleton instance
+near_duplicate_index = NearDuplicateIndex()
@@ -0,0 +1,141 @@
+import asyncio
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from ..core.config import settings
+
+# Live progress events are rate limited per document, final ones always go out
+PUBLISH_INTERVAL_SECONDS = 0.5
+SUBSCRIBER_QUEUE_SIZE = 256
+
+STAGES = ("extract", "embed", "upsert")
+
+# Statuses that keep a document in the broker's in-flight snapshot
+IN_FLIGHT_STATUSES = ("processing", "partially_indexed")
+
+
+class ProgressBroker:
+    """
+    In-process fan-out of ingestion progress events to SSE subscribers,
+    keyed by user. Keeps the latest event of every in-flight document so
+    new subscribers start from the current state; one without news for a
+    whole job lease was abandoned by its worker (or deleted by another
+    process) and is dropped.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        # document_id -> (monotonic time, latest event)
+        self._latest: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+
+    def subscribe(self, user_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: str, queue: asyncio.Queue):
+        queues = self._subscribers.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[user_id]
+
+    def snapshot(self, user_id: str) -> List[Dict[str, Any]]:
+        self._expire()
+        return [event for _, event in self._latest.values() if event["user_id"] == user_id]
+
+    def publish(self, event: Dict[str, Any]):
+        self._expire()
+        if event["status"] in IN_FLIGHT_STATUSES:
+            self._latest[event["document_id"]] = (time.monotonic(), event)
+        else:
+            self._latest.pop(event["document_id"], None)
+
+        for queue in self._subscribers.get(event["user_id"], ()):
+            if queue.full():
+                # Slow consumer: drop its oldest event rather than block ingestion
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    def _expire(self):
+        cutoff = time.monotonic() - settings.INGEST_JOB_LEASE_SECONDS
+        for document_id in [document_id for document_id, (at, _) in self._latest.items() if at < cutoff]:
+            del self._latest[document_id]
+
+
+class IngestionProgress:
+    """
+    Counters and wall time per pipeline stage for one document.
+
+    `pages` and `metadata` are the live page container (a dict or an
+    ArtifactWriter) and metadata dict the extractor fills in, so pages
+    extracted and total pages are read as they grow.
+    """
+
+    def __init__(
+        self,
+        document_id: str,
+        user_id: str,
+        filename: str,
+        pages: Optional[Dict[int, str]] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ):
+        self.document_id = document_id
+        self.user_id = user_id
+        self.filename = filename
+        self.pages = pages if pages is not None else {}
+        self.metadata = metadata if metadata is not None else {}
+        self.status = "processing"
+        self.started = time.perf_counter()
+        self.items = {stage: 0 for stage in STAGES}
+        self.seconds = {stage: 0.0 for stage in STAGES}
+        self._last_publish = 0.0
+
+    def record(self, stage: str, items: int, seconds: float):
+        self.items[stage] += items
+        self.seconds[stage] += seconds
+        self.publish()
+
+    def summary(self) -> Dict[str, Any]:
+        stages = {}
+        for stage in STAGES:
+            seconds = self.seconds[stage]
+            stages[stage] = {
+                "items": self.items[stage],
+                "seconds": round(seconds, 3),
+                "per_second": round(self.items[stage] / seconds, 1) if seconds else None
+            }
+        return {
+            "pages_extracted": len(self.pages),
+            "total_pages": self.metadata.get("total_pages"),
+            "chunks_created": self.items["extract"],
+            "chunks_embedded": self.items["embed"],
+            "points_upserted": self.items["upsert"],
+            "extractors": dict(Counter(page["extractor"] for page in self.metadata.get("page_extraction", ()))),
+            "elapsed_seconds": round(time.perf_counter() - self.started, 3),
+            "stages": stages
+        }
+
+    def publish(self, status: Optional[str] = None, force: bool = False, **extra):
+        now = time.perf_counter()
+        if not force and now - self._last_publish < PUBLISH_INTERVAL_SECONDS:
+            return
+        self._last_publish = now
+        progress_broker.publish({
+            "document_id": self.document_id,
+            "user_id": self.user_id,
+            "filename": self.filename,
+            "status": status or self.status,
+            **self.summary(),
+            **extra
+        })
+
+
+def publish_status(document_id: str, user_id: str, status: str, **extra):
+    """Status change without stage counters, e.g. a failed attempt"""
+    progress_broker.publish({"document_id": document_id, "user_id": user_id, "status": status, **extra})
+
+
+# Singleton instance
+progress_broker = ProgressBroker()
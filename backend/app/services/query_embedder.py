@@ -0,0 +1,120 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .embedding_cache import QueryEmbeddingCache, normalize_query, query_embedding_cache
+from .embedding_scheduler import INTERACTIVE, embedding_scheduler
+from .embeddings import embedding_service
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class QueryEmbedder:
+    """
+    Async front end for query embeddings. Concurrent `embed` calls are
+    gathered for up to QUERY_EMBED_BATCH_WINDOW_MS (or until
+    QUERY_EMBED_MAX_BATCH are waiting) and embedded in one model call at
+    interactive priority on the embedding scheduler's thread, so the event
+    loop never runs ONNX inference, concurrent questions share a batch
+    instead of queueing one by one, and ingestion never delays them by
+    more than one slice.
+
+    Questions are normalized (normalize_query) before embedding. Repeats
+    are answered from the query cache, and callers asking the same
+    question while it is being embedded share that one model call.
+    """
+
+    def __init__(self, cache: Optional[QueryEmbeddingCache] = None):
+        self.cache = cache or query_embedding_cache
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._full: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._batches = 0
+        self._requests = 0
+        self._embedded = 0
+        self._largest_batch = 0
+
+    async def embed(self, text: str) -> List[float]:
+        query = normalize_query(text)
+        cached = self.cache.get(embedding_service.model_name, query)
+        if cached is not None:
+            return cached.tolist()
+
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # State is bound to one event loop (tests and workers may run several)
+            self._loop = loop
+            self._pending = []
+            self._inflight = {}
+            self._full = asyncio.Event()
+            self._task = None
+
+        self._requests += 1
+        future = self._inflight.get(query)
+        if future is None:
+            future = self._inflight[query] = loop.create_future()
+            self._pending.append((query, future))
+            if len(self._pending) >= settings.QUERY_EMBED_MAX_BATCH:
+                self._full.set()
+            if self._task is None:
+                self._task = loop.create_task(self._drain())
+        # A caller that goes away must not cancel the embedding others wait for
+        return await asyncio.shield(future)
+
+    def stats(self) -> dict:
+        return {
+            "requests": self._requests,
+            "embedded": self._embedded,
+            "batches": self._batches,
+            "mean_batch": round(self._embedded / self._batches, 2) if self._batches else 0.0,
+            "largest_batch": self._largest_batch,
+            "waiting": len(self._pending)
+        }
+
+    async def _drain(self):
+        try:
+            while self._pending:
+                if len(self._pending) < settings.QUERY_EMBED_MAX_BATCH:
+                    try:
+                        await asyncio.wait_for(self._full.wait(), settings.QUERY_EMBED_BATCH_WINDOW_MS / 1000)
+                    except asyncio.TimeoutError:
+                        pass
+                self._full.clear()
+
+                batch = self._pending[:settings.QUERY_EMBED_MAX_BATCH]
+                del self._pending[:len(batch)]
+                if batch:
+                    await self._run_batch(batch)
+        finally:
+            self._task = None
+
+    async def _run_batch(self, batch: List[Tuple[str, asyncio.Future]]):
+        queries = [query for query, _ in batch]
+        self._batches += 1
+        self._embedded += len(batch)
+        self._largest_batch = max(self._largest_batch, len(batch))
+        try:
+            vectors = np.asarray(
+                await embedding_scheduler.run(INTERACTIVE, embedding_service.embed_texts, queries), dtype=np.float32
+            )
+        except Exception as e:
+            logger.error(f"Query embedding batch of {len(queries)} failed: {e}")
+            vectors, error = None, e
+        for index, (query, future) in enumerate(batch):
+            self._inflight.pop(query, None)
+            if vectors is None:
+                future.set_exception(error)
+                # Marked retrieved: every caller may have gone away
+                future.exception()
+            else:
+                self.cache.put(embedding_service.model_name, query, vectors[index])
+                future.set_result(vectors[index].tolist())
+
+
+# Singleton instance
+query_embedder = QueryEmbedder()
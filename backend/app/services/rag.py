@@ -1,5 +1,5 @@
 from typing import List, Dict, Any
-from .embeddings import embedding_service
+from .query_embedder import query_embedder
 from .vector_store import vector_store
 from .llm import llm_service
 
@@ -17,7 +17,7 @@ class RAGService:
         """
 
         # Step 1: Embed the question
-        question_embedding = embedding_service.embed_text(question)
+        question_embedding = await query_embedder.embed(question)
 
         # Step 2: Retrieve relevant chunks
         print(f"DEBUG: RAG query for question: '{question}' (doc_ids: {document_ids})")
@@ -84,7 +84,7 @@ class RAGService:
         Streaming RAG pipeline: retrieve context and yield streaming LLM response
         """
         # Step 1: Embed the question
-        question_embedding = embedding_service.embed_text(question)
+        question_embedding = await query_embedder.embed(question)
 
         # Step 2: Retrieve relevant chunks
         relevant_chunks = vector_store.search(
@@ -1,6 +1,7 @@
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
-from typing import List, Dict, Any
+from qdrant_client.models import Batch, Distance, VectorParams, PointStruct
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
 import uuid
 from ..core.config import settings
 
@@ -45,35 +46,42 @@ class VectorStore:
                     )
                 )
                 print(f"Created collection: {settings.QDRANT_COLLECTION_NAME} with COSINE distance")
+
+            # Near-duplicate lookups filter on LSH band keys; a no-op if the index exists
+            from qdrant_client.models import PayloadSchemaType
+            self.client.create_payload_index(
+                collection_name=settings.QDRANT_COLLECTION_NAME,
+                field_name="metadata.lsh_bands",
+                field_schema=PayloadSchemaType.KEYWORD
+            )
         except Exception as e:
             print(f"Error ensuring collection: {e}")
 
-    def upsert_chunks(self, chunks: List[Dict[str, Any]], embeddings: List[List[float]]):
-        """Insert or update chunks with embeddings"""
+    def upsert_chunks(self, chunks: List[Dict[str, Any]], embeddings: np.ndarray, ids: List[str] = None):
+        """
+        Insert or update chunks with their embeddings, one row of the float32
+        matrix per chunk. Sent as one columnar batch: per-point structs cost
+        a model walk per vector in the client before anything is serialized.
+        """
         self.ensure_collection()
-        points = []
-
-        for idx, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
+        payloads = []
+        for chunk in chunks:
             # Handle chunk object or dict
             text = chunk.text if hasattr(chunk, 'text') else chunk['text']
             metadata = chunk.metadata if hasattr(chunk, 'metadata') else chunk['metadata']
-
-            point = PointStruct(
-                id=str(uuid.uuid4()),
-                vector=embedding,
-                payload={
-                    "text": text,
-                    "metadata": metadata
-                }
-            )
-            points.append(point)
+            payloads.append({"text": text, "metadata": metadata})
 
         self.client.upsert(
             collection_name=settings.QDRANT_COLLECTION_NAME,
-            points=points
+            points=Batch(
+                ids=list(ids) if ids else [str(uuid.uuid4()) for _ in payloads],
+                # The JSON body needs plain floats; they only live for this call
+                vectors=np.asarray(embeddings, dtype=np.float32).tolist(),
+                payloads=payloads
+            )
         )
 
-        return len(points)
+        return len(payloads)
 
     def search(self, query_embedding: List[float], document_ids: List[str] = None, user_id: str = None, limit: int = None) -> List[Dict[str, Any]]:
         """Search for similar chunks with support for multi-document and user filtering"""
@@ -81,6 +89,9 @@ class VectorStore:
         if limit is None:
             limit = settings.TOP_K_RESULTS
 
+        # Over-fetch so collapsing near-duplicates still leaves `limit` distinct hits
+        fetch_limit = limit * settings.NEAR_DUPLICATE_SEARCH_OVERFETCH if settings.NEAR_DUPLICATE_DETECTION else limit
+
         # Build filter
         from qdrant_client.models import Filter, FieldCondition, MatchAny, MatchValue
         
@@ -115,7 +126,7 @@ class VectorStore:
                 collection_name=settings.QDRANT_COLLECTION_NAME,
                 query=query_embedding,
                 query_filter=search_filter,
-                limit=limit,
+                limit=fetch_limit,
                 score_threshold=settings.SIMILARITY_THRESHOLD
             )
             results = search_result.points
@@ -132,7 +143,154 @@ class VectorStore:
                 "score": result.score
             })
 
-        return formatted_results
+        if settings.NEAR_DUPLICATE_DETECTION:
+            from .near_duplicates import collapse_duplicates
+            return collapse_duplicates(formatted_results, limit)
+        return formatted_results[:limit]
+
+    def find_by_bands(self, user_id: str, bands: List[str], exclude_document_ids: List[str], limit: int) -> list:
+        """A user's points (payload and vector) sharing any LSH band key, outside the given documents"""
+        if not bands:
+            return []
+        self.ensure_collection()
+        from qdrant_client.models import Filter, FieldCondition, MatchAny, MatchValue
+
+        records, _ = self.client.scroll(
+            collection_name=settings.QDRANT_COLLECTION_NAME,
+            scroll_filter=Filter(
+                must=[
+                    FieldCondition(key="metadata.user_id", match=MatchValue(value=str(user_id))),
+                    FieldCondition(key="metadata.lsh_bands", match=MatchAny(any=bands))
+                ],
+                must_not=[
+                    FieldCondition(key="metadata.document_id", match=MatchAny(any=exclude_document_ids))
+                ]
+            ),
+            limit=limit,
+            with_payload=True,
+            with_vectors=True
+        )
+        return records
+
+    def clone_document_vectors(self, source_document_id: str, document_id: str, user_id: str, filename: str, batch_size: int = 256) -> int:
+        """
+        Copy another document's points (vectors included) under a new
+        document/user payload. Near-duplicate links stay within a user: for
+        another user's points the clusters get new ids (chunks that shared
+        one still do) and duplicate_of, which names the other user's point,
+        is dropped. The LSH band keys only depend on the text and are kept.
+        """
+        self.ensure_collection()
+        from qdrant_client.models import Filter, FieldCondition, MatchValue
+
+        source_filter = Filter(
+            must=[
+                FieldCondition(
+                    key="metadata.document_id",
+                    match=MatchValue(value=str(source_document_id))
+                )
+            ]
+        )
+
+        # Source cluster -> its id among the new user's points
+        clusters: Dict[str, str] = {}
+        copied = 0
+        offset = None
+        while True:
+            records, offset = self.client.scroll(
+                collection_name=settings.QDRANT_COLLECTION_NAME,
+                scroll_filter=source_filter,
+                limit=batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True
+            )
+            if records:
+                points = [
+                    PointStruct(
+                        id=str(uuid.uuid4()),
+                        vector=record.vector,
+                        payload={
+                            **record.payload,
+                            "metadata": _cloned_metadata(
+                                record.payload["metadata"], str(document_id), str(user_id), filename, clusters
+                            )
+                        }
+                    )
+                    for record in records
+                ]
+                self.client.upsert(
+                    collection_name=settings.QDRANT_COLLECTION_NAME,
+                    points=points
+                )
+                copied += len(points)
+            if offset is None:
+                break
+
+        return copied
+
+    def get_chunk_index(self, document_id: str, batch_size: int = 1024) -> Dict[Tuple[int, Optional[str]], List[Tuple[str, Dict[str, Any]]]]:
+        """
+        Map (page, chunk_hash) -> [(point_id, metadata)] for a document's points,
+        without loading texts or vectors. Points indexed before chunk hashes
+        were recorded map to a None hash.
+        """
+        self.ensure_collection()
+        from qdrant_client.models import Filter, FieldCondition, MatchValue
+
+        index: Dict[Tuple[int, Optional[str]], List[Tuple[str, Dict[str, Any]]]] = {}
+        offset = None
+        while True:
+            records, offset = self.client.scroll(
+                collection_name=settings.QDRANT_COLLECTION_NAME,
+                scroll_filter=Filter(
+                    must=[
+                        FieldCondition(
+                            key="metadata.document_id",
+                            match=MatchValue(value=str(document_id))
+                        )
+                    ]
+                ),
+                limit=batch_size,
+                offset=offset,
+                with_payload=["metadata"],
+                with_vectors=False
+            )
+            for record in records:
+                metadata = record.payload.get("metadata", {})
+                key = (metadata.get("page"), metadata.get("chunk_hash"))
+                index.setdefault(key, []).append((str(record.id), metadata))
+            if offset is None:
+                break
+
+        return index
+
+    def update_chunk_metadata(self, updates: List[Tuple[str, Dict[str, Any]]]):
+        """Replace the metadata payload of existing points, keeping text and vectors"""
+        if not updates:
+            return
+        self.ensure_collection()
+        from qdrant_client.models import SetPayload, SetPayloadOperation
+
+        self.client.batch_update_points(
+            collection_name=settings.QDRANT_COLLECTION_NAME,
+            update_operations=[
+                SetPayloadOperation(set_payload=SetPayload(payload={"metadata": metadata}, points=[point_id]))
+                for point_id, metadata in updates
+            ]
+        )
+
+    def delete_points(self, point_ids: List[str]):
+        """Delete points by id"""
+        if not point_ids:
+            return
+        self.ensure_collection()
+        from qdrant_client.models import PointIdsList
+
+        self.client.delete(
+            collection_name=settings.QDRANT_COLLECTION_NAME,
+            points_selector=PointIdsList(points=list(point_ids))
+        )
 
     def delete_by_document(self, document_id: str):
         """Delete all chunks for a document"""
@@ -151,5 +309,15 @@ class VectorStore:
             )
         )
 
+def _cloned_metadata(
+    metadata: Dict[str, Any], document_id: str, user_id: str, filename: str, clusters: Dict[str, str]
+) -> Dict[str, Any]:
+    cloned = {**metadata, "document_id": document_id, "user_id": user_id, "filename": filename}
+    if str(metadata.get("user_id")) != user_id:
+        cloned.pop("duplicate_of", None)
+        if cloned.get("dup_cluster") is not None:
+            cloned["dup_cluster"] = clusters.setdefault(cloned["dup_cluster"], uuid.uuid4().hex)
+    return cloned
+
 # Singleton instance
 vector_store = VectorStore()
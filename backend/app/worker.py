@@ -0,0 +1,41 @@
+"""
+Standalone ingestion worker.
+
+    python -m app.worker [--concurrency N]
+
+Use with INGEST_WORKER_MODE=external so the API process only enqueues jobs.
+"""
+import argparse
+import asyncio
+import logging
+
+from .core.database import engine, Base, add_missing_columns
+from .models import document, job, usage, user  # noqa: F401 - register tables
+from .services.embeddings import embedding_service
+from .services.ingestion_worker import IngestionWorkerPool
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def main(concurrency: int = None):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(add_missing_columns)
+
+    pool = IngestionWorkerPool(concurrency=concurrency)
+    try:
+        await pool.run_forever()
+    finally:
+        embedding_service.shutdown()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run ingestion workers")
+    parser.add_argument("--concurrency", type=int, default=None)
+    args = parser.parse_args()
+    try:
+        asyncio.run(main(args.concurrency))
+    except KeyboardInterrupt:
+        logger.info("Ingestion worker stopped.")
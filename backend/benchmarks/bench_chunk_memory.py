@@ -0,0 +1,121 @@
+"""
+Peak-RSS benchmark of the chunk representation on a large document.
+
+    cd backend && python -m benchmarks.bench_chunk_memory [--size-mb 10]
+
+Every measurement runs in a fresh interpreter, once with the slot-based
+Chunk (offsets into the shared page string) and once with the previous
+representation (a plain object holding its own copy of the text), over:
+
+  list      all chunks of the document materialized at once, as
+            DocumentProcessor._chunk_text / smart_chunk do
+  pipeline  the streaming IngestionPipeline over a .txt file, with
+            embedding and upserts replaced by no-ops
+
+Reported is the growth of peak RSS over the RSS once the document text
+is loaded and every module is imported (Linux: the kernel's peak counter
+is reset at that point).
+"""
+import argparse
+import asyncio
+import gc
+import os
+import subprocess
+import sys
+import tempfile
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///./bench.db")
+os.environ.setdefault("QDRANT_URL", "http://localhost:6333")
+
+from benchmarks.bench_chunker import synthetic_page  # noqa: E402
+
+
+class LegacyChunk:
+    """The previous Chunk: per-instance __dict__ and its own text copy"""
+
+    def __init__(self, text, metadata, start=0, end=None):
+        self.text = text[start:end]
+        self.metadata = metadata
+
+
+def _status_mb(field: str) -> float:
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    raise RuntimeError(f"{field} not in /proc/self/status")
+
+
+def reset_peak_rss():
+    # Writing 5 to clear_refs resets VmHWM to the current RSS
+    with open("/proc/self/clear_refs", "w") as clear_refs:
+        clear_refs.write("5")
+
+
+def run_list(text: str) -> int:
+    from app.services.document_processor import DocumentProcessor
+    chunks = DocumentProcessor._chunk_text(text, {"document_id": "bench", "filename": "bench.txt", "page": 1})
+    return len(chunks)
+
+
+def run_pipeline(path: str) -> int:
+    from app.services import ingestion
+    result = asyncio.run(ingestion.IngestionPipeline().run(path, "bench", "bench.txt", "bench-user"))
+    return result.chunk_count
+
+
+def measure(scenario: str, representation: str, size_mb: float):
+    """Child process body: prints chunks, baseline MB and peak MB"""
+    from app.core.config import settings
+    from app.services import document_processor, ingestion
+    from app.services.embeddings import embedding_service
+
+    if representation == "legacy":
+        document_processor.Chunk = LegacyChunk
+    settings.NEAR_DUPLICATE_DETECTION = False
+    embedding_service.embed_batch = lambda texts: [[0.0] * 8 for _ in texts]
+    ingestion.vector_store.upsert_chunks = lambda chunks, embeddings, ids=None: len(chunks)
+
+    text = synthetic_page(int(size_mb * 1024 * 1024))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.txt")
+        if scenario == "pipeline":
+            with open(path, "w", encoding="utf-8") as file:
+                file.write(text)
+            # The pipeline reads the file itself
+            text = None
+        gc.collect()
+        reset_peak_rss()
+        baseline = _status_mb("VmRSS")
+        chunks = run_list(text) if scenario == "list" else run_pipeline(path)
+        print(chunks, baseline, _status_mb("VmHWM"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=float, default=10)
+    parser.add_argument("--child", nargs=2, metavar=("SCENARIO", "REPRESENTATION"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        measure(*args.child, args.size_mb)
+        return
+
+    print(f"{args.size_mb:g} MB document, peak RSS growth over the loaded text")
+    print(f"{'scenario':>9} {'chunks':>8} {'legacy MB':>10} {'slots MB':>9} {'saved':>7}")
+    for scenario in ("list", "pipeline"):
+        growth = {}
+        for representation in ("legacy", "slots"):
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_chunk_memory",
+                 "--size-mb", str(args.size_mb), "--child", scenario, representation],
+                capture_output=True, text=True, check=True
+            ).stdout.split()
+            chunks, baseline, peak = int(output[-3]), float(output[-2]), float(output[-1])
+            growth[representation] = peak - baseline
+        saved = 1 - growth["slots"] / growth["legacy"] if growth["legacy"] else 0.0
+        print(f"{scenario:>9} {chunks:>8} {growth['legacy']:>10.1f} {growth['slots']:>9.1f} {saved:>6.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Chunker micro-benchmark over large synthetic pages.
+
+    cd backend && python -m benchmarks.bench_chunker [--sizes-mb 1 2 5 10]
+
+Compares the offset-based chunker with the previous string-concatenation
+implementation. Linear scaling shows up as a flat MB/s column.
+"""
+import argparse
+import os
+import random
+import re
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///./bench.db")
+os.environ.setdefault("QDRANT_URL", "http://localhost:6333")
+
+from app.core.config import settings  # noqa: E402
+from app.services.document_processor import Chunk, DocumentProcessor  # noqa: E402
+
+WORDS = (
+    "policy employee contract clause section payment invoice vendor schedule "
+    "compliance security access review approval budget report quarterly annual"
+).split()
+
+
+def synthetic_page(size_bytes: int, seed: int = 7) -> str:
+    rng = random.Random(seed)
+    parts, length = [], 0
+    while length < size_bytes:
+        sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 40)))
+        sentence = sentence.capitalize() + rng.choice(".!?")
+        if rng.random() < 0.05:
+            sentence += "\n\n"
+        parts.append(sentence)
+        length += len(sentence) + 1
+    return " ".join(parts)
+
+
+def legacy_chunk_text(text: str, base_metadata: dict):
+    """The previous implementation, kept here for comparison only"""
+    chunks = []
+    sentences = re.split(r'(?<=[.!?])\s+', text)
+    current_chunk = ""
+    current_length = 0
+    for sentence in sentences:
+        sentence_length = len(sentence)
+        if current_length + sentence_length < settings.CHUNK_SIZE:
+            current_chunk += sentence + " "
+            current_length += sentence_length
+        else:
+            if current_chunk.strip():
+                chunks.append(Chunk(
+                    text=current_chunk.strip(),
+                    metadata={**base_metadata, "chunk_index": len(chunks), "chunk_length": len(current_chunk)}
+                ))
+            overlap_size = settings.CHUNK_OVERLAP
+            overlap_text = current_chunk[-overlap_size:] if len(current_chunk) > overlap_size else current_chunk
+            current_chunk = overlap_text + sentence + " "
+            current_length = len(current_chunk)
+    if current_chunk.strip():
+        chunks.append(Chunk(
+            text=current_chunk.strip(),
+            metadata={**base_metadata, "chunk_index": len(chunks), "chunk_length": len(current_chunk)}
+        ))
+    return chunks
+
+
+def best_of(fn, repeat: int):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes-mb", type=float, nargs="+", default=[1, 2, 5, 10])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"CHUNK_SIZE={settings.CHUNK_SIZE} CHUNK_OVERLAP={settings.CHUNK_OVERLAP}")
+    print(f"{'size MB':>8} {'chunks':>8} {'offset s':>9} {'MB/s':>7} {'legacy s':>9} {'MB/s':>7} {'speedup':>8}")
+    for size_mb in args.sizes_mb:
+        text = synthetic_page(int(size_mb * 1024 * 1024))
+        base_metadata = {"document_id": "bench", "filename": "bench.txt", "page": 1}
+
+        new_s, chunks = best_of(lambda: DocumentProcessor._chunk_text(text, base_metadata), args.repeat)
+        old_s, _ = best_of(lambda: legacy_chunk_text(text, base_metadata), args.repeat)
+        print(
+            f"{size_mb:>8.1f} {len(chunks):>8} {new_s:>9.3f} {size_mb / new_s:>7.1f} "
+            f"{old_s:>9.3f} {size_mb / old_s:>7.1f} {old_s / new_s:>7.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Client-side cost of handing embeddings to Qdrant, per document.
+
+    cd backend && python -m benchmarks.bench_embedding_path [--chunks 2000]
+
+Starts from the float32 rows the model returns and stops at the JSON body
+of the upsert request, without sending it:
+
+  lists   previous path: .tolist() per vector, one PointStruct per chunk
+  matrix  one float32 matrix, sent as a columnar Batch
+
+Both run what QdrantClient.upsert does before the request goes out (the
+inference inspection walk over the points) and the request serialization.
+Reported are the time and the tracemalloc peak over the model output.
+"""
+import argparse
+import os
+import time
+import tracemalloc
+import uuid
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///./bench.db")
+os.environ.setdefault("QDRANT_URL", "http://localhost:6333")
+
+import numpy as np  # noqa: E402
+from qdrant_client import QdrantClient  # noqa: E402
+from qdrant_client.models import Batch, PointStruct, PointsList  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+
+
+def lists_path(client, rows, ids, payloads) -> int:
+    embeddings = [row.tolist() for row in rows]
+    points = [
+        PointStruct(id=point_id, vector=vector, payload=payload)
+        for point_id, vector, payload in zip(ids, embeddings, payloads)
+    ]
+    client._inference_inspector.inspect(points)
+    return len(PointsList(points=points).model_dump_json(exclude_none=True))
+
+
+def matrix_path(client, rows, ids, payloads) -> int:
+    matrix = np.array(rows, dtype=np.float32)
+    batch = Batch(ids=ids, vectors=matrix.tolist(), payloads=payloads)
+    client._inference_inspector.inspect(batch)
+    return len(batch.model_dump_json(exclude_none=True))
+
+
+def measure(path, client, rows, ids, payloads):
+    started = time.perf_counter()
+    path(client, rows, ids, payloads)
+    elapsed = time.perf_counter() - started
+    # Timed separately: tracing slows the per-object walk down a lot
+    tracemalloc.start()
+    path(client, rows, ids, payloads)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    client = QdrantClient(url=settings.QDRANT_URL, check_compatibility=False)
+    rng = np.random.default_rng(7)
+    # fastembed yields one float32 array per text
+    rows = list(rng.standard_normal((args.chunks, settings.EMBEDDING_DIMENSION), dtype=np.float32))
+    ids = [str(uuid.uuid4()) for _ in rows]
+    payloads = [
+        {"text": "lorem ipsum " * 80, "metadata": {"document_id": "bench", "page": i // 4 + 1, "chunk_index": i}}
+        for i in range(args.chunks)
+    ]
+
+    print(f"{args.chunks} chunks x {settings.EMBEDDING_DIMENSION} dims, best of {args.repeat}")
+    print(f"{'path':>7} {'seconds':>8} {'peak MB':>8}")
+    for name, path in (("lists", lists_path), ("matrix", matrix_path)):
+        runs = [measure(path, client, rows, ids, payloads) for _ in range(args.repeat)]
+        print(f"{name:>7} {min(r[0] for r in runs):>8.3f} {min(r[1] for r in runs):>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Ingestion embedding throughput against the number of worker processes.
+
+    cd backend && python -m benchmarks.bench_embedding_workers [--workers 1 2 4] [--threads 1] [--chunks 2048]
+    cd backend && python -m benchmarks.bench_embedding_workers --synthetic 2
+
+Embeds `--chunks` chunk-sized texts in batches of `--batch` and reports
+chunks/second. 1 worker is the in-process model (fastembed defaults);
+N > 1 shards every batch across N EmbeddingWorkerPool processes with
+`--threads` ONNX threads each. Workers load the model before timing
+starts. `--synthetic MS_PER_TEXT` replaces the model with a CPU-bound
+loop of that cost per text, for machines without the model files.
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///./bench.db")
+os.environ.setdefault("QDRANT_URL", "http://localhost:6333")
+
+import numpy as np  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.services.embeddings import EmbeddingWorkerPool, embedding_service  # noqa: E402
+from benchmarks.bench_chunker import synthetic_page  # noqa: E402
+
+
+def synthetic_shard(texts, threads):
+    """CPU-bound stand-in for the model; module level and configured by environment for worker processes"""
+    deadline = time.process_time() + float(os.environ["BENCH_SYNTHETIC_MS"]) * len(texts) / 1000
+    while time.process_time() < deadline:
+        pass
+    return np.zeros((len(texts), settings.EMBEDDING_DIMENSION), dtype=np.float32)
+
+
+def run(workers: int, threads: int, texts, batch: int, synthetic: bool) -> float:
+    pool = None
+    if workers > 1:
+        pool = EmbeddingWorkerPool(workers, threads, target=synthetic_shard if synthetic else None)
+        embed = pool.embed
+        # Spawn the workers and load a model in each
+        embed(texts[:workers * settings.EMBEDDING_WORKER_MIN_SHARD])
+    elif synthetic:
+        def embed(chunk):
+            return synthetic_shard(chunk, threads)
+    else:
+        def embed(chunk):
+            return np.array(list(embedding_service.model.embed(chunk)), dtype=np.float32)
+        embed(texts[:8])
+
+    try:
+        started = time.perf_counter()
+        rows = sum(len(embed(texts[start:start + batch])) for start in range(0, len(texts), batch))
+        return rows / (time.perf_counter() - started)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--chunks", type=int, default=2048)
+    parser.add_argument("--batch", type=int, default=256)
+    parser.add_argument("--synthetic", type=float, metavar="MS_PER_TEXT")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        os.environ["BENCH_SYNTHETIC_MS"] = str(args.synthetic)
+    page = synthetic_page(args.chunks * settings.CHUNK_SIZE)
+    texts = [page[i * settings.CHUNK_SIZE:(i + 1) * settings.CHUNK_SIZE] for i in range(args.chunks)]
+
+    print(f"{args.chunks} chunks, batches of {args.batch}, {os.cpu_count()} CPUs")
+    print(f"{'workers':>8} {'threads':>8} {'chunks/s':>9} {'speedup':>8}")
+    baseline = None
+    for workers in args.workers:
+        rate = run(workers, args.threads, texts, args.batch, bool(args.synthetic))
+        baseline = baseline or rate
+        threads = args.threads if workers > 1 or args.synthetic else "auto"
+        print(f"{workers:>8} {threads:>8} {rate:>9.1f} {rate / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
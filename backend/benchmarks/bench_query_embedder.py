@@ -0,0 +1,152 @@
+"""
+Query-embedding throughput, latency and event-loop lag under concurrent users.
+
+    cd backend && python -m benchmarks.bench_query_embedder [--users 50] [--queries 10]
+    cd backend && python -m benchmarks.bench_query_embedder --synthetic 8 0.5
+
+Every user asks `--queries` questions back to back. Compared are the
+previous path (embed_text called inside the coroutine) and the batching
+QueryEmbedder, reporting questions/second, mean batch size and the p99
+lag of a 10 ms timer on the same event loop (what unrelated endpoints
+wait on).
+
+The second table repeats the batched run while ingestion keeps embedding
+64-chunk batches: once as before (ingestion in its own thread, competing
+for the model) and once through the priority scheduler.
+
+`--synthetic MS_PER_CALL MS_PER_TEXT` replaces the model with a sleep of
+that cost, for machines without the model files. Calls are serialized,
+as they would be with the cores saturated.
+"""
+import argparse
+import asyncio
+import os
+import threading
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///./bench.db")
+os.environ.setdefault("QDRANT_URL", "http://localhost:6333")
+
+from app.core.config import settings  # noqa: E402
+from app.services import query_embedder as query_embedder_module  # noqa: E402
+from app.services.embedding_cache import QueryEmbeddingCache  # noqa: E402
+from app.services.embedding_scheduler import EmbeddingScheduler  # noqa: E402
+from app.services.embeddings import embedding_service  # noqa: E402
+from app.services.query_embedder import QueryEmbedder  # noqa: E402
+
+QUESTIONS = [
+    "summarize this", "what are the key points", "who are the parties to the contract",
+    "when is the payment due", "list the termination clauses", "what does the policy say about remote work",
+]
+
+
+def synthetic_model(ms_per_call: float, ms_per_text: float):
+    cores = threading.Lock()
+
+    def embed_texts(texts):
+        with cores:
+            time.sleep((ms_per_call + ms_per_text * len(texts)) / 1000)
+        return [[0.0] * settings.EMBEDDING_DIMENSION for _ in texts]
+    return embed_texts
+
+
+async def _lag_probe(lags: list, stop: asyncio.Event):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.01)
+        lags.append(time.perf_counter() - started - 0.01)
+
+
+async def run(mode: str, users: int, queries: int) -> dict:
+    # Every question is new: measure the model path, not the query cache
+    embedder = QueryEmbedder(cache=QueryEmbeddingCache(max_entries=0, max_bytes=0))
+
+    async def embed(question: str):
+        if mode == "inline":
+            return embedding_service.embed_text(question)
+        return await embedder.embed(question)
+
+    async def user(index: int):
+        for query in range(queries):
+            await embed(f"{QUESTIONS[(index + query) % len(QUESTIONS)]} ({index}/{query})")
+
+    lags, stop = [], asyncio.Event()
+    probe = asyncio.create_task(_lag_probe(lags, stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(user(index) for index in range(users)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe
+
+    lags.sort()
+    return {
+        "qps": users * queries / elapsed,
+        "mean_batch": embedder.stats()["mean_batch"] if mode == "batched" else 1.0,
+        "lag_p99_ms": lags[min(len(lags) - 1, int(0.99 * len(lags)))] * 1000 if lags else 0.0,
+    }
+
+
+async def run_under_ingestion(mode: str, users: int, queries: int) -> dict:
+    """Batched queries while ingestion embeds continuously; mode is idle, unscheduled or scheduled"""
+    scheduler = EmbeddingScheduler()
+    query_embedder_module.embedding_scheduler = scheduler
+    # Every question is new: measure the model path, not the query cache
+    embedder = QueryEmbedder(cache=QueryEmbeddingCache(max_entries=0, max_bytes=0))
+    stop = asyncio.Event()
+    chunks = [f"chunk text {i} " * 40 for i in range(64)]
+
+    async def ingest():
+        while not stop.is_set():
+            if mode == "scheduled":
+                await scheduler.embed_bulk(chunks)
+            else:
+                await asyncio.to_thread(embedding_service.embed_batch, chunks)
+
+    async def user(index: int):
+        for query in range(queries):
+            started = time.perf_counter()
+            await embedder.embed(f"{QUESTIONS[(index + query) % len(QUESTIONS)]} ({index}/{query})")
+            latencies.append(time.perf_counter() - started)
+
+    latencies = []
+    ingestion = [asyncio.create_task(ingest()) for _ in range(2 if mode != "idle" else 0)]
+    await asyncio.gather(*(user(index) for index in range(users)))
+    stop.set()
+    await asyncio.gather(*ingestion)
+
+    latencies.sort()
+    return {
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=10)
+    parser.add_argument("--synthetic", type=float, nargs=2, metavar=("MS_PER_CALL", "MS_PER_TEXT"))
+    args = parser.parse_args()
+
+    if args.synthetic:
+        embedding_service.embed_texts = synthetic_model(*args.synthetic)
+        embedding_service.embed_batch = embedding_service.embed_texts
+    else:
+        # Load the model outside the measurement
+        embedding_service.embed_text("warm up")
+
+    print(f"{args.users} users x {args.queries} questions")
+    print(f"{'mode':>8} {'q/s':>9} {'batch':>7} {'loop lag p99 ms':>16}")
+    for mode in ("inline", "batched"):
+        result = asyncio.run(run(mode, args.users, args.queries))
+        print(f"{mode:>8} {result['qps']:>9.1f} {result['mean_batch']:>7.1f} {result['lag_p99_ms']:>16.1f}")
+
+    print("\nbatched query latency while ingestion embeds")
+    print(f"{'ingestion':>11} {'p50 ms':>8} {'p99 ms':>8}")
+    for mode in ("idle", "unscheduled", "scheduled"):
+        result = asyncio.run(run_under_ingestion(mode, args.users, args.queries))
+        print(f"{mode:>11} {result['p50_ms']:>8.1f} {result['p99_ms']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+from app.services.artifact_store import ArtifactStore
+from app.services.document_processor import DocumentProcessor
+
+
+def test_artifact_store_round_trips_and_deduplicates(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    pages = {2: "Second page.", 1: "First page with ünicode."}
+
+    key = store.put_pages(pages)
+
+    assert store.put_pages(dict(pages)) == key
+    assert store.get_pages(key) == pages
+    assert len(list(tmp_path.rglob("*.json.gz"))) == 1
+
+    store.delete(key)
+    assert not store.exists(key)
+
+
+def test_streamed_artifact_matches_put_pages_and_leaves_no_temp_files(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    pages = {1: "First page with ünicode.", 2: "Second page."}
+
+    writer = store.open_pages()
+    for page, text in pages.items():
+        writer[page] = text
+    assert len(writer) == 2
+    key = writer.commit()
+
+    assert key == store.put_pages(pages)
+    assert store.get_pages(key) == pages
+    assert store.get_pages(store.open_pages().commit()) == {}
+
+    unfinished = store.open_pages()
+    unfinished[1] = "Never stored."
+    unfinished.discard()
+    assert list(tmp_path.rglob("*.tmp")) == []
+
+
+def test_page_chunks_match_chunks_from_the_original_file(tmp_path):
+    file_path = tmp_path / "notes.txt"
+    file_path.write_text("A sentence about artifacts. " * 120, encoding="utf-8")
+    pages = {}
+
+    original = list(DocumentProcessor.iter_document_chunks(
+        str(file_path), "doc-1", "notes.txt", {}, {"user_id": "u"}, pages=pages
+    ))
+    rechunked = list(DocumentProcessor.iter_page_chunks(pages, "doc-1", "notes.txt", extra_metadata={"user_id": "u"}))
+
+    assert [(c.text, c.metadata) for c in rechunked] == [(c.text, c.metadata) for c in original]
@@ -0,0 +1,129 @@
+import asyncio
+import io
+import uuid
+import zipfile
+
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from app.main import app
+from app.core.auth import current_active_user
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, Base, engine
+from app.models.document import Document
+from app.models.job import IngestionJob
+from app.models.user import User
+from app.services.vector_store import vector_store
+
+
+async def _reset_db():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+
+async def _stored():
+    async with AsyncSessionLocal() as db:
+        documents = (await db.execute(select(Document).order_by(Document.filename))).scalars().all()
+        jobs = (await db.execute(select(IngestionJob))).scalars().all()
+    return documents, jobs
+
+
+def _client(monkeypatch, tmp_path) -> TestClient:
+    asyncio.run(_reset_db())
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    # A new user per test keeps the bulk rate limit out of the way
+    user = User(
+        id=uuid.uuid4(), email="bulk@example.com", hashed_password="",
+        is_active=True, is_superuser=False, is_verified=True
+    )
+    app.dependency_overrides[current_active_user] = lambda: user
+    # Without the lifespan, so no worker picks up the queued jobs
+    return TestClient(app)
+
+
+def _zip(members: dict) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in members.items():
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+def test_bulk_upload_queues_files_and_archive_members_as_one_batch(monkeypatch, tmp_path):
+    client = _client(monkeypatch, tmp_path)
+    try:
+        response = client.post("/api/v1/documents/bulk", files=[
+            ("files", ("a.txt", b"first document")),
+            ("files", ("docs.zip", _zip({"b.md": b"# second", "nested/c.txt": b"third", "tool.exe": b"MZ"}))),
+        ])
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    data = response.json()
+    assert [document["filename"] for document in data["documents"]] == ["a.txt", "b.md", "c.txt"]
+    assert all(document["status"] == "pending" for document in data["documents"])
+    assert data["skipped"] == ["tool.exe"]
+
+    documents, jobs = asyncio.run(_stored())
+    assert [document.file_size for document in documents] == [14, 8, 5]
+    assert {job.batch_id for job in jobs} == {uuid.UUID(data["batch_id"])}
+    assert all(job.status == "queued" for job in jobs)
+    # The archive is gone once unpacked, the documents wait for the workers
+    assert sorted(path.suffix for path in tmp_path.iterdir()) == [".md", ".txt", ".txt"]
+    assert {job.file_path for job in jobs} == {str(path) for path in tmp_path.iterdir()}
+
+
+def test_bulk_upload_rejects_requests_over_the_total_size_budget(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "BULK_MAX_TOTAL_SIZE", 1000)
+    client = _client(monkeypatch, tmp_path)
+    try:
+        # The archive is small, what it unpacks to is not
+        archive = _zip({f"{i}.txt": b"x" * 300 for i in range(3)})
+        assert len(archive) < 1000
+        response = client.post("/api/v1/documents/bulk", files=[
+            ("files", ("a.txt", b"y" * 100)),
+            ("files", ("docs.zip", archive)),
+        ])
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 413
+    documents, jobs = asyncio.run(_stored())
+    assert documents == [] and jobs == []
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_bulk_upload_without_supported_documents_is_rejected(monkeypatch, tmp_path):
+    client = _client(monkeypatch, tmp_path)
+    try:
+        response = client.post("/api/v1/documents/bulk", files=[
+            ("files", ("docs.zip", _zip({"tool.exe": b"MZ"}))),
+        ])
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 400
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_deleting_a_queued_document_drops_its_job_and_upload(monkeypatch, tmp_path):
+    monkeypatch.setattr(vector_store, "delete_by_document", lambda document_id: None)
+    client = _client(monkeypatch, tmp_path)
+    try:
+        data = client.post("/api/v1/documents/bulk", files=[
+            ("files", ("a.txt", b"first document")),
+            ("files", ("b.txt", b"second document")),
+        ]).json()
+        deleted, kept = (document["id"] for document in data["documents"])
+        response = client.delete(f"/api/v1/documents/{deleted}")
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    documents, jobs = asyncio.run(_stored())
+    assert [str(document.id) for document in documents] == [kept]
+    assert [str(job.document_id) for job in jobs] == [kept]
+    # Only the remaining document's upload waits for a worker
+    assert [str(path) for path in tmp_path.iterdir()] == [jobs[0].file_path]
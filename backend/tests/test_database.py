@@ -0,0 +1,74 @@
+import asyncio
+import json
+import uuid
+
+from fastapi.testclient import TestClient
+from sqlalchemy import inspect, select, text
+from sqlalchemy.orm import undefer
+
+from app.main import app
+from app.core.database import AsyncSessionLocal, Base, add_missing_columns, engine
+from app.models.document import Document
+from app.services.artifact_store import artifact_store
+
+# documents as created by the first release, before content_hash and artifact_key
+BASELINE_DOCUMENTS = """
+CREATE TABLE documents (
+    id CHAR(32) NOT NULL PRIMARY KEY,
+    user_id CHAR(32) NOT NULL,
+    filename VARCHAR(255) NOT NULL,
+    original_filename VARCHAR(255) NOT NULL,
+    file_size INTEGER NOT NULL,
+    file_type VARCHAR(50) NOT NULL,
+    upload_date DATETIME,
+    total_pages INTEGER,
+    chunk_count INTEGER,
+    processing_status VARCHAR(50),
+    qdrant_collection_id VARCHAR(255),
+    metadata JSON
+)
+"""
+
+
+def test_startup_upgrades_a_baseline_documents_table():
+    document_id = uuid.uuid4()
+
+    async def create_baseline():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.execute(text(BASELINE_DOCUMENTS))
+            await conn.execute(
+                text(
+                    "INSERT INTO documents (id, user_id, filename, original_filename, file_size, file_type, "
+                    "chunk_count, processing_status, metadata) "
+                    "VALUES (:id, :user_id, 'old.pdf', 'old.pdf', 10, '.pdf', 1, 'completed', :metadata)"
+                ),
+                {
+                    "id": document_id.hex,
+                    "user_id": uuid.uuid4().hex,
+                    "metadata": json.dumps({"page_texts": {"1": "legacy page"}})
+                }
+            )
+
+    async def check_upgraded():
+        async with engine.begin() as conn:
+            # A second run finds nothing to do
+            assert await conn.run_sync(add_missing_columns) == []
+            indexes = await conn.run_sync(lambda sync: inspect(sync).get_indexes("documents"))
+        assert {"ix_documents_content_hash", "ix_documents_artifact_key"} <= {index["name"] for index in indexes}
+
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(Document).options(undefer(Document.metadata_)))
+            doc = result.scalar_one()
+        return doc
+
+    asyncio.run(create_baseline())
+    # Startup adds the columns before the legacy page text migration reads them
+    with TestClient(app) as client:
+        assert client.get("/api/v1/health").status_code == 200
+    doc = asyncio.run(check_upgraded())
+
+    assert doc.id == document_id
+    assert doc.content_hash is None
+    assert "page_texts" not in doc.metadata_
+    assert artifact_store.get_pages(doc.artifact_key) == {1: "legacy page"}
@@ -0,0 +1,84 @@
+import asyncio
+import uuid
+
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from sqlalchemy.orm import undefer
+
+from app.main import app
+from app.core.auth import current_active_user
+from app.core.database import AsyncSessionLocal, Base, engine
+from app.models.document import Document
+from app.models.user import User
+from app.services.ingestion import migrate_legacy_page_texts
+
+
+OWNER_ID = uuid.uuid4()
+LEGACY_PAGES = {"1": "First page of the old release.", "2": "Second page, with ünicode."}
+
+
+async def _seed():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    legacy, plain, foreign = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    async with AsyncSessionLocal() as db:
+        for document_id, user_id, metadata in (
+            (legacy, OWNER_ID, {"page_texts": LEGACY_PAGES, "author": "kept"}),
+            (plain, OWNER_ID, {"author": "untouched"}),
+            (foreign, uuid.uuid4(), {"page_texts": {"1": "Someone else's page."}}),
+        ):
+            db.add(Document(
+                id=document_id, user_id=user_id, filename="a.pdf", original_filename="a.pdf",
+                file_size=100, file_type=".pdf", processing_status="completed", metadata_=metadata
+            ))
+        await db.commit()
+    return legacy, plain, foreign
+
+
+async def _load(document_id):
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Document).options(undefer(Document.metadata_)).filter(Document.id == document_id)
+        )
+        return result.scalar_one()
+
+
+def _override_owner():
+    return User(
+        id=OWNER_ID, email="owner@example.com", hashed_password="",
+        is_active=True, is_superuser=False, is_verified=True
+    )
+
+
+def test_migrated_page_texts_are_served_from_the_artifact():
+    legacy, plain, foreign = asyncio.run(_seed())
+
+    assert asyncio.run(migrate_legacy_page_texts(batch_size=1)) == 2
+    migrated = asyncio.run(_load(legacy))
+    assert migrated.artifact_key
+    assert migrated.metadata_ == {"author": "kept"}
+    assert asyncio.run(_load(plain)).artifact_key is None
+    # A second run finds nothing left to move
+    assert asyncio.run(migrate_legacy_page_texts()) == 0
+    assert asyncio.run(_load(legacy)).artifact_key == migrated.artifact_key
+
+    app.dependency_overrides[current_active_user] = _override_owner
+    try:
+        client = TestClient(app)
+        pages = client.get(f"/api/v1/documents/{legacy}/pages")
+        second = client.get(f"/api/v1/documents/{legacy}/pages", params={"page": 2})
+        missing_page = client.get(f"/api/v1/documents/{legacy}/pages", params={"page": 3})
+        without_artifact = client.get(f"/api/v1/documents/{plain}/pages")
+        not_owned = client.get(f"/api/v1/documents/{foreign}/pages")
+    finally:
+        app.dependency_overrides.clear()
+
+    assert pages.status_code == 200
+    assert pages.json()["pages"] == [
+        {"page": int(page), "text": text} for page, text in sorted(LEGACY_PAGES.items())
+    ]
+    assert second.json()["pages"] == [{"page": 2, "text": LEGACY_PAGES["2"]}]
+    assert missing_page.status_code == 404
+    assert without_artifact.status_code == 404
+    assert not_owned.status_code == 404
@@ -1,4 +1,12 @@
-from app.services.document_processor import DocumentProcessor
+import os
+import time
+
+import pytest
+from pydantic import ValidationError
+
+from app.core.config import Settings
+from app.services import document_processor as processor_module
+from app.services.document_processor import DocumentProcessor, _chunk_spans, _fast_text_ok, _token_chunk_spans, _join_page_texts, _page_ranges, strip_boilerplate
 
 def test_smart_chunk_text():
     document_id = "test-doc-id"
@@ -23,3 +31,266 @@ def test_smart_chunk_text():
     # Check if metadata is preserved
     assert chunks[0].metadata["document_id"] == document_id
     assert chunks[0].metadata["filename"] == filename
+
+
+def test_page_ranges_cover_all_pages_in_order():
+    ranges = _page_ranges(total_pages=45, pages_per_task=20)
+
+    assert ranges == [(0, 20), (20, 40), (40, 45)]
+    assert _page_ranges(total_pages=0, pages_per_task=20) == []
+
+
+def test_join_page_texts_matches_page_markers():
+    text = _join_page_texts(["first", "", "third"])
+
+    assert text == "--- Page 1 ---\n\nfirst\n\n--- Page 2 ---\n\n\n\n--- Page 3 ---\n\nthird"
+
+
+def test_chunk_spans_are_bounded_and_overlap_on_word_boundaries():
+    text = " ".join(f"Sentence number {i} talks about topic {i % 7}." for i in range(200))
+
+    spans = list(_chunk_spans(text, 300, 60))
+
+    assert spans[0][0] == 0 and spans[-1][1] == len(text)
+    for (start, end), (next_start, _) in zip(spans, spans[1:]):
+        assert end - start <= 300
+        assert start < next_start < end
+        assert text[next_start - 1] == " "
+
+
+def test_chunk_metadata_offsets_match_text():
+    text = "First sentence here. " * 120
+    chunks = DocumentProcessor._chunk_text(text, {"page": 1})
+
+    for chunk in chunks:
+        assert text[chunk.metadata["start"]:chunk.metadata["end"]] == chunk.text
+        assert chunk.metadata["chunk_length"] == len(chunk.text)
+
+
+def test_chunks_share_the_page_text_instead_of_copying_it():
+    text = "First sentence here. " * 120
+    chunks = DocumentProcessor._chunk_text(text, {"page": 1})
+
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert chunk.page_text is text
+        assert not hasattr(chunk, "__dict__")
+
+
+def test_token_chunk_spans_respect_token_budget():
+    text = " ".join(f"Sentence {i} has exactly five." for i in range(40)) + " " + "word " * 30
+    count_tokens = lambda texts: [len(t.split()) for t in texts]
+
+    spans = list(_token_chunk_spans(text, 20, 5, count_tokens))
+
+    assert all(len(text[start:end].split()) <= 20 for start, end in spans)
+    assert spans[-1][1] == len(text.rstrip())
+    # Overlap carries whole trailing sentences into the next chunk
+    assert text[spans[1][0]:].startswith("Sentence 3 ")
+
+
+def test_fast_text_quality_check():
+    good = "The quarterly report covers revenue, costs and the outlook for next year. " * 3
+    assert _fast_text_ok(good)
+    assert not _fast_text_ok("Page 3")
+    assert not _fast_text_ok("Thequarterlyreportcoversrevenuecostsandtheoutlookfornextyear " * 3)
+    assert not _fast_text_ok(" ".join("The quarterly report covers revenue"))
+    assert not _fast_text_ok("(cid:12)(cid:7)(cid:9) " * 10)
+
+
+def test_fast_text_check_rejects_blank_pages_without_a_minimum(monkeypatch):
+    monkeypatch.setattr(processor_module.settings, "PDF_FAST_MIN_CHARS", 0)
+    assert not _fast_text_ok("")
+    assert not _fast_text_ok(" \n\t ")
+
+    with pytest.raises(ValidationError):
+        Settings(DATABASE_URL="sqlite://", QDRANT_URL="http://localhost:6333", PDF_FAST_MIN_CHARS=0)
+
+
+def test_tiered_extraction_escalates_only_failing_pages(monkeypatch):
+    good = "Born-digital text with normal word spacing on every line of the page. " * 3
+    fast_pages = [good, "", "Wordswithoutanyspacesbetweenthematallbecauseofthetextstream " * 3]
+    layout_opened = []
+
+    class FakePage:
+        def __init__(self, text):
+            self.text = text
+
+        def extract_text(self):
+            return self.text
+
+        def close(self):
+            pass
+
+    class FakeReader:
+        def __init__(self, file):
+            self.pages = [FakePage(text) for text in fast_pages]
+
+    class FakePlumber:
+        pages = [FakePage(f"layout text of page {num} with proper spacing") for num in (1, 2, 3)]
+
+        def close(self):
+            pass
+
+    def open_layout(path):
+        layout_opened.append(path)
+        return FakePlumber()
+
+    monkeypatch.setattr(processor_module.PyPDF2, "PdfReader", FakeReader)
+    monkeypatch.setattr(processor_module.pdfplumber, "open", open_layout)
+    monkeypatch.setattr(processor_module.settings, "PDF_EXTRACTION_ISOLATION", False)
+
+    stats = []
+    pages = list(DocumentProcessor.iter_pdf_pages(__file__, page_stats=stats))
+
+    assert pages[0] == (1, good)
+    assert pages[1] == (2, "layout text of page 2 with proper spacing")
+    assert pages[2] == (3, "layout text of page 3 with proper spacing")
+    assert [stat["extractor"] for stat in stats] == ["pypdf2", "pdfplumber", "pdfplumber"]
+    assert all(stat["ms"] >= 0 for stat in stats)
+    # The layout parser is opened once, and only because a page needed it
+    assert len(layout_opened) == 1
+
+
+def _write_pdf(path, page_texts):
+    """A minimal PDF with one line of Helvetica text per page"""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in page_texts:
+        stream = f"BT /F1 10 Tf 40 760 Td ({text}) Tj ET".encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects)
+        )
+        kids.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), len(kids))
+
+    body, offsets = b"%PDF-1.4\n", []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(body))
+        body += b"%d 0 obj\n%s\nendobj\n" % (number, obj)
+    xref = b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    xref += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    trailer = b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, len(body))
+    path.write_bytes(body + xref + trailer)
+
+
+def test_serial_isolated_and_parallel_extraction_agree(monkeypatch, tmp_path):
+    file_path = tmp_path / "report.pdf"
+    _write_pdf(file_path, [
+        f"Page {num} of the quarterly report lists revenue, costs and staff numbers." for num in range(1, 13)
+    ])
+    # Small enough thresholds that 12 pages are split over several workers
+    monkeypatch.setattr(processor_module.settings, "PDF_PARALLEL_MIN_PAGES", 6)
+    monkeypatch.setattr(processor_module.settings, "PDF_PAGES_PER_TASK", 4)
+    monkeypatch.setattr(processor_module.settings, "PDF_EXTRACTION_WORKERS", 3)
+    monkeypatch.setattr(processor_module.os, "cpu_count", lambda: 3)
+
+    monkeypatch.setattr(processor_module.settings, "PDF_EXTRACTION_ISOLATION", False)
+    serial_text, serial = DocumentProcessor.extract_text_from_pdf(str(file_path), parallel=False)
+    monkeypatch.setattr(processor_module.settings, "PDF_EXTRACTION_ISOLATION", True)
+    isolated_text, isolated = DocumentProcessor.extract_text_from_pdf(str(file_path), parallel=False)
+    ranges = []
+
+    class RecordingWorker(processor_module._PageRangeWorker):
+        def __init__(self, file_path, start, end, target):
+            ranges.append((start, end))
+            super().__init__(file_path, start, end, target)
+
+    monkeypatch.setattr(processor_module, "_PageRangeWorker", RecordingWorker)
+    parallel_text, parallel = DocumentProcessor.extract_text_from_pdf(str(file_path), parallel=True)
+
+    assert serial["total_pages"] == 12 and "Page 12 of the quarterly report" in serial["page_texts"][12]
+    assert isolated_text == parallel_text == serial_text
+    assert isolated["page_texts"] == parallel["page_texts"] == serial["page_texts"]
+    assert isolated["skipped_pages"] == parallel["skipped_pages"] == []
+    assert ranges == [(0, 4), (4, 8), (8, 12)]
+
+
+def _stuck_and_crashing_worker(file_path, start, end, conn):
+    # Stands in for _extract_pages_worker on a 5 page file: page 2 hangs, page 3 kills the process
+    conn.send(("ready", 5))
+    for idx in range(start, 5 if end is None else min(end, 5)):
+        if idx == 1:
+            time.sleep(60)
+        if idx == 2:
+            os._exit(1)
+        conn.send(("page", idx, f"text of page {idx + 1}", "pypdf2", 1.0))
+
+
+def test_isolated_extraction_skips_hung_and_crashed_pages(monkeypatch):
+    monkeypatch.setattr(processor_module.settings, "PDF_PAGE_TIMEOUT_SECONDS", 3.0)
+    skipped, totals = [], []
+    pages = list(DocumentProcessor._iter_pdf_isolated(
+        "unused.pdf", parallel=False, skipped_pages=skipped, target=_stuck_and_crashing_worker,
+        on_total_pages=totals.append
+    ))
+
+    assert totals == [5]
+    assert [page[0] for page in pages] == [1, 4, 5]
+    assert pages[1][1] == "text of page 4"
+    assert skipped == [{"page": 2, "reason": "timeout"}, {"page": 3, "reason": "crashed"}]
+
+
+def _hanging_open_worker(file_path, start, end, conn):
+    # A malformed xref that never finishes parsing
+    time.sleep(60)
+
+
+def test_isolated_extraction_counts_pages_in_the_worker_under_the_budget(monkeypatch, tmp_path):
+    monkeypatch.setattr(processor_module.settings, "PDF_PAGE_TIMEOUT_SECONDS", 30.0)
+    monkeypatch.setattr(processor_module.settings, "PDF_DOCUMENT_TIMEOUT_SECONDS", 2.0)
+
+    started = time.monotonic()
+    with pytest.raises(ValueError, match="document_timeout"):
+        list(DocumentProcessor._iter_pdf_isolated(
+            "unused.pdf", parallel=False, skipped_pages=[], target=_hanging_open_worker
+        ))
+    assert time.monotonic() - started < 10
+
+    broken = tmp_path / "broken.pdf"
+    broken.write_bytes(b"%PDF-1.4 not really")
+    with pytest.raises(ValueError, match="Could not read the page count"):
+        list(DocumentProcessor.iter_pdf_pages(str(broken)))
+
+
+def _corporate_pages(count):
+    return {
+        page: (
+            "ACME Corp - Confidential\n"
+            f"Section {page}: quarterly figures\n"
+            f"Revenue grew by {page} percent in region {page}.\n"
+            "1,250\n"
+            "© 2024 ACME Corp. All rights reserved.\n"
+            f"Page {page} of {count}"
+        )
+        for page in range(1, count + 1)
+    }
+
+
+def test_strip_boilerplate_removes_repeated_lines_and_reports_them():
+    pages, removed = strip_boilerplate(_corporate_pages(6))
+
+    assert pages[2] == "Section 2: quarterly figures\nRevenue grew by 2 percent in region 2.\n1,250"
+    assert removed["removed_lines"] == 18
+    assert {line["text"] for line in removed["lines"]} == {
+        "ACME Corp - Confidential", "© 2024 ACME Corp. All rights reserved.", "Page 1 of 6"
+    }
+
+
+def test_boilerplate_is_stripped_while_pages_stream(monkeypatch):
+    source = _corporate_pages(12)
+    def fake_pages(path, on_total_pages=None, **kwargs):
+        on_total_pages(12)
+        yield from sorted(source.items())
+
+    monkeypatch.setattr(DocumentProcessor, "iter_pdf_pages", staticmethod(fake_pages))
+    monkeypatch.setattr(processor_module.settings, "BOILERPLATE_SAMPLE_PAGES", 4)
+
+    metadata, pages = {}, {}
+    chunks = list(DocumentProcessor.iter_document_chunks("report.pdf", "doc-1", "report.pdf", metadata, pages=pages))
+
+    assert sorted(pages) == list(range(1, 13))
+    assert all("Confidential" not in chunk.text and "Page " not in chunk.text for chunk in chunks)
+    assert metadata["boilerplate"]["removed_lines"] == 36
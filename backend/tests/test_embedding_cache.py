@@ -0,0 +1,63 @@
+import numpy as np
+
+from app.services.embedding_cache import EmbeddingCache
+
+
+def test_cache_roundtrip_and_counters(tmp_path):
+    cache = EmbeddingCache(path=str(tmp_path / "cache.sqlite3"), max_bytes=1024 * 1024)
+    vector = np.arange(4, dtype=np.float32)
+
+    assert cache.get_many("model-a", ["hello"]) == [None]
+    cache.put_many("model-a", ["hello"], [vector])
+
+    hit, other_model = cache.get_many("model-a", ["hello"]) + cache.get_many("model-b", ["hello"])
+    assert np.array_equal(hit, vector)
+    assert other_model is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+    assert stats["entries"] == 1
+    assert stats["bytes"] == vector.nbytes
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    vector = np.ones(4, dtype=np.float32)
+    cache = EmbeddingCache(path=str(tmp_path / "cache.sqlite3"), max_bytes=vector.nbytes * 2)
+
+    cache.put_many("m", ["first"], [vector])
+    cache.put_many("m", ["second"], [vector])
+    cache.get_many("m", ["first"])  # first is now more recent than second
+    cache.put_many("m", ["third"], [vector])
+
+    first, second, third = cache.get_many("m", ["first", "second", "third"])
+    assert first is not None
+    assert second is None
+    assert third is not None
+    assert cache.stats()["bytes"] == vector.nbytes * 2
+
+
+def test_embed_batch_returns_one_float32_matrix_with_cache_hits(tmp_path, monkeypatch):
+    from app.services import embeddings
+    from app.services.embeddings import EmbeddingService
+
+    class FakeModel:
+        def __init__(self):
+            self.calls = []
+
+        def embed(self, texts):
+            self.calls.append(list(texts))
+            return (np.full(4, len(text), dtype=np.float32) for text in texts)
+
+    cache = EmbeddingCache(path=str(tmp_path / "cache.sqlite3"), max_bytes=1024 * 1024)
+    monkeypatch.setattr(embeddings, "embedding_cache", cache)
+    service = EmbeddingService()
+    service._model = FakeModel()
+
+    service.embed_batch(["ab", "abc"])
+    matrix = service.embed_batch(["abc", "abcd", "abcd", "ab"])
+
+    assert matrix.dtype == np.float32 and matrix.shape == (4, 4)
+    assert matrix.flags["C_CONTIGUOUS"]
+    assert matrix[:, 0].tolist() == [3, 4, 4, 2]
+    assert service._model.calls == [["ab", "abc"], ["abcd"]]
@@ -0,0 +1,31 @@
+import os
+
+import numpy as np
+
+from app.services import embeddings
+from app.services.embeddings import EmbeddingWorkerPool
+
+
+def _fake_shard(texts, threads):
+    # Stands in for _embed_in_worker: row = (text number, worker pid, threads)
+    return np.array([[float(text.split()[-1]), os.getpid(), threads] for text in texts], dtype=np.float32)
+
+
+def test_worker_pool_shards_batches_and_keeps_input_order(monkeypatch):
+    monkeypatch.setattr(embeddings.settings, "EMBEDDING_WORKER_MIN_SHARD", 4)
+    pool = EmbeddingWorkerPool(workers=3, threads=2, target=_fake_shard)
+    try:
+        matrix = pool.embed([f"chunk {i}" for i in range(30)])
+        small = pool.embed([f"chunk {i}" for i in range(5)])
+    finally:
+        pool.shutdown()
+
+    assert matrix.dtype == np.float32 and matrix.shape == (30, 3)
+    assert matrix[:, 0].tolist() == list(range(30))
+    assert set(matrix[:, 2].tolist()) == {2.0}
+    # Three contiguous shards of ten, each embedded in a worker process
+    assert [len(set(matrix[start:start + 10, 1].tolist())) for start in (0, 10, 20)] == [1, 1, 1]
+    assert os.getpid() not in matrix[:, 1].tolist()
+    # Too small to split: one shard
+    assert small[:, 0].tolist() == list(range(5))
+    assert len(set(small[:, 1].tolist())) == 1
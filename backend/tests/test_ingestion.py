@@ -0,0 +1,409 @@
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from sqlalchemy.orm import undefer
+
+from app.core.database import AsyncSessionLocal, Base, engine
+from app.models.document import Document
+from app.models.user import User
+from app.services import ingestion
+from app.services.document_processor import Chunk, DocumentProcessor
+from app.services.embeddings import embedding_service
+from app.services.ingestion import (
+    BulkItem, IngestionPipeline, ingest_document, rechunk_document, record_ingestion_failure
+)
+
+
+TEST_USER_ID = uuid.uuid4()
+
+
+async def _reset_db():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+
+async def _seed_duplicate_uploads(content_hash: str):
+    source_id, duplicate_id = uuid.uuid4(), uuid.uuid4()
+    async with AsyncSessionLocal() as db:
+        db.add(User(id=TEST_USER_ID, email="ingest@example.com", hashed_password=""))
+        db.add(Document(
+            id=source_id,
+            user_id=TEST_USER_ID,
+            filename="handbook.pdf",
+            original_filename="handbook.pdf",
+            file_size=100,
+            file_type=".pdf",
+            content_hash=content_hash,
+            processing_status="completed",
+            chunk_count=3,
+            total_pages=2,
+            metadata_={"total_pages": 2},
+        ))
+        db.add(Document(
+            id=duplicate_id,
+            user_id=TEST_USER_ID,
+            filename="handbook-copy.pdf",
+            original_filename="handbook-copy.pdf",
+            file_size=100,
+            file_type=".pdf",
+            content_hash=content_hash,
+            processing_status="pending",
+        ))
+        await db.commit()
+    return source_id, duplicate_id
+
+
+async def _load_document(document_id):
+    async with AsyncSessionLocal() as db:
+        return await db.get(Document, document_id, options=[undefer(Document.metadata_)])
+
+
+def test_pipeline_streams_chunks_in_bounded_batches(tmp_path, monkeypatch):
+    file_path = tmp_path / "notes.txt"
+    file_path.write_text("This is a sentence about ingestion. " * 400, encoding="utf-8")
+
+    embedded_batches = []
+    upserted = []
+    matrices = []
+
+    def fake_embed_batch(texts):
+        embedded_batches.append(len(texts))
+        return np.zeros((len(texts), 4), dtype=np.float32)
+
+    def fake_upsert_chunks(chunks, embeddings, ids=None):
+        upserted.extend(chunks)
+        matrices.append(embeddings)
+        return len(chunks)
+
+    monkeypatch.setattr(embedding_service, "embed_batch", fake_embed_batch)
+    monkeypatch.setattr(ingestion.vector_store, "upsert_chunks", fake_upsert_chunks)
+
+    pipeline = IngestionPipeline(batch_size=3, queue_size=1)
+    result = asyncio.run(pipeline.run(str(file_path), "doc-1", "notes.txt", "user-1"))
+
+    assert result.chunk_count == len(upserted) > 3
+    assert max(embedded_batches) <= 3
+    assert result.metadata["total_pages"] == 1
+    assert "page_texts" not in result.metadata
+    # Pages were streamed into the artifact, which is only stored on completion
+    assert len(result.pages) == 1
+    assert list(ingestion.artifact_store.get_pages(result.pages.commit())) == [1]
+    stats = result.progress.summary()
+    assert stats["chunks_created"] == stats["chunks_embedded"] == stats["points_upserted"] == len(upserted)
+    assert stats["pages_extracted"] == 1
+    assert all(chunk.metadata["user_id"] == "user-1" for chunk in upserted)
+    assert [chunk.metadata["chunk_index"] for chunk in upserted] == list(range(len(upserted)))
+    # Embeddings travel as one float32 matrix per batch, never as lists of floats
+    assert all(isinstance(m, np.ndarray) and m.dtype == np.float32 and m.shape[1] == 4 for m in matrices)
+
+
+def test_upsert_sends_one_columnar_batch(monkeypatch):
+    sent = []
+    store = ingestion.vector_store
+    monkeypatch.setattr(store, "_collection_ensured", True)
+    monkeypatch.setattr(store, "client", SimpleNamespace(upsert=lambda collection_name, points: sent.append(points)))
+    chunks = [Chunk(f"chunk {i}", {"document_id": "doc-1", "page": 1}) for i in range(3)]
+
+    assert store.upsert_chunks(chunks, np.eye(3, 4, dtype=np.float32), ids=["a", "b", "c"]) == 3
+
+    batch, = sent
+    assert batch.ids == ["a", "b", "c"]
+    assert batch.vectors[1] == [0.0, 1.0, 0.0, 0.0]
+    assert batch.payloads[2] == {"text": "chunk 2", "metadata": {"document_id": "doc-1", "page": 1}}
+
+
+def test_long_document_becomes_available_after_first_chunks(monkeypatch):
+    def fake_document_chunks(file_path, document_id, filename, metadata, extra_metadata=None, pages=None):
+        metadata["total_pages"] = 40
+        for page in range(1, 41):
+            pages[page] = f"page {page}"
+            for idx in range(4):
+                yield Chunk(f"page {page} chunk {idx}", {"document_id": document_id, "page": page, **extra_metadata})
+
+    embedded_batches = []
+    available = []
+
+    def fake_embed_batch(texts):
+        embedded_batches.append(len(texts))
+        return [[0.0] * 4 for _ in texts]
+
+    async def on_available(document_id, result):
+        available.append((document_id, result.embedded_chunks, len(result.pages)))
+
+    monkeypatch.setattr(ingestion.document_processor, "iter_document_chunks", fake_document_chunks)
+    monkeypatch.setattr(embedding_service, "embed_batch", fake_embed_batch)
+    monkeypatch.setattr(ingestion.vector_store, "upsert_chunks", lambda chunks, embeddings, ids=None: len(chunks))
+    monkeypatch.setattr(ingestion.settings, "INGEST_PARTIAL_MIN_CHUNKS", 4)
+
+    pipeline = IngestionPipeline(batch_size=8, queue_size=1)
+    result = asyncio.run(pipeline.run("long.pdf", "doc-1", "long.pdf", "user-1", on_available=on_available))
+
+    # A short first batch, announced once while later pages were still pending
+    assert embedded_batches[0] == 4 and max(embedded_batches) == 8
+    assert len(available) == 1
+    document_id, chunks_available, pages_seen = available[0]
+    assert document_id == "doc-1" and chunks_available == 4 and pages_seen < 40
+    assert result.available and result.chunk_count == 160
+    assert result.progress.status == "processing"  # the callback decides what to persist
+
+def test_bulk_run_shares_batches_and_isolates_failures(tmp_path, monkeypatch):
+    embedded_batches = []
+    upserted = []
+
+    def fake_embed_batch(texts):
+        embedded_batches.append(len(texts))
+        return [[0.0] * 4 for _ in texts]
+
+    def fake_upsert_chunks(chunks, embeddings, ids=None):
+        upserted.extend(chunk.metadata["document_id"] for chunk in chunks)
+        return len(chunks)
+
+    monkeypatch.setattr(embedding_service, "embed_batch", fake_embed_batch)
+    monkeypatch.setattr(ingestion.vector_store, "upsert_chunks", fake_upsert_chunks)
+
+    items = []
+    for i in range(5):
+        file_path = tmp_path / f"note-{i}.txt"
+        file_path.write_text(f"Short note number {i}.", encoding="utf-8")
+        items.append(BulkItem(f"doc-{i}", str(file_path), file_path.name, "user-1"))
+    items[2].file_path = str(tmp_path / "missing.pdf")
+
+    done = []
+
+    async def on_done(item):
+        # Every chunk of a document is upserted before it is reported done
+        assert upserted.count(item.document_id) == item.result.embedded_chunks
+        done.append(item)
+
+    pipeline = IngestionPipeline(batch_size=3, queue_size=1)
+    asyncio.run(pipeline.run_many(items, on_done))
+
+    assert [item.document_id for item in done] == [item.document_id for item in items]
+    assert embedded_batches == [3, 1]
+    assert items[2].error is not None and items[2].result.embedded_chunks == 0
+    assert all(item.result.embedded_chunks == 1 for item in items if item.error is None)
+
+
+def test_bulk_run_drops_a_cancelled_document_and_finishes_the_rest(tmp_path, monkeypatch):
+    embedded = []
+    upserted = []
+
+    def fake_embed_batch(texts):
+        embedded.extend(texts)
+        # The first document is deleted while its first batch is being embedded
+        assert ingestion.cancel_ingestion("doc-0")
+        return [[0.0] * 4 for _ in texts]
+
+    def fake_upsert_chunks(chunks, embeddings, ids=None):
+        assert len(embeddings) == len(chunks)
+        upserted.extend(chunk.metadata["document_id"] for chunk in chunks)
+        return len(chunks)
+
+    monkeypatch.setattr(embedding_service, "embed_batch", fake_embed_batch)
+    monkeypatch.setattr(ingestion.vector_store, "upsert_chunks", fake_upsert_chunks)
+
+    long_file, short_file = tmp_path / "long.txt", tmp_path / "short.txt"
+    long_file.write_text("A sentence of a long document. " * 2000, encoding="utf-8")
+    short_file.write_text("A short note.", encoding="utf-8")
+    items = [
+        BulkItem("doc-0", str(long_file), long_file.name, "user-1"),
+        BulkItem("doc-1", str(short_file), short_file.name, "user-1"),
+    ]
+    monkeypatch.setitem(ingestion._bulk_results, "doc-0", items[0].result)
+
+    done = []
+
+    async def on_done(item):
+        done.append(item.document_id)
+
+    pipeline = IngestionPipeline(batch_size=3, queue_size=1)
+    asyncio.run(pipeline.run_many(items, on_done))
+
+    assert done == ["doc-0", "doc-1"]
+    assert items[0].result.cancelled and items[0].result.embedded_chunks == 0
+    # Extraction stopped early, and nothing of the deleted document was upserted
+    assert len(embedded) < 20
+    assert upserted == ["doc-1"]
+
+
+def test_duplicate_upload_reuses_existing_vectors(tmp_path, monkeypatch):
+    asyncio.run(_reset_db())
+    source_id, duplicate_id = asyncio.run(_seed_duplicate_uploads("ab" * 32))
+    cloned = []
+
+    def fake_clone(source_document_id, document_id, user_id, filename):
+        cloned.append((source_document_id, document_id, user_id, filename))
+        return 3
+
+    async def unexpected_run(*args, **kwargs):
+        raise AssertionError("duplicate upload must not be re-ingested")
+
+    monkeypatch.setattr(ingestion.vector_store, "clone_document_vectors", fake_clone)
+    monkeypatch.setattr(ingestion.ingestion_pipeline, "run", unexpected_run)
+
+    upload = tmp_path / "dup.pdf"
+    upload.write_bytes(b"%PDF-1.4")
+    assert asyncio.run(ingest_document(str(duplicate_id), str(upload)))
+
+    doc = asyncio.run(_load_document(duplicate_id))
+    assert cloned == [(str(source_id), str(duplicate_id), str(TEST_USER_ID), "handbook-copy.pdf")]
+    assert doc.processing_status == "completed"
+    assert doc.chunk_count == 3
+    assert doc.metadata_["deduplicated_from"] == str(source_id)
+    assert not upload.exists()
+
+
+def test_incremental_run_embeds_only_changed_chunks(tmp_path, monkeypatch):
+    stored = {}
+    embedded = []
+    deleted = []
+    metadata_updates = []
+
+    def fake_embed_batch(texts):
+        embedded.extend(texts)
+        return [[0.0] * 4 for _ in texts]
+
+    def fake_upsert_chunks(chunks, embeddings, ids=None):
+        for point_id, chunk in zip(ids, chunks):
+            stored[point_id] = dict(chunk.metadata)
+        return len(chunks)
+
+    monkeypatch.setattr(embedding_service, "embed_batch", fake_embed_batch)
+    monkeypatch.setattr(ingestion.vector_store, "upsert_chunks", fake_upsert_chunks)
+    monkeypatch.setattr(ingestion.vector_store, "delete_points", deleted.extend)
+    monkeypatch.setattr(ingestion.vector_store, "update_chunk_metadata", metadata_updates.extend)
+
+    sentences = [f"Policy clause number {i} applies to every employee." for i in range(120)]
+    file_path = tmp_path / "policy.txt"
+    file_path.write_text(" ".join(sentences), encoding="utf-8")
+
+    pipeline = IngestionPipeline(batch_size=4)
+    first = asyncio.run(pipeline.run(str(file_path), "doc-1", "policy.txt", "user-1"))
+    assert first.embedded_chunks == len(stored) > 3
+
+    existing = {}
+    for point_id, metadata in stored.items():
+        existing.setdefault((metadata["page"], metadata["chunk_hash"]), []).append((point_id, metadata))
+    embedded.clear()
+
+    sentences[-1] = "Policy clause number 119 was revised this week."
+    file_path.write_text(" ".join(sentences), encoding="utf-8")
+    second = asyncio.run(pipeline.run(str(file_path), "doc-1", "policy.txt", "user-1", existing=existing))
+
+    assert second.embedded_chunks == len(embedded) == 1
+    assert second.reused_chunks == first.embedded_chunks - 1
+    assert second.removed_chunks == len(deleted) == 1
+    assert second.chunk_count == first.embedded_chunks
+    assert metadata_updates == []
+
+
+def test_rechunk_reads_the_artifact_and_embeds_only_changed_chunks(monkeypatch):
+    asyncio.run(_reset_db())
+    stored = {}
+    embedded = []
+
+    def fake_embed_batch(texts):
+        embedded.extend(texts)
+        return np.zeros((len(texts), 4), dtype=np.float32)
+
+    def fake_upsert_chunks(chunks, embeddings, ids=None):
+        for point_id, chunk in zip(ids or [str(uuid.uuid4()) for _ in chunks], chunks):
+            stored[point_id] = dict(chunk.metadata)
+        return len(chunks)
+
+    def fake_chunk_index(document_id):
+        index = {}
+        for point_id, metadata in stored.items():
+            index.setdefault((metadata["page"], metadata["chunk_hash"]), []).append((point_id, dict(metadata)))
+        return index
+
+    def no_parsing(*args, **kwargs):
+        raise AssertionError("re-chunking must not read the upload")
+
+    monkeypatch.setattr(embedding_service, "embed_batch", fake_embed_batch)
+    monkeypatch.setattr(ingestion.vector_store, "upsert_chunks", fake_upsert_chunks)
+    monkeypatch.setattr(ingestion.vector_store, "get_chunk_index", fake_chunk_index)
+    monkeypatch.setattr(ingestion.vector_store, "delete_points", lambda ids: [stored.pop(i) for i in ids])
+    monkeypatch.setattr(ingestion.vector_store, "update_chunk_metadata", lambda updates: None)
+    monkeypatch.setattr(ingestion.document_processor, "iter_document_chunks", no_parsing)
+
+    # A cover page shorter than either chunk size, then a long page
+    pages = {1: "Employee handbook, cover page.", 2: " ".join(f"Rule {i} applies to all staff." for i in range(150))}
+    artifact_key = ingestion.artifact_store.put_pages(pages)
+    document_id = uuid.uuid4()
+    first = asyncio.run(IngestionPipeline().run_pages(pages, str(document_id), "handbook.pdf", str(TEST_USER_ID), 2))
+
+    async def seed():
+        async with AsyncSessionLocal() as db:
+            db.add(User(id=TEST_USER_ID, email="ingest@example.com", hashed_password=""))
+            db.add(Document(
+                id=document_id, user_id=TEST_USER_ID, filename="handbook.pdf", original_filename="handbook.pdf",
+                file_size=100, file_type=".pdf", artifact_key=artifact_key, processing_status="completed",
+                chunk_count=first.chunk_count, total_pages=2,
+                metadata_={"total_pages": 2, "chunking": {"unit": "chars", "size": 1000, "overlap": 200}}
+            ))
+            await db.commit()
+
+    asyncio.run(seed())
+    embedded.clear()
+    monkeypatch.setattr(ingestion.settings, "CHUNK_SIZE", 400)
+    monkeypatch.setattr(ingestion.settings, "CHUNK_OVERLAP", 50)
+
+    # The upload was deleted after ingestion; only the artifact is left
+    assert asyncio.run(rechunk_document(str(document_id), ""))
+
+    doc = asyncio.run(_load_document(document_id))
+    assert doc.chunk_count == len(stored) > first.chunk_count
+    assert pages[1] not in embedded
+    assert all(text in pages[2] for text in embedded)
+    assert doc.metadata_["last_rechunk"] == {
+        "embedded_chunks": len(embedded), "reused_chunks": 1, "removed_chunks": first.chunk_count - 1
+    }
+    assert doc.metadata_["chunking"] == {"unit": "chars", "size": 400, "overlap": 50}
+    assert doc.metadata_["total_pages"] == 2
+    assert doc.processing_status == "completed"
+
+
+def test_document_with_every_page_skipped_fails_instead_of_completing(tmp_path, monkeypatch):
+    asyncio.run(_reset_db())
+    document_id = uuid.uuid4()
+
+    async def seed():
+        async with AsyncSessionLocal() as db:
+            db.add(User(id=TEST_USER_ID, email="ingest@example.com", hashed_password=""))
+            db.add(Document(
+                id=document_id, user_id=TEST_USER_ID, filename="scan.pdf", original_filename="scan.pdf",
+                file_size=100, file_type=".pdf", processing_status="pending"
+            ))
+            await db.commit()
+
+    def every_page_fails(file_path, page_stats=None, skipped_pages=None, on_total_pages=None, **kwargs):
+        on_total_pages(3)
+        skipped_pages.extend([
+            {"page": 1, "reason": "timeout"}, {"page": 2, "reason": "crashed"}, {"page": 3, "reason": "timeout"}
+        ])
+        yield from ()
+
+    deleted = []
+    monkeypatch.setattr(DocumentProcessor, "iter_pdf_pages", staticmethod(every_page_fails))
+    monkeypatch.setattr(ingestion.vector_store, "delete_by_document", deleted.append)
+    asyncio.run(seed())
+    upload = tmp_path / "scan.pdf"
+    upload.write_bytes(b"%PDF-1.4")
+
+    with pytest.raises(ValueError, match="No page could be extracted \\(2 timeout, 1 crashed\\)") as exc_info:
+        asyncio.run(ingest_document(str(document_id), str(upload)))
+    assert deleted == [str(document_id)]
+    assert asyncio.run(_load_document(document_id)).processing_status != "completed"
+
+    # What the worker does once the job runs out of attempts
+    asyncio.run(record_ingestion_failure(str(document_id), str(upload), str(exc_info.value), final=True))
+    doc = asyncio.run(_load_document(document_id))
+    assert doc.processing_status == "failed"
+    assert doc.chunk_count == 0
+    assert not upload.exists()
@@ -0,0 +1,96 @@
+import asyncio
+import uuid
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, Base, engine
+from app.models.job import IngestionJob
+from app.models.user import User  # noqa: F401  (documents.user_id references it)
+from app.services import ingestion_worker
+from app.services.ingestion_worker import IngestionWorkerPool
+from app.services.job_queue import job_queue
+
+
+async def _reset_db():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+
+async def _delete_jobs_of(document_id):
+    # What deleting the document does to its jobs
+    async with AsyncSessionLocal() as db:
+        await job_queue.cancel_document(db, document_id)
+        await db.commit()
+
+
+async def _job_statuses():
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(IngestionJob.document_id, IngestionJob.status))
+        return dict(result.all())
+
+
+def test_worker_stops_and_cleans_up_when_its_document_is_deleted(monkeypatch):
+    monkeypatch.setattr(settings, "INGEST_JOB_HEARTBEAT_SECONDS", 0.05)
+    discarded = []
+
+    async def never_finishes(document_id, file_path):
+        await asyncio.sleep(30)
+
+    async def fake_discard(document_id, file_path):
+        discarded.append((document_id, file_path))
+
+    monkeypatch.setitem(ingestion_worker.JOB_HANDLERS, "ingest", never_finishes)
+    monkeypatch.setattr(ingestion_worker, "discard_document", fake_discard)
+
+    async def scenario():
+        await _reset_db()
+        document_id = uuid.uuid4()
+        pool = IngestionWorkerPool(worker_id="worker-a")
+        async with AsyncSessionLocal() as db:
+            await job_queue.enqueue(db, document_id, "uploads/a.pdf")
+            job = await job_queue.claim(db, pool.worker_id)
+
+        run = asyncio.create_task(pool._run_job(job.id, "ingest", str(document_id), job.file_path, job.attempts))
+        await asyncio.sleep(0.1)
+        # Deleted by another process: only the heartbeat can tell
+        await _delete_jobs_of(document_id)
+        await asyncio.wait_for(run, timeout=5)
+        return document_id
+
+    document_id = asyncio.run(scenario())
+    assert discarded == [(str(document_id), "uploads/a.pdf")]
+
+
+def test_bulk_batch_drops_a_deleted_document_and_completes_the_rest(monkeypatch):
+    monkeypatch.setattr(settings, "INGEST_JOB_HEARTBEAT_SECONDS", 0.05)
+    cancelled = []
+
+    async def fake_ingest_documents(jobs):
+        while not cancelled:
+            await asyncio.sleep(0.01)
+        return {document_id: None for document_id, _ in jobs}
+
+    monkeypatch.setattr(ingestion_worker, "ingest_documents", fake_ingest_documents)
+    monkeypatch.setattr(ingestion_worker, "cancel_ingestion", cancelled.append)
+
+    async def scenario():
+        await _reset_db()
+        deleted, kept = uuid.uuid4(), uuid.uuid4()
+        pool = IngestionWorkerPool(worker_id="worker-a")
+        async with AsyncSessionLocal() as db:
+            batch_id = uuid.uuid4()
+            await job_queue.enqueue_many(db, [(deleted, "uploads/a.txt"), (kept, "uploads/b.txt")], batch_id=batch_id)
+            first = await job_queue.claim(db, pool.worker_id)
+            jobs = [first, *await job_queue.claim_batch(db, pool.worker_id, batch_id, 1)]
+
+        run = asyncio.create_task(pool._run_bulk(jobs))
+        await asyncio.sleep(0.1)
+        await _delete_jobs_of(deleted)
+        await asyncio.wait_for(run, timeout=5)
+        return deleted, kept
+
+    deleted, kept = asyncio.run(scenario())
+    assert cancelled == [str(deleted)]
+    assert asyncio.run(_job_statuses()) == {kept: "succeeded"}
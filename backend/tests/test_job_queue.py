@@ -0,0 +1,226 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import undefer
+
+from app.core.database import Base
+from app.models.document import Document
+from app.models.job import IngestionJob
+from app.models.user import User  # noqa: F401  (documents.user_id references it)
+from app.services.job_queue import JobQueue
+
+
+def _run(scenario, tmp_path):
+    async def runner():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'jobs.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sessions = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        try:
+            return await scenario(sessions)
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(runner())
+
+
+def test_claim_leases_a_job_only_once(tmp_path):
+    async def scenario(sessions):
+        async with sessions() as db:
+            job = await JobQueue.enqueue(db, uuid.uuid4(), "uploads/a.pdf")
+
+        async with sessions() as db:
+            claimed = await JobQueue.claim(db, "worker-a")
+        async with sessions() as db:
+            second = await JobQueue.claim(db, "worker-b")
+
+        assert claimed.id == job.id
+        assert claimed.status == "running"
+        assert claimed.attempts == 1
+        assert claimed.lease_owner == "worker-a"
+        assert second is None
+
+        async with sessions() as db:
+            assert await JobQueue.heartbeat(db, job.id, "worker-a")
+            assert not await JobQueue.heartbeat(db, job.id, "worker-b")
+            assert await JobQueue.complete(db, job.id, "worker-a")
+
+    _run(scenario, tmp_path)
+
+
+def test_failed_job_retries_with_backoff_then_fails(tmp_path, monkeypatch):
+    monkeypatch.setattr("app.services.job_queue.settings.INGEST_JOB_MAX_ATTEMPTS", 2)
+
+    async def scenario(sessions):
+        async with sessions() as db:
+            job = await JobQueue.enqueue(db, uuid.uuid4(), "uploads/b.pdf")
+
+        async with sessions() as db:
+            await JobQueue.claim(db, "worker-a")
+            final = await JobQueue.fail(db, job.id, "worker-a", "boom")
+            retried = await db.get(IngestionJob, job.id)
+            assert not final
+            assert retried.status == "queued"
+            assert retried.available_at > datetime.utcnow()
+            # Not runnable until the backoff elapses
+            assert await JobQueue.claim(db, "worker-a") is None
+
+            retried.available_at = datetime.utcnow() - timedelta(seconds=1)
+            await db.commit()
+            assert (await JobQueue.claim(db, "worker-a")).attempts == 2
+            assert await JobQueue.fail(db, job.id, "worker-a", "boom again")
+
+            failed = await db.get(IngestionJob, job.id)
+            await db.refresh(failed)
+            assert failed.status == "failed"
+            assert failed.last_error == "boom again"
+
+    _run(scenario, tmp_path)
+
+
+def test_expired_lease_is_requeued(tmp_path):
+    async def scenario(sessions):
+        async with sessions() as db:
+            job = await JobQueue.enqueue(db, uuid.uuid4(), "uploads/c.pdf")
+            await JobQueue.claim(db, "crashed-worker")
+            running = await db.get(IngestionJob, job.id)
+            running.lease_expires_at = datetime.utcnow() - timedelta(seconds=5)
+            await db.commit()
+
+        async with sessions() as db:
+            assert await JobQueue.recover(db) == 1
+            reclaimed = await JobQueue.claim(db, "worker-b")
+
+        assert reclaimed.id == job.id
+        assert reclaimed.lease_owner == "worker-b"
+        assert reclaimed.attempts == 2
+
+    _run(scenario, tmp_path)
+
+
+def test_document_fails_once_expired_leases_use_up_attempts(tmp_path, monkeypatch):
+    monkeypatch.setattr("app.services.job_queue.settings.INGEST_JOB_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr("app.services.job_queue.settings.UPLOAD_DIR", str(tmp_path))
+
+    async def scenario(sessions):
+        document_id = uuid.uuid4()
+        upload = tmp_path / f"{document_id}.pdf"
+        upload.write_bytes(b"%PDF poison")
+        async with sessions() as db:
+            db.add(Document(
+                id=document_id, user_id=uuid.uuid4(), filename="poison.pdf", original_filename="poison.pdf",
+                file_size=11, file_type=".pdf", processing_status="processing",
+                upload_date=datetime.utcnow() - timedelta(hours=1)
+            ))
+            await db.commit()
+            await JobQueue.enqueue(db, document_id, str(upload))
+
+        # The worker dies on every attempt
+        for attempt in range(2):
+            async with sessions() as db:
+                crashed = await JobQueue.claim(db, "crashed-worker")
+                assert crashed.attempts == attempt + 1
+                crashed.lease_expires_at = datetime.utcnow() - timedelta(seconds=5)
+                await db.commit()
+                await JobQueue.recover(db)
+
+        async with sessions() as db:
+            assert await JobQueue.recover(db) == 0
+            assert await JobQueue.claim(db, "worker-b") is None
+            jobs = (await db.execute(select(IngestionJob))).scalars().all()
+            doc = await db.get(Document, document_id, options=[undefer(Document.metadata_)])
+
+        assert [(job.status, job.attempts) for job in jobs] == [("failed", 2)]
+        assert doc.processing_status == "failed"
+        assert doc.metadata_["processing_error"] == "Worker lease expired"
+        assert not upload.exists()
+
+    _run(scenario, tmp_path)
+
+
+def test_claim_batch_leases_queued_siblings_only(tmp_path):
+    async def scenario(sessions):
+        batch_id = uuid.uuid4()
+        async with sessions() as db:
+            jobs = await JobQueue.enqueue_many(
+                db, [(uuid.uuid4(), f"uploads/{i}.txt") for i in range(4)], batch_id=batch_id
+            )
+            await JobQueue.enqueue(db, uuid.uuid4(), "uploads/other.txt")
+
+        async with sessions() as db:
+            first = await JobQueue.claim(db, "worker-a")
+            siblings = await JobQueue.claim_batch(db, "worker-a", first.batch_id, limit=2)
+        async with sessions() as db:
+            rest = await JobQueue.claim_batch(db, "worker-b", batch_id, limit=10)
+
+        claimed = [first.id, *(job.id for job in siblings), *(job.id for job in rest)]
+        assert first.batch_id == batch_id
+        assert len(siblings) == 2 and len(rest) == 1
+        assert sorted(claimed) == sorted(job.id for job in jobs)
+        assert all(job.lease_owner == "worker-a" and job.attempts == 1 for job in siblings)
+
+    _run(scenario, tmp_path)
+
+
+def test_claims_share_workers_fairly_between_users(tmp_path):
+    async def scenario(sessions):
+        bulk_user, other_user = uuid.uuid4(), uuid.uuid4()
+        async with sessions() as db:
+            bulk = await JobQueue.enqueue_many(
+                db, [(uuid.uuid4(), f"uploads/{i}.pdf") for i in range(20)],
+                batch_id=uuid.uuid4(), user_id=bulk_user, costs=[JobQueue.estimate_cost(2 * 1024 * 1024)] * 20
+            )
+            first = await JobQueue.claim(db, "worker-a")
+            # Other bulk jobs are due before anything else, so they can be claimed with it
+            assert len(await JobQueue.claim_batch(db, "worker-a", first.batch_id, limit=2)) == 2
+
+            single = await JobQueue.enqueue(
+                db, uuid.uuid4(), "uploads/single.txt", user_id=other_user, cost=JobQueue.estimate_cost(1024)
+            )
+            # The small upload of another user is next, and bulk siblings stop short of it
+            assert await JobQueue.claim_batch(db, "worker-a", first.batch_id, limit=10) == []
+            assert (await JobQueue.claim(db, "worker-b")).id == single.id
+            assert (await JobQueue.claim(db, "worker-b")).id in {job.id for job in bulk}
+
+            metrics = await JobQueue.metrics(db)
+            assert metrics[str(bulk_user)]["queued"] == 16
+            assert metrics[str(bulk_user)]["running"] == 4
+            assert metrics[str(bulk_user)]["queued_cost"] == 16 * 3.0
+            assert metrics[str(other_user)]["running"] == 1
+            assert metrics[str(other_user)]["wait_seconds"]["count"] == 1
+
+            assert await JobQueue.complete(db, single.id, "worker-b")
+            mine = await JobQueue.metrics(db, user_id=other_user)
+            assert list(mine) == [str(other_user)]
+            assert mine[str(other_user)]["succeeded"] == 1
+            assert mine[str(other_user)]["run_seconds"]["count"] == 1
+
+    _run(scenario, tmp_path)
+
+
+def test_cancelled_job_is_told_apart_from_a_lost_lease(tmp_path):
+    async def scenario(sessions):
+        deleted, other = uuid.uuid4(), uuid.uuid4()
+        async with sessions() as db:
+            await JobQueue.enqueue_many(db, [(deleted, "uploads/d.pdf"), (other, "uploads/e.pdf")])
+        async with sessions() as db:
+            first = await JobQueue.claim(db, "worker-a")
+            second = await JobQueue.claim(db, "worker-b")
+
+        async with sessions() as db:
+            cancelled = await JobQueue.cancel_document(db, deleted)
+            await db.commit()
+        assert [job.file_path for job in cancelled] == ["uploads/d.pdf"]
+
+        async with sessions() as db:
+            cancelled_id = first.id if first.document_id == deleted else second.id
+            owned_elsewhere = second.id if cancelled_id == first.id else first.id
+            # Both heartbeats fail for worker-a, only one job is gone
+            assert not await JobQueue.heartbeat(db, cancelled_id, "worker-a")
+            assert not await JobQueue.heartbeat(db, owned_elsewhere, "worker-a")
+            assert await JobQueue.missing(db, [cancelled_id, owned_elsewhere]) == {cancelled_id}
+
+    _run(scenario, tmp_path)
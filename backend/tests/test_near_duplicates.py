@@ -0,0 +1,108 @@
+from types import SimpleNamespace
+
+from app.services import near_duplicates
+from app.services.document_processor import Chunk
+from app.services.near_duplicates import MinHasher, NearDuplicateIndex, collapse_duplicates, jaccard
+
+
+CLAUSE = (
+    "The Supplier shall deliver the goods to the Customer within thirty days of the order date "
+    "and shall bear all costs of transport, insurance and customs clearance until delivery is complete. "
+    "Any delay caused by force majeure shall extend the delivery period accordingly. "
+    "The Customer shall inspect the goods upon arrival and notify the Supplier in writing of any "
+    "defects within five working days, failing which the goods are deemed accepted."
+)
+REVISED = CLAUSE.replace("thirty days", "thirty calendar days")
+UNRELATED = (
+    "Quarterly revenue in the northern region declined as two large customers postponed orders, "
+    "while operating costs rose with the expansion of the support team and new office leases."
+)
+
+
+def _chunk(text, document_id="doc-new"):
+    return Chunk(text, {"document_id": document_id, "user_id": "user-1", "page": 1})
+
+
+def test_minhash_bands_match_near_duplicates_only():
+    hasher = MinHasher()
+    clause, revised, unrelated = (hasher.shingles(text) for text in (CLAUSE, REVISED, UNRELATED))
+
+    assert 0.85 < jaccard(clause, revised) < 1
+    assert jaccard(clause, unrelated) == 0.0
+    clause_bands = set(hasher.band_keys(hasher.signature(clause)))
+    assert clause_bands & set(hasher.band_keys(hasher.signature(revised)))
+    assert not clause_bands & set(hasher.band_keys(hasher.signature(unrelated)))
+
+
+def test_link_batch_reuses_vectors_of_stored_near_duplicates(monkeypatch):
+    index = NearDuplicateIndex(MinHasher())
+    stored_chunk = _chunk(CLAUSE, document_id="doc-old")
+    index.link_batch([stored_chunk])
+    stored = SimpleNamespace(
+        id="point-1",
+        vector=[0.5] * 4,
+        payload={"text": CLAUSE, "metadata": {**stored_chunk.metadata, "dup_cluster": "cluster-1"}}
+    )
+    lookups = []
+
+    def find_by_bands(user_id, bands, exclude_document_ids, limit):
+        lookups.append((user_id, exclude_document_ids))
+        return [stored]
+
+    monkeypatch.setattr(near_duplicates.vector_store, "find_by_bands", find_by_bands)
+    monkeypatch.setattr(near_duplicates.settings, "NEAR_DUPLICATE_THRESHOLD", 0.85)
+
+    chunks = [_chunk(REVISED), _chunk(UNRELATED), _chunk(UNRELATED + " ")]
+    vectors = index.link_batch(chunks)
+
+    assert vectors == [[0.5] * 4, None, None]
+    assert chunks[0].metadata["dup_cluster"] == "cluster-1"
+    assert chunks[0].metadata["duplicate_of"] == "point-1"
+    # Twins inside one batch share a cluster but are still embedded
+    assert chunks[1].metadata["dup_cluster"] == chunks[2].metadata["dup_cluster"] != "cluster-1"
+    assert lookups == [("user-1", ["doc-new"])]
+
+
+def test_search_results_collapse_to_one_hit_per_cluster():
+    results = [
+        {"text": "a", "metadata": {"dup_cluster": "c1"}, "score": 0.9},
+        {"text": "a'", "metadata": {"dup_cluster": "c1"}, "score": 0.89},
+        {"text": "legacy", "metadata": {}, "score": 0.8},
+        {"text": "b", "metadata": {"dup_cluster": "c2"}, "score": 0.7},
+        {"text": "c", "metadata": {"dup_cluster": "c3"}, "score": 0.6},
+    ]
+
+    assert [hit["text"] for hit in collapse_duplicates(results, limit=3)] == ["a", "legacy", "b"]
+
+
+def test_cloning_for_another_user_rekeys_clusters_and_drops_duplicate_links(monkeypatch):
+    def record(point_id, **metadata):
+        metadata = {"document_id": "doc-a", "user_id": "user-a", "lsh_bands": ["0:ab"], **metadata}
+        return SimpleNamespace(id=point_id, vector=[0.1] * 4, payload={"text": "t", "metadata": metadata})
+
+    pages = [
+        ([record("p1", dup_cluster="c1"), record("p2", dup_cluster="c1", duplicate_of="p9")], "next"),
+        ([record("p3", dup_cluster="c2")], None),
+    ]
+    upserted = []
+    client = SimpleNamespace(
+        scroll=lambda **kwargs: pages[0] if kwargs["offset"] is None else pages[1],
+        upsert=lambda collection_name, points: upserted.extend(point.payload["metadata"] for point in points)
+    )
+    store = near_duplicates.vector_store
+    monkeypatch.setattr(store, "client", client)
+    monkeypatch.setattr(store, "_collection_ensured", True)
+
+    assert store.clone_document_vectors("doc-a", "doc-b", "user-a", "a.pdf") == 3
+    # Same user: the links still point at that user's points
+    assert [m["dup_cluster"] for m in upserted] == ["c1", "c1", "c2"]
+    assert upserted[1]["duplicate_of"] == "p9"
+
+    upserted.clear()
+    assert store.clone_document_vectors("doc-a", "doc-c", "user-c", "a.pdf") == 3
+    clusters = [m["dup_cluster"] for m in upserted]
+    # Chunks that shared a cluster still share one, under a new id
+    assert clusters[0] == clusters[1] != clusters[2]
+    assert not {"c1", "c2"} & set(clusters)
+    assert all("duplicate_of" not in m and m["user_id"] == "user-c" for m in upserted)
+    assert all(m["lsh_bands"] == ["0:ab"] for m in upserted)
@@ -0,0 +1,99 @@
+import asyncio
+import uuid
+
+from app.api.routes.documents import _poll_statuses
+from app.core.database import AsyncSessionLocal, Base, engine
+from app.models.document import Document
+from app.models.user import User  # noqa: F401  (documents.user_id references it)
+from app.services import progress as progress_module
+from app.services.progress import IngestionProgress, ProgressBroker, progress_broker
+
+
+def test_broker_routes_events_by_user_and_keeps_in_flight_state():
+    async def scenario():
+        broker = ProgressBroker()
+        mine = broker.subscribe("user-1")
+        other = broker.subscribe("user-2")
+
+        broker.publish({"document_id": "doc-1", "user_id": "user-1", "status": "processing"})
+        assert [event["document_id"] for event in broker.snapshot("user-1")] == ["doc-1"]
+
+        broker.publish({"document_id": "doc-1", "user_id": "user-1", "status": "completed"})
+        assert broker.snapshot("user-1") == []
+        assert mine.qsize() == 2 and other.empty()
+
+        broker.unsubscribe("user-1", mine)
+        broker.publish({"document_id": "doc-2", "user_id": "user-1", "status": "processing"})
+        assert mine.qsize() == 2
+
+    asyncio.run(scenario())
+
+
+def test_broker_drops_deleted_and_abandoned_documents(monkeypatch):
+    broker = ProgressBroker()
+    broker.publish({"document_id": "doc-1", "user_id": "user-1", "status": "processing"})
+    broker.publish({"document_id": "doc-2", "user_id": "user-1", "status": "partially_indexed"})
+
+    broker.publish({"document_id": "doc-1", "user_id": "user-1", "status": "deleted"})
+    assert [event["document_id"] for event in broker.snapshot("user-1")] == ["doc-2"]
+
+    # No news for a whole lease: its worker is gone
+    monkeypatch.setattr(progress_module.settings, "INGEST_JOB_LEASE_SECONDS", 0)
+    assert broker.snapshot("user-1") == []
+
+
+def test_progress_summary_reports_throughput_per_stage():
+    async def scenario():
+        queue = progress_broker.subscribe("user-9")
+        progress = IngestionProgress("doc-9", "user-9", "a.pdf", pages={1: "x", 2: "y"}, metadata={"total_pages": 4})
+        progress.record("extract", 10, 0.5)
+        progress.record("embed", 10, 2.0)
+        progress.publish("completed", force=True)
+
+        summary = progress.summary()
+        assert summary["pages_extracted"] == 2 and summary["total_pages"] == 4
+        assert summary["stages"]["extract"]["per_second"] == 20.0
+        assert summary["stages"]["embed"]["per_second"] == 5.0
+        assert summary["stages"]["upsert"]["per_second"] is None
+
+        events = [queue.get_nowait() for _ in range(queue.qsize())]
+        assert events[-1]["status"] == "completed"
+        progress_broker.unsubscribe("user-9", queue)
+
+    asyncio.run(scenario())
+
+
+def test_status_poll_emits_each_transition_once():
+    async def scenario():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+        user_id, document_id = uuid.uuid4(), uuid.uuid4()
+        async with AsyncSessionLocal() as db:
+            db.add(Document(
+                id=document_id, user_id=user_id, filename="a.pdf", original_filename="a.pdf",
+                file_size=1, file_type=".pdf", processing_status="pending"
+            ))
+            await db.commit()
+
+        async def set_status(status: str, chunk_count: int = 0):
+            async with AsyncSessionLocal() as db:
+                doc = await db.get(Document, document_id)
+                doc.processing_status, doc.chunk_count = status, chunk_count
+                await db.commit()
+
+        watched: dict = {}
+        events = await _poll_statuses(user_id, watched)
+        await set_status("partially_indexed", 4)
+        for _ in range(3):
+            events += await _poll_statuses(user_id, watched)
+        await set_status("completed", 9)
+        for _ in range(2):
+            events += await _poll_statuses(user_id, watched)
+
+        assert [(event["status"], event["chunk_count"]) for event in events] == [
+            ("pending", 0), ("partially_indexed", 4), ("completed", 9)
+        ]
+        assert watched == {}
+
+    asyncio.run(scenario())
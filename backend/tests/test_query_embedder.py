@@ -0,0 +1,142 @@
+import asyncio
+import threading
+import time
+
+from app.services import embedding_scheduler as embedding_scheduler_module
+from app.services import query_embedder as query_embedder_module
+from app.services.embedding_cache import QueryEmbeddingCache
+from app.services.embedding_scheduler import EmbeddingScheduler
+from app.services.query_embedder import QueryEmbedder
+
+
+def _fresh_cache():
+    return QueryEmbeddingCache(max_entries=100, max_bytes=1024 * 1024)
+
+
+def test_concurrent_queries_share_one_batch_off_the_event_loop(monkeypatch):
+    batches = []
+    loop_thread = threading.get_ident()
+
+    def fake_embed_texts(texts):
+        assert threading.get_ident() != loop_thread
+        batches.append(list(texts))
+        time.sleep(0.05)
+        return [[float(len(text))] for text in texts]
+
+    monkeypatch.setattr(query_embedder_module.embedding_service, "embed_texts", fake_embed_texts)
+    monkeypatch.setattr(query_embedder_module.settings, "QUERY_EMBED_MAX_BATCH", 8)
+
+    async def scenario():
+        embedder = QueryEmbedder(cache=_fresh_cache())
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.005)
+
+        ticking = asyncio.create_task(ticker())
+        questions = ["question 1"] + [f"question {i}" for i in range(10)]
+        vectors = await asyncio.gather(*(embedder.embed(question) for question in questions))
+        ticking.cancel()
+        return embedder, vectors, ticks
+
+    embedder, vectors, ticks = asyncio.run(scenario())
+
+    assert vectors == [[float(len("question 1"))]] + [[float(len(f"question {i}"))] for i in range(10)]
+    # A full batch goes out at once, the remainder after the window; duplicates are embedded once
+    assert [len(batch) for batch in batches] == [8, 2]
+    assert embedder.stats()["requests"] == 11 and embedder.stats()["embedded"] == 10
+    assert embedder.stats()["batches"] == 2
+    # The loop kept running while the model worked
+    assert ticks >= 10
+
+
+def test_batch_failure_reaches_every_caller(monkeypatch):
+    def failing_embed_texts(texts):
+        raise RuntimeError("model unavailable")
+
+    monkeypatch.setattr(query_embedder_module.embedding_service, "embed_texts", failing_embed_texts)
+
+    async def scenario():
+        embedder = QueryEmbedder(cache=_fresh_cache())
+        return await asyncio.gather(embedder.embed("a"), embedder.embed("b"), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_queries_run_before_queued_bulk_slices(monkeypatch):
+    order = []
+    started = threading.Event()
+
+    def fake_embed_batch(texts):
+        started.set()
+        order.append(("bulk", len(texts)))
+        time.sleep(0.02)
+        return [[0.0] for _ in texts]
+
+    def fake_embed_texts(texts):
+        order.append(("query", len(texts)))
+        return [[1.0] for _ in texts]
+
+    monkeypatch.setattr(embedding_scheduler_module.embedding_service, "embed_batch", fake_embed_batch)
+    monkeypatch.setattr(query_embedder_module.embedding_service, "embed_texts", fake_embed_texts)
+    monkeypatch.setattr(embedding_scheduler_module.settings, "EMBED_BULK_SLICE_SIZE", 4)
+
+    async def scenario():
+        scheduler = EmbeddingScheduler()
+        monkeypatch.setattr(query_embedder_module, "embedding_scheduler", scheduler)
+        bulk = asyncio.create_task(scheduler.embed_bulk([f"chunk {i}" for i in range(20)]))
+        await asyncio.to_thread(started.wait)
+        vector = await QueryEmbedder(cache=_fresh_cache()).embed("what are the key points")
+        return await bulk, vector, scheduler.stats()
+
+    bulk_vectors, vector, stats = asyncio.run(scenario())
+
+    assert len(bulk_vectors) == 20 and vector == [1.0]
+    # The query waited for the slice already running, not the four queued behind it
+    assert order.index(("query", 1)) <= 2
+    assert [size for kind, size in order if kind == "bulk"] == [4] * 5
+    assert stats["interactive"]["completed"] == 1 and stats["bulk"]["completed"] == 5
+    assert stats["interactive"]["wait_ms"]["max"] < 100
+
+
+def test_repeated_questions_are_served_from_the_cache(monkeypatch):
+    embedded = []
+
+    def fake_embed_texts(texts):
+        embedded.extend(texts)
+        return [[0.25, 0.5] for _ in texts]
+
+    monkeypatch.setattr(query_embedder_module.embedding_service, "embed_texts", fake_embed_texts)
+    cache = _fresh_cache()
+
+    async def scenario():
+        embedder = QueryEmbedder(cache=cache)
+        first = await embedder.embed("What are the key points?")
+        again = await asyncio.gather(embedder.embed("what are  the KEY points"), embedder.embed(" What are the key points. "))
+        return first, again
+
+    first, again = asyncio.run(scenario())
+
+    assert embedded == ["what are the key points"]
+    assert first == again[0] == again[1] == [0.25, 0.5]
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 1
+
+
+def test_query_cache_evicts_least_recently_used_within_bounds():
+    vector = [0.0] * 4  # 16 bytes as float32
+    cache = QueryEmbeddingCache(max_entries=3, max_bytes=40)
+
+    cache.put("model", "a", vector)
+    cache.put("model", "b", vector)
+    assert cache.get("model", "a") is not None
+    cache.put("model", "c", vector)
+
+    # 48 bytes is over the byte bound, so the least recently used entry goes
+    assert cache.get("model", "b") is None
+    assert cache.get("model", "a").dtype == "float32"
+    assert cache.stats()["entries"] == 2 and cache.stats()["bytes"] == 32
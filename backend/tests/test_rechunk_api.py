@@ -0,0 +1,72 @@
+import asyncio
+import uuid
+
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from app.main import app
+from app.core.auth import current_active_user
+from app.core.database import AsyncSessionLocal, Base, engine
+from app.models.document import Document
+from app.models.job import IngestionJob
+from app.models.user import User
+
+
+ADMIN_ID = uuid.uuid4()
+
+
+async def _seed():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    with_artifact, without_artifact = uuid.uuid4(), uuid.uuid4()
+    async with AsyncSessionLocal() as db:
+        for document_id, artifact_key in ((with_artifact, "ab" * 32), (without_artifact, None)):
+            db.add(Document(
+                id=document_id, user_id=ADMIN_ID, filename="a.pdf", original_filename="a.pdf",
+                file_size=100, file_type=".pdf", artifact_key=artifact_key, processing_status="completed",
+                metadata_={"chunking": {"unit": "chars", "size": 1, "overlap": 0}}
+            ))
+        await db.commit()
+    return with_artifact, without_artifact
+
+
+async def _rechunk_jobs():
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(IngestionJob.document_id).filter(IngestionJob.kind == "rechunk"))
+        return result.scalars().all()
+
+
+def _override_admin():
+    return User(
+        id=ADMIN_ID, email="admin@example.com", hashed_password="",
+        is_active=True, is_superuser=True, is_verified=True
+    )
+
+
+def test_rechunk_route_queues_documents_with_artifacts_only():
+    with_artifact, without_artifact = asyncio.run(_seed())
+
+    app.dependency_overrides[current_active_user] = _override_admin
+    try:
+        # Without the lifespan, so no worker picks up the queued jobs
+        client = TestClient(app)
+        missing = client.post("/api/v1/admin/rechunk", json={"document_ids": [str(uuid.uuid4())]})
+        invalid = client.post("/api/v1/admin/rechunk", json={"document_ids": ["not-a-uuid"]})
+        conflict = client.post(
+            "/api/v1/admin/rechunk", json={"document_ids": [str(with_artifact), str(without_artifact)]}
+        )
+        queued = client.post("/api/v1/admin/rechunk", json={"document_ids": [str(with_artifact)]})
+        everything = client.post("/api/v1/admin/rechunk", json={})
+    finally:
+        app.dependency_overrides.clear()
+
+    assert missing.status_code == 404
+    assert invalid.status_code == 404
+    assert conflict.status_code == 409
+    assert str(without_artifact) in conflict.json()["detail"]
+    assert queued.status_code == 200
+    assert queued.json()["queued"] == 1
+    # Already queued, and the document without an artifact is left out
+    assert everything.json()["queued"] == 0
+    assert asyncio.run(_rechunk_jobs()) == [with_artifact]
@@ -0,0 +1,142 @@
+import asyncio
+import hashlib
+import itertools
+import zipfile
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.core.uploads import UploadBudget, extract_archive, stream_upload
+
+BOUNDARY = "testboundary"
+
+
+class FakeRequest:
+    def __init__(self, body: bytes, block_size: int = 7):
+        self.headers = {
+            "content-type": f"multipart/form-data; boundary={BOUNDARY}",
+            "content-length": str(len(body)),
+        }
+        self._body = body
+        self._block_size = block_size
+
+    async def stream(self):
+        for start in range(0, len(self._body), self._block_size):
+            yield self._body[start:start + self._block_size]
+
+
+def _multipart(filename: str, content: bytes) -> bytes:
+    return (
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        "Content-Type: application/octet-stream\r\n\r\n"
+    ).encode() + content + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+def test_stream_upload_writes_and_hashes_in_one_pass(tmp_path):
+    content = b"hello world\n" * 100
+    request = FakeRequest(_multipart("notes.TXT", content))
+
+    upload = asyncio.run(stream_upload(request, lambda ext: str(tmp_path / f"doc{ext}")))
+
+    assert upload.filename == "notes.TXT"
+    assert upload.extension == ".txt"
+    assert upload.size == len(content)
+    assert upload.content_hash == hashlib.sha256(content).hexdigest()
+    assert (tmp_path / "doc.txt").read_bytes() == content
+
+
+def test_stream_upload_aborts_oversized_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "MAX_FILE_SIZE", 50)
+    request = FakeRequest(_multipart("big.txt", b"x" * 200))
+    request.headers.pop("content-length")
+
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(stream_upload(request, lambda ext: str(tmp_path / f"big{ext}")))
+
+    assert exc_info.value.status_code == 400
+    assert not (tmp_path / "big.txt").exists()
+
+
+def test_stream_upload_rejects_extension_before_writing(tmp_path):
+    request = FakeRequest(_multipart("tool.exe", b"MZ"))
+
+    with pytest.raises(HTTPException):
+        asyncio.run(stream_upload(request, lambda ext: str(tmp_path / f"tool{ext}")))
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def _zip(path, members: dict) -> str:
+    with zipfile.ZipFile(path, "w") as archive:
+        for name, content in members.items():
+            archive.writestr(name, content)
+    return str(path)
+
+
+def _destination(directory):
+    directory.mkdir(exist_ok=True)
+    counter = itertools.count()
+    return lambda ext: str(directory / f"{next(counter)}{ext}")
+
+
+def test_extract_archive_stores_supported_members_and_skips_the_rest(tmp_path):
+    archive = _zip(tmp_path / "docs.zip", {
+        "notes/a.txt": b"alpha",
+        "tool.exe": b"MZ",
+        "../../escape.md": b"# outside",
+        "/etc/absolute.txt": b"absolute",
+        ".hidden.txt": b"dotfile",
+        "__MACOSX/notes/._a.txt": b"resource fork",
+        "empty/": b"",
+    })
+    out = tmp_path / "out"
+
+    stored, skipped = extract_archive(archive, _destination(out), max_files=10)
+
+    assert [(upload.filename, upload.extension, upload.size) for upload in stored] == [
+        ("a.txt", ".txt", 5), ("escape.md", ".md", 9), ("absolute.txt", ".txt", 8)
+    ]
+    assert stored[0].content_hash == hashlib.sha256(b"alpha").hexdigest()
+    assert skipped == ["tool.exe"]
+    # Member paths never leave the destination
+    assert sorted(path.name for path in out.iterdir()) == ["0.txt", "1.md", "2.txt"]
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["docs.zip", "out"]
+
+
+def test_extract_archive_skips_members_declared_over_the_size_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "MAX_FILE_SIZE", 10)
+    archive = _zip(tmp_path / "docs.zip", {"small.txt": b"tiny", "big.txt": b"x" * 11})
+
+    stored, skipped = extract_archive(archive, _destination(tmp_path / "out"), max_files=10)
+
+    assert [upload.filename for upload in stored] == ["small.txt"]
+    assert skipped == ["big.txt"]
+
+
+def test_extract_archive_enforces_member_count_and_budget(tmp_path):
+    archive = _zip(tmp_path / "docs.zip", {f"{i}.txt": b"x" * 100 for i in range(3)})
+    out = tmp_path / "out"
+
+    with pytest.raises(HTTPException) as exc_info:
+        extract_archive(archive, _destination(out), max_files=2)
+    assert exc_info.value.status_code == 400
+    assert list(out.iterdir()) == []
+
+    budget = UploadBudget(250)
+    with pytest.raises(HTTPException) as exc_info:
+        extract_archive(archive, _destination(out), max_files=10, budget=budget)
+    assert exc_info.value.status_code == 413
+    assert list(out.iterdir()) == []
+
+
+def test_extract_archive_rejects_corrupt_zip(tmp_path):
+    archive = tmp_path / "broken.zip"
+    archive.write_bytes(b"PK\x03\x04 not really a zip")
+
+    with pytest.raises(HTTPException) as exc_info:
+        extract_archive(str(archive), _destination(tmp_path / "out"), max_files=10)
+
+    assert exc_info.value.status_code == 400
+    assert exc_info.value.detail == "Invalid zip archive"
@@ -143,8 +143,10 @@ const ChatInterface: React.FC<ChatInterfaceProps> = ({ initialDocumentIds, conve
   };
 
   const selectAllDocuments = () => {
-    const completed = (documents || []).filter((d) => d.status === 'completed').map((d) => d.id);
-    setSelectedDocumentIds(completed);
+    const queryable = (documents || [])
+      .filter((d) => d.status === 'completed' || d.status === 'partially_indexed')
+      .map((d) => d.id);
+    setSelectedDocumentIds(queryable);
   };
 
   const clearSelectedDocuments = () => setSelectedDocumentIds([]);
@@ -235,7 +237,7 @@ const ChatInterface: React.FC<ChatInterfaceProps> = ({ initialDocumentIds, conve
           </div>
           <div className="flex flex-wrap gap-2 max-h-20 overflow-auto">
             {(documents || [])
-              .filter((d) => d.status === 'completed')
+              .filter((d) => d.status === 'completed' || d.status === 'partially_indexed')
               .map((doc) => {
                 const selected = selectedDocumentIds.includes(doc.id);
                 return (
@@ -250,6 +252,7 @@ const ChatInterface: React.FC<ChatInterfaceProps> = ({ initialDocumentIds, conve
                   >
                     {selected ? <CheckSquare className="w-3.5 h-3.5" /> : <Square className="w-3.5 h-3.5" />}
                     <span className="max-w-[200px] truncate">{doc.filename}</span>
+                    {doc.status === 'partially_indexed' && <Loader2 className="w-3 h-3 animate-spin" />}
                   </button>
                 );
               })}
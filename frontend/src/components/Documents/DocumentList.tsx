@@ -1,10 +1,10 @@
-import React, { useMemo } from 'react';
+import React, { useEffect, useMemo, useRef, useState } from 'react';
 import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
 import { FileText, Trash2, Clock, CheckCircle, AlertCircle } from 'lucide-react';
 import { useLocation, useNavigate } from 'react-router-dom';
 import { useAuth } from '../../context/AuthContext';
-import { listDocuments, deleteDocument } from '../../services/api';
-import type { Document } from '../../types';
+import { listDocuments, deleteDocument, streamDocumentEvents } from '../../services/api';
+import type { Document, DocumentEvent } from '../../types';
 
 const DocumentList: React.FC = () => {
   const { isAuthenticated } = useAuth();
@@ -20,10 +20,42 @@ const DocumentList: React.FC = () => {
     };
   }, [location.state]);
 
+  const [progress, setProgress] = useState<Record<string, DocumentEvent>>({});
+  const [streaming, setStreaming] = useState(false);
+  const lastStatus = useRef<Record<string, string>>({});
+
+  // Live ingestion events instead of polling; fall back to polling if the stream drops
+  useEffect(() => {
+    if (!isAuthenticated) return;
+    const controller = new AbortController();
+    setStreaming(true);
+    streamDocumentEvents((event) => {
+      const inFlight = event.status === 'processing' || event.status === 'partially_indexed';
+      // Progress ticks only need a fresh listing when the status changed
+      const changed = lastStatus.current[event.document_id] !== event.status;
+      lastStatus.current[event.document_id] = event.status;
+      if (inFlight) {
+        setProgress((prev) => ({ ...prev, [event.document_id]: event }));
+      } else {
+        setProgress((prev) => {
+          const next = { ...prev };
+          delete next[event.document_id];
+          return next;
+        });
+      }
+      if (changed || !inFlight) queryClient.invalidateQueries({ queryKey: ['documents'] });
+    }, controller.signal)
+      .catch(() => undefined)
+      .finally(() => {
+        if (!controller.signal.aborted) setStreaming(false);
+      });
+    return () => controller.abort();
+  }, [isAuthenticated, queryClient]);
+
   const { data: documents, isLoading, error } = useQuery<Document[]>({
     queryKey: ['documents'],
     queryFn: listDocuments,
-    refetchInterval: 5000,
+    refetchInterval: streaming ? false : 5000,
     enabled: isAuthenticated,
   });
 
@@ -38,6 +70,7 @@ const DocumentList: React.FC = () => {
     switch (status) {
       case 'completed': return <CheckCircle className="w-4 h-4 text-green-500" />;
       case 'processing': return <Clock className="w-4 h-4 text-yellow-500 animate-spin" />;
+      case 'partially_indexed': return <Clock className="w-4 h-4 text-green-500 animate-spin" />;
       case 'failed': return <AlertCircle className="w-4 h-4 text-red-500" />;
       default: return <Clock className="w-4 h-4 text-[var(--docu-text-secondary)]" />;
     }
@@ -78,8 +111,18 @@ const DocumentList: React.FC = () => {
                     <span className="opacity-30">•</span>
                     <span className="flex items-center gap-1.5">
                       {getStatusIcon(doc.status)}
-                      <span className="capitalize">{doc.status}</span>
+                      <span className="capitalize">{doc.status.replace('_', ' ')}</span>
                     </span>
+                    {(doc.status === 'processing' || doc.status === 'partially_indexed') && progress[doc.id] && (
+                      <>
+                        <span className="opacity-30">•</span>
+                        <span>
+                          {progress[doc.id].pages_extracted}
+                          {progress[doc.id].total_pages ? `/${progress[doc.id].total_pages}` : ''} pages,{' '}
+                          {progress[doc.id].points_upserted} chunks indexed
+                        </span>
+                      </>
+                    )}
                     {doc.chunk_count > 0 && (
                       <>
                         <span className="opacity-30">•</span>
@@ -96,7 +139,7 @@ const DocumentList: React.FC = () => {
               </div>
 
               <div className="flex items-center gap-3">
-                {doc.status === 'completed' && (
+                {(doc.status === 'completed' || doc.status === 'partially_indexed') && (
                   <button
                     onClick={() => navigate('/chat', { state: { documentIds: [doc.id] } })}
                     className="flex items-center gap-2 px-4 py-2 bg-[var(--btn-secondary-bg)] border border-[var(--docu-border)] text-[var(--btn-secondary-text)] text-xs font-semibold rounded-xl hover:bg-[var(--docu-sidebar)] transition-all shadow-sm active:scale-95"
@@ -1,5 +1,6 @@
 import axios from 'axios';
 import { auth } from '../config/firebase';
+import type { DocumentEvent } from '../types';
 
 const api = axios.create({
   baseURL: import.meta.env.VITE_API_URL || 'http://127.0.0.1:8000',
@@ -65,6 +66,47 @@ export const uploadDocument = async (file: File) => {
   return response.data;
 };
 
+export const uploadDocumentsBulk = async (files: File[]) => {
+  const formData = new FormData();
+  files.forEach((file) => formData.append('files', file));
+  const response = await api.post('/api/v1/documents/bulk', formData, {
+    headers: {
+      'Content-Type': 'multipart/form-data',
+    },
+  });
+  return response.data;
+};
+
+// Server-sent ingestion events; resolves when the stream ends or `signal` aborts
+export const streamDocumentEvents = async (
+  onEvent: (event: DocumentEvent) => void,
+  signal: AbortSignal,
+) => {
+  const token = (await auth.currentUser?.getIdToken()) || localStorage.getItem('token');
+  const apiBaseUrl = import.meta.env.VITE_API_URL || 'http://127.0.0.1:8000';
+  const response = await fetch(`${apiBaseUrl}/api/v1/documents/events`, {
+    headers: { Authorization: `Bearer ${token}` },
+    signal,
+  });
+  if (!response.ok || !response.body) throw new Error('Event stream failed');
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const messages = buffer.split('\n\n');
+    buffer = messages.pop() || '';
+    for (const message of messages) {
+      const type = message.match(/^event: (.*)$/m)?.[1];
+      const data = message.match(/^data: (.*)$/m)?.[1];
+      if (type && data) onEvent({ type, ...JSON.parse(data) });
+    }
+  }
+};
+
 export const listDocuments = async () => {
   const response = await api.get('/api/v1/documents');
   return response.data;
@@ -2,11 +2,23 @@ export interface Document {
   id: string;
   filename: string;
   upload_date: string;
-  status: 'pending' | 'processing' | 'completed' | 'failed';
+  // partially_indexed: the first pages are queryable while the rest is indexed
+  status: 'pending' | 'processing' | 'partially_indexed' | 'completed' | 'failed';
   chunk_count: number;
   file_size: number;
 }
 
+export interface DocumentEvent {
+  type: string; // 'progress' | 'status'
+  document_id: string;
+  status: Document['status'] | 'deleted';
+  pages_extracted?: number;
+  total_pages?: number | null;
+  chunks_created?: number;
+  points_upserted?: number;
+  error?: string;
+}
+
 export interface Source {
   document_id: string;
   filename: string;